@@ -0,0 +1,299 @@
+"""
+Agendador de tarefas periódicas (manutenção e lembretes)
+
+Roda dentro do processo da API: o lifespan registra as tarefas e cada uma
+ganha uma task asyncio. A agenda é uma expressão cron de 5 campos
+("minuto hora dia mês dia_da_semana", no fuso SLA_FUSO) ou um intervalo fixo
+em segundos (as tarefas que já tinham *_INTERVALO_SEGUNDOS). Cada execução é
+adiada por um jitter aleatório de até AGENDADOR_JITTER_SEGUNDOS, para que os
+workers não acordem todos no mesmo instante. Uma execução nunca se sobrepõe
+à anterior da mesma tarefa; horários perdidos enquanto ela rodava são pulados.
+
+Tarefas globais (que mexem no banco) rodam num único worker. A liderança de
+cada tarefa é um advisory lock de sessão (pg_try_advisory_lock) tomado numa
+conexão dedicada e mantido enquanto o processo viver. Se o líder cair, a
+conexão fecha, o Postgres libera o lock e outro worker assume na execução
+seguinte. Tarefas locais (estado em memória do worker) rodam em todos.
+
+Duração, execuções por resultado e liderança vão para /metrics
+(chamados_job_*).
+"""
+import asyncio
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+import metrics
+from config import get_settings
+
+# Primeira metade da chave (classe) dos advisory locks de liderança; a
+# segunda é derivada do nome da tarefa
+CHAVE_LOCK_AGENDADOR = 726_050
+
+
+def _campo(texto: str, nome: str, minimo: int, maximo: int) -> set:
+    """Valores de um campo cron: *, listas (a,b), intervalos (a-b) e passos (*/n, a-b/n)"""
+    valores = set()
+    for item in texto.split(","):
+        faixa, barra, passo = item.partition("/")
+        try:
+            passo = int(passo) if barra else 1
+            if faixa == "*":
+                inicio, fim = minimo, maximo
+            elif "-" in faixa:
+                inicio, fim = (int(valor) for valor in faixa.split("-", 1))
+            else:
+                inicio = int(faixa)
+                fim = maximo if barra else inicio
+        except ValueError:
+            raise ValueError(f"campo {nome} inválido na expressão cron: {texto!r}")
+        if passo < 1 or not minimo <= inicio <= fim <= maximo:
+            raise ValueError(f"campo {nome} fora de {minimo}-{maximo} na expressão cron: {texto!r}")
+        valores.update(range(inicio, fim + 1, passo))
+    return valores
+
+
+class Cron:
+    """Expressão cron de 5 campos avaliada no fuso informado (domingo = 0 ou 7)"""
+
+    def __init__(self, expressao: str, fuso: str):
+        partes = expressao.split()
+        if len(partes) != 5:
+            raise ValueError(f"expressão cron deve ter 5 campos: {expressao!r}")
+        self.expressao = expressao
+        self.fuso = ZoneInfo(fuso)
+        self.minutos = _campo(partes[0], "minuto", 0, 59)
+        self.horas = _campo(partes[1], "hora", 0, 23)
+        self.dias = _campo(partes[2], "dia", 1, 31)
+        self.meses = _campo(partes[3], "mês", 1, 12)
+        self.dias_semana = {dia % 7 for dia in _campo(partes[4], "dia da semana", 0, 7)}
+        # Como no cron: com dia e dia da semana restritos, basta um dos dois
+        self._dia_ou_semana = partes[2] != "*" and partes[4] != "*"
+        self.proxima(datetime.now(timezone.utc))  # ex.: 31/02 nunca acontece
+
+    def __str__(self):
+        return self.expressao
+
+    def _dia_valido(self, dia: date) -> bool:
+        no_mes = dia.day in self.dias
+        na_semana = (dia.weekday() + 1) % 7 in self.dias_semana
+        return (no_mes or na_semana) if self._dia_ou_semana else (no_mes and na_semana)
+
+    def primeira(self, agora: datetime) -> datetime:
+        return self.proxima(agora)
+
+    def proxima(self, depois: datetime) -> datetime:
+        """Próximo horário (UTC) estritamente depois de `depois`"""
+        local = depois.astimezone(self.fuso).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limite = local + timedelta(days=366 * 5)
+        while local < limite:
+            if local.month not in self.meses or not self._dia_valido(local.date()):
+                local = datetime.combine(local.date() + timedelta(days=1), dtime())
+            elif local.hour not in self.horas:
+                local = local.replace(minute=0) + timedelta(hours=1)
+            elif local.minute not in self.minutos:
+                local += timedelta(minutes=1)
+            else:
+                return local.replace(tzinfo=self.fuso).astimezone(timezone.utc)
+        raise ValueError(f"expressão cron sem nenhum horário possível: {self.expressao!r}")
+
+
+class Intervalo:
+    """A cada N segundos contados do fim da execução anterior; a primeira é no startup"""
+
+    def __init__(self, segundos: float):
+        if segundos <= 0:
+            raise ValueError(f"intervalo deve ser positivo: {segundos!r}")
+        self.segundos = segundos
+
+    def __str__(self):
+        return f"a cada {self.segundos:g} s"
+
+    def primeira(self, agora: datetime) -> datetime:
+        return agora
+
+    def proxima(self, depois: datetime) -> datetime:
+        return depois + timedelta(seconds=self.segundos)
+
+
+def _chave_tarefa(nome: str) -> int:
+    """Segunda metade da chave do lock: crc32 do nome como int4 do Postgres"""
+    chave = zlib.crc32(nome.encode())
+    return chave - 2 ** 32 if chave >= 2 ** 31 else chave
+
+
+class Lideranca:
+    """Advisory locks de sessão, um por tarefa, numa conexão dedicada (fora do pool)"""
+
+    def __init__(self, url):
+        self.url = url
+        self.engine = None
+        self.conexao = None
+        self.lideradas = set()
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        if self.conexao is None:
+            self.engine = create_engine(self.url, poolclass=NullPool)
+            self.conexao = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    def liderar(self, nome: str) -> bool:
+        """Se este worker é (ou acabou de se tornar) o líder da tarefa"""
+        with self._lock:
+            try:
+                self._conectar()
+                if nome in self.lideradas:
+                    # O lock vive enquanto a conexão viver
+                    self.conexao.execute(text("SELECT 1"))
+                    return True
+                if self.conexao.execute(
+                    text("SELECT pg_try_advisory_lock(:classe, :chave)"),
+                    {"classe": CHAVE_LOCK_AGENDADOR, "chave": _chave_tarefa(nome)}
+                ).scalar():
+                    self.lideradas.add(nome)
+                    return True
+                return False
+            except Exception as e:
+                print(f"AVISO: conexão de liderança do agendador perdida: {e}")
+                self._fechar()
+                return False
+
+    def _fechar(self):
+        self.lideradas.clear()
+        if self.conexao is not None:
+            try:
+                self.conexao.close()
+            except Exception:
+                pass
+            self.engine.dispose()
+        self.conexao = None
+        self.engine = None
+
+    def fechar(self):
+        """Fecha a conexão, liberando as tarefas para os outros workers"""
+        with self._lock:
+            self._fechar()
+
+
+class Tarefa:
+    def __init__(self, nome: str, agenda, funcao, local: bool, jitter: float):
+        self.nome = nome
+        self.agenda = agenda
+        self.funcao = funcao          # corrotina: aguardada no loop; função comum: roda no threadpool
+        self.local = local
+        self.jitter = jitter
+        self.proxima_execucao = None
+        self.ultima_execucao = None
+        self.ultima_duracao = None
+        self.ultimo_resultado = None
+        self.ultimo_sucesso = None
+
+
+class Agendador:
+    def __init__(self, jitter: float):
+        self.jitter = jitter
+        self.tarefas = {}
+        self.lideranca = None
+        self._tasks = []
+
+    def registrar(self, nome: str, agenda, funcao, local: bool = False, jitter: float = None):
+        """
+        Registra uma tarefa. Globais (padrão) rodam só no worker líder;
+        local=True roda em todos (limpeza de estado em memória)
+        """
+        self.tarefas[nome] = Tarefa(nome, agenda, funcao, local, self.jitter if jitter is None else jitter)
+
+    def iniciar(self, engine):
+        self.lideranca = Lideranca(engine.url)
+        self._tasks = [asyncio.create_task(self._agendar(tarefa)) for tarefa in self.tarefas.values()]
+
+    async def parar(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.lideranca is not None:
+            await run_in_threadpool(self.lideranca.fechar)
+
+    def lider(self, tarefa: Tarefa) -> bool:
+        return tarefa.local or (self.lideranca is not None and tarefa.nome in self.lideranca.lideradas)
+
+    async def _agendar(self, tarefa: Tarefa):
+        """Task de uma tarefa: espera o horário (+ jitter), executa e calcula o próximo"""
+        tarefa.proxima_execucao = tarefa.agenda.primeira(datetime.now(timezone.utc))
+        while True:
+            espera = (tarefa.proxima_execucao - datetime.now(timezone.utc)).total_seconds()
+            await asyncio.sleep(max(espera, 0) + random.uniform(0, tarefa.jitter))
+            await self.executar(tarefa)
+            tarefa.proxima_execucao = tarefa.agenda.proxima(datetime.now(timezone.utc))
+
+    async def executar(self, tarefa: Tarefa) -> str:
+        """Uma execução; retorna o resultado (ok, erro ou seguidor, quando outro worker lidera)"""
+        if not tarefa.local and not await run_in_threadpool(self.lideranca.liderar, tarefa.nome):
+            metrics.JOB_EXECUCOES.labels(tarefa.nome, "seguidor").inc()
+            return "seguidor"
+
+        inicio = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(tarefa.funcao):
+                await tarefa.funcao()
+            else:
+                await run_in_threadpool(tarefa.funcao)
+            resultado = "ok"
+        except Exception as e:
+            print(f"AVISO: falha na tarefa agendada {tarefa.nome}: {e}")
+            resultado = "erro"
+        duracao = time.perf_counter() - inicio
+
+        metrics.JOB_DURACAO.labels(tarefa.nome).observe(duracao)
+        metrics.JOB_EXECUCOES.labels(tarefa.nome, resultado).inc()
+        tarefa.ultima_execucao = datetime.utcnow()
+        tarefa.ultima_duracao = duracao
+        tarefa.ultimo_resultado = resultado
+        if resultado == "ok":
+            tarefa.ultimo_sucesso = time.time()
+        return resultado
+
+    def situacao(self) -> list:
+        """Estado das tarefas deste worker (GET /api/admin/agendador)"""
+        return [
+            {
+                "nome": tarefa.nome,
+                "agenda": str(tarefa.agenda),
+                "local": tarefa.local,
+                "lider": self.lider(tarefa),
+                "proxima_execucao": tarefa.proxima_execucao.replace(tzinfo=None) if tarefa.proxima_execucao else None,
+                "ultima_execucao": tarefa.ultima_execucao,
+                "ultima_duracao_ms": round(tarefa.ultima_duracao * 1000, 1) if tarefa.ultima_duracao is not None else None,
+                "ultimo_resultado": tarefa.ultimo_resultado,
+            }
+            for tarefa in self.tarefas.values()
+        ]
+
+
+_settings = get_settings()
+
+
+def cron(expressao: str) -> Cron:
+    """Agenda cron no fuso do calendário comercial (SLA_FUSO)"""
+    return Cron(expressao, _settings.sla_fuso)
+
+
+AGENDADOR = Agendador(_settings.agendador_jitter_segundos)
+
+metrics.GaugeCallback(
+    "chamados_job_leader", "1 se este worker executa a tarefa (líder ou tarefa local)",
+    lambda: [((tarefa.nome,), int(AGENDADOR.lider(tarefa))) for tarefa in AGENDADOR.tarefas.values()], ("job",)
+)
+metrics.GaugeCallback(
+    "chamados_job_last_success_timestamp_seconds", "Instante (epoch) da última execução bem-sucedida neste worker",
+    lambda: [((tarefa.nome,), tarefa.ultimo_sucesso) for tarefa in AGENDADOR.tarefas.values() if tarefa.ultimo_sucesso],
+    ("job",)
+)
@@ -1,25 +1,42 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.websockets import WebSocketState
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from datetime import timedelta, datetime
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import func, select
+from typing import Dict, List
+from contextlib import asynccontextmanager
+from functools import partial
+from datetime import date, timedelta, datetime
+import asyncio
+import heapq
 import os
 import json
+import time
 
-from database import get_db, engine
-from models import Base, Usuario, Chamado, Comentario
+from database import (
+    get_db, get_read_db, sessao_leitura, SessionLocal, engine, read_engine, estatisticas_pool,
+    settings as db_settings, COOKIE_LEITURA_PRIMARIO
+)
+from models import Usuario, Chamado, Comentario, ChamadoEvento, ChamadoArquivo, ComentarioArquivo, Leitura
 from schemas import (
     UsuarioCreate, UsuarioResponse, UsuarioUpdate,
     LoginRequest, Token,
-    ChamadoCreate, ChamadoUpdate, ChamadoResponse, ChamadoListResponse,
+    ChamadoCreate, ChamadoUpdate, ChamadoResponse, ChamadoListResponse, ChamadoCriadoResponse,
+    DuplicadoCandidato, DuplicadosRequest, MesclarRequest, ChamadosLoteUpdate, ChamadosLoteResponse,
     ComentarioCreate, ComentarioResponse,
-    EstatisticasResponse,
+    EstatisticasResponse, SerieEstatisticasResponse, EventoResponse, LeituraCreate, LeituraResponse, TempoEmStatus,
     SendVerificationCodeRequest, VerifyCodeRequest, ChangePasswordRequest,
-    ImportUsuariosRequest, ImportUsuariosResponse
+    ImportUsuariosRequest, ImportUsuariosResponse,
+    ProfilingConfig, ProfilingConfigUpdate, TarefaAgendadaResponse,
+    validar_dados_extras
 )
 from auth import (
     authenticate_user, create_access_token, get_current_user,
@@ -27,19 +44,114 @@ from auth import (
 )
 from telegram_notifier import (
     notificar_novo_chamado, notificar_alteracao_status,
-    notificar_novo_comentario, notificar_chamado_atribuido
+    notificar_novo_comentario, notificar_chamado_atribuido, notificar_alteracoes_em_lote
+)
+from email_graph import (
+    send_verification_email, verify_code, clear_verification_code, send_welcome_email, limpar_codigos_expirados
 )
-from email_graph import send_verification_email, verify_code, clear_verification_code, send_welcome_email
+from migrate import verificar_versao_schema, SchemaDesatualizadoError
+import metrics
+import profiling
+import agendador
+import rate_limit
+import sla
+import eventos
+import arquivamento
+import atribuicao
+import cache
+import condicional
+import duplicados
+import estatisticas
+import exportacao
+import lembretes
+import lote
+import presenca
+import tempo_real
+from eventos import TipoEvento
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown da aplicação"""
+    # O schema é criado/atualizado por migrate.py; aqui só conferimos a versão.
+    # Banco fora do ar no boot não derruba o processo: o pool reconecta
+    # sozinho quando ele voltar.
+    try:
+        await run_in_threadpool(verificar_versao_schema, engine)
+    except SchemaDesatualizadoError:
+        raise
+    except Exception as e:
+        print(f"AVISO: não foi possível verificar o schema no startup: {e}")
+
+    # Tarefas periódicas (agendador.py): as globais rodam só no worker líder
+    tarefas = agendador.AGENDADOR
+    # Alertas de SLA vencido
+    tarefas.registrar(
+        "sla_violacoes", agendador.Intervalo(db_settings.sla_intervalo_verificacao_segundos),
+        partial(sla.verificar_violacoes, engine, ao_violar=notificar_sla_violado_ws)
+    )
+    # Correção periódica das séries diárias (as escritas da API já as atualizam)
+    tarefas.registrar(
+        "estatisticas", agendador.Intervalo(db_settings.estatisticas_intervalo_segundos),
+        partial(estatisticas.recalcular_recentes, engine, db_settings.estatisticas_dias_recalculo)
+    )
+    if db_settings.arquivamento_ativo:
+        tarefas.registrar(
+            "arquivamento", agendador.Intervalo(db_settings.arquivamento_intervalo_segundos),
+            partial(arquivamento.executar, engine, db_settings.arquivamento_dias, db_settings.arquivamento_lote)
+        )
+    # Recarga completa do índice de carga da atribuição automática (por worker)
+    if db_settings.atribuicao_automatica:
+        tarefas.registrar(
+            "atribuicao_recarga", agendador.Intervalo(db_settings.atribuicao_recarga_segundos),
+            partial(atribuicao.recarregar_indice, engine), local=True
+        )
+    tarefas.registrar(
+        "lembrete_aguardando", agendador.cron(db_settings.lembrete_aguardando_cron),
+        partial(lembretes.enviar_lembretes, engine, db_settings.lembrete_aguardando_horas)
+    )
+    if isinstance(rate_limit.limitador.backend, rate_limit.BackendPostgres):
+        tarefas.registrar(
+            "rate_limit_limpeza", agendador.cron(db_settings.rate_limit_limpeza_cron),
+            rate_limit.limitador.backend.limpar_expirados
+        )
+    # Estado em memória de cada worker: códigos de verificação vencidos e
+    # presença nos chamados sem renovação
+    tarefas.registrar(
+        "codigos_verificacao", agendador.cron(db_settings.codigos_verificacao_limpeza_cron),
+        limpar_codigos_expirados, local=True
+    )
+    tarefas.registrar(
+        "presenca", agendador.Intervalo(db_settings.presenca_ttl_segundos / 5),
+        presenca.PRESENCA.varrer, local=True, jitter=0
+    )
+    tarefas.iniciar(engine)
+
+    # Invalidações do cache em memória vindas dos outros workers (NOTIFY)
+    escuta_cache = asyncio.create_task(cache.escutar_invalidacoes(engine, db_settings.cache_escuta_intervalo_segundos))
+
+    yield
 
-# Criar tabelas
-Base.metadata.create_all(bind=engine)
+    escuta_cache.cancel()
+    await tarefas.parar()
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
 
 app = FastAPI(
     title="Chamados TI MyCompany",
     description="Sistema de gerenciamento de chamados de TI da MyCompany",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Métricas (latência por rota, queries por requisição), rate limit por IP e
+# profiling de SQL. O último middleware adicionado é o mais externo: o de
+# métricas cria o contexto da requisição que o de profiling usa e também
+# contabiliza as respostas 429 do rate limit.
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(rate_limit.RateLimitMiddleware)
+app.add_middleware(metrics.MetricasMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +161,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Read-your-writes: quem acabou de escrever lê do primário por alguns segundos
+if read_engine is not engine:
+    @app.middleware("http")
+    async def marcar_leitura_no_primario(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            janela = db_settings.db_replica_stickiness_segundos
+            response.set_cookie(
+                COOKIE_LEITURA_PRIMARIO,
+                str(time.time() + janela),
+                max_age=janela,
+                httponly=True,
+                samesite="lax"
+            )
+        return response
+
 # Mount static files (CSS, JS, images)
 if os.path.exists("assets"):
     app.mount("/assets", StaticFiles(directory="assets"), name="assets")
@@ -59,43 +187,188 @@ if os.path.exists("assets"):
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections: List[tempo_real.ConexaoWS] = []
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    async def connect(self, websocket: WebSocket, usuario: Usuario, ultimo_id: str = None) -> tempo_real.ConexaoWS:
+        """Registra um WebSocket já aceito e autenticado"""
+        conexao = tempo_real.ConexaoWS(
+            websocket, usuario, db_settings.ws_fila_tamanho, db_settings.ws_fila_politica
+        )
+        if ultimo_id:
+            # Reenvia o que o cliente perdeu antes de entrar na lista: entre a
+            # última verificação e o append não há await, então nenhum evento
+            # novo escapa nem chega fora de ordem
+            while True:
+                perdidos = tempo_real.pendentes(ultimo_id, "websocket")
+                if not perdidos:
+                    break
+                for mensagem in perdidos:
+                    await websocket.send_json(mensagem)
+                    ultimo_id = mensagem["id"]
+
+        # Limite por usuário (abas esquecidas abertas): a conexão mais antiga sai
+        do_usuario = [c for c in self.active_connections if c.usuario_id == usuario.id]
+        for antiga in do_usuario[:max(0, len(do_usuario) - db_settings.ws_max_conexoes_por_usuario + 1)]:
+            antiga.encerrar(tempo_real.FECHAMENTO_LIMITE_USUARIO, "limite_usuario")
+            self.disconnect(antiga)
+
+        self.active_connections.append(conexao)
+        metrics.WS_CONEXOES.inc()
+        return conexao
+
+    def disconnect(self, conexao: tempo_real.ConexaoWS):
+        if conexao in self.active_connections:
+            self.active_connections.remove(conexao)
+            metrics.WS_CONEXOES.dec()
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        """Publica no log de eventos (retomada e SSE) e coloca na fila de cada WebSocket"""
+        inicio = time.perf_counter()
+        message = tempo_real.REGISTRO.publicar(message)
+        for conexao in self.active_connections:
+            conexao.enfileirar(message)
+        metrics.WS_BROADCAST_DURACAO.observe(time.perf_counter() - inicio)
 
 manager = ConnectionManager()
 
+async def notificar_sla_violado_ws(chamado):
+    await manager.broadcast({
+        "type": "sla_breached",
+        "ticket_id": chamado["id"]
+    })
+
+async def _autenticar_websocket(websocket: WebSocket):
+    """Primeira mensagem do cliente: {"type": "auth", "token": "<JWT>"}; None se inválida"""
+    try:
+        mensagem = await asyncio.wait_for(websocket.receive_json(), db_settings.ws_auth_timeout_segundos)
+    except (asyncio.TimeoutError, WebSocketDisconnect, ValueError):
+        return None
+    if not isinstance(mensagem, dict) or mensagem.get("type") != "auth" or not mensagem.get("token"):
+        return None
+    db = SessionLocal()
+    try:
+        return await get_current_user(mensagem["token"], db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+def _gravar_leitura(conexao: tempo_real.ConexaoWS, chamado_id: int, ate: int = None):
+    db = SessionLocal()
+    try:
+        leitura = presenca.registrar_leitura(db, conexao.usuario_id, conexao.ti, chamado_id, ate)
+        db.commit()
+        return leitura
+    finally:
+        db.close()
+
+def _inteiro(valor):
+    return valor if isinstance(valor, int) and not isinstance(valor, bool) else None
+
+async def _ver_chamado(conexao: tempo_real.ConexaoWS, message: dict):
+    """
+    view_ticket: presença no chamado e confirmação de leitura até
+    ultimo_comentario_id. Repetido pelo frontend enquanto o detalhe está
+    aberto; o banco só é tocado quando a leitura avança.
+    """
+    chamado_id = _inteiro(message.get('ticket_id'))
+    ate = _inteiro(message.get('ultimo_comentario_id'))
+    if chamado_id is None:
+        return
+    gravada = presenca.PRESENCA.leitura_gravada(conexao, chamado_id)
+    if gravada is not None and ate is not None and ate <= gravada:
+        presenca.PRESENCA.entrar(conexao, chamado_id)
+        return
+    leitura = await run_in_threadpool(_gravar_leitura, conexao, chamado_id, ate)
+    if leitura is None:
+        return  # chamado inexistente ou de outro usuário
+    presenca.PRESENCA.entrar(conexao, chamado_id, leitura if leitura != gravada else None)
+
+async def _receber_mensagens(conexao: tempo_real.ConexaoWS):
+    while True:
+        # Receive and handle messages
+        message = await conexao.websocket.receive_json()
+        conexao.ultima_mensagem = time.monotonic()
+
+        # Handle different message types
+        if message.get('type') == 'view_ticket':
+            await _ver_chamado(conexao, message)
+        elif message.get('type') == 'leave_ticket':
+            presenca.PRESENCA.sair(conexao)
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, last_event_id: str = Query(None)):
+    await websocket.accept()
+    usuario = await _autenticar_websocket(websocket)
+    if usuario is None:
+        metrics.WS_ENCERRAMENTOS.labels("nao_autenticado").inc()
+        await websocket.close(code=tempo_real.FECHAMENTO_NAO_AUTENTICADO)
+        return
+
+    conexao = await manager.connect(websocket, usuario, last_event_id)
+    tarefas = [
+        asyncio.create_task(_receber_mensagens(conexao)),
+        asyncio.create_task(conexao.enviar()),
+        asyncio.create_task(conexao.heartbeat(
+            db_settings.ws_ping_intervalo_segundos, db_settings.ws_ping_timeout_segundos
+        )),
+        asyncio.create_task(conexao.encerrada.wait()),
+    ]
     try:
-        while True:
-            # Receive and handle messages
-            data = await websocket.receive_text()
-            message = json.loads(data)
-
-            # Handle different message types
-            if message.get('type') == 'view_ticket':
-                # Broadcast that ticket was viewed (include user_id to avoid self-marking)
-                await manager.broadcast({
-                    "type": "ticket_viewed",
-                    "ticket_id": message.get('ticket_id'),
-                    "user_id": message.get('user_id')
-                })
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        # Termina quando o cliente sai, o envio falha ou o servidor encerra a conexão
+        await asyncio.wait(tarefas, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        manager.disconnect(conexao)
+        presenca.PRESENCA.sair(conexao)
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            try:
+                await websocket.close(code=conexao.codigo_fechamento or 1000)
+            except Exception:
+                pass
+
+def _evento_sse(mensagem: dict) -> str:
+    return f"id: {mensagem['id']}\ndata: {json.dumps(mensagem)}\n\n"
+
+@app.get("/api/eventos/stream")
+async def stream_eventos(
+    request: Request,
+    last_event_id: str = Header(None),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Server-Sent Events com os mesmos eventos do WebSocket (alternativa quando
+    o WebSocket não passa por proxy/firewall). Com Last-Event-ID, reenvia os
+    eventos perdidos desde ele; sem, começa pelos próximos.
+    """
+    registro = tempo_real.REGISTRO
+    keepalive = db_settings.sse_keepalive_segundos
+
+    async def gerar():
+        ultimo_id = last_event_id or registro.ultimo_id
+        metrics.SSE_CONEXOES.inc()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                eventos = tempo_real.pendentes(ultimo_id, "sse")
+                for mensagem in eventos:
+                    yield _evento_sse(mensagem)
+                    ultimo_id = mensagem["id"]
+                if eventos:
+                    continue
+                if await request.is_disconnected():
+                    break
+                if not await registro.aguardar(keepalive):
+                    yield ": keep-alive\n\n"
+        finally:
+            metrics.SSE_CONEXOES.dec()
+
+    return StreamingResponse(gerar(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx: não bufferizar o stream
+    })
 
 # ============================================================================
 # ENDPOINTS DE AUTENTICAÇÃO
@@ -104,6 +377,8 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.post("/api/auth/login", response_model=Token)
 async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     """Login de usuário"""
+    # Antes do bcrypt: tentativas em excesso nem chegam a custar CPU
+    await rate_limit.verificar_limite_email(login_data.email, rate_limit.LIMITE_LOGIN_POR_EMAIL)
     user = authenticate_user(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(
@@ -153,6 +428,7 @@ async def criar_usuario(
         tipo=usuario.tipo
     )
     db.add(db_user)
+    cache.invalidar(db, "usuarios_ti")
     db.commit()
     db.refresh(db_user)
 
@@ -192,6 +468,7 @@ async def importar_usuarios(
                 tipo=usuario_data.tipo
             )
             db.add(novo_usuario)
+            cache.invalidar(db, "usuarios_ti")
             db.commit()
             db.refresh(novo_usuario)
 
@@ -227,20 +504,58 @@ async def importar_usuarios(
 
 @app.get("/api/usuarios", response_model=List[UsuarioResponse])
 async def listar_usuarios(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Usuario = Depends(get_current_ti_user)
 ):
     """Listar todos os usuários (somente TI)"""
     usuarios = db.query(Usuario).all()
     return usuarios
 
+def _no_primario(db: Session, carregar):
+    """
+    Faltas do cache são carregadas do primário: uma réplica atrasada
+    devolveria o valor antigo logo depois da invalidação, e ele ficaria
+    guardado (e na ETag) até o TTL
+    """
+    if db.get_bind() is engine:
+        return carregar(db)
+    with SessionLocal() as primario:
+        return carregar(primario)
+
+def _carregar_usuarios_ti(db: Session):
+    """(ETag, última modificação, usuários ativos do TI) para o cache"""
+    # Todos do TI, não só os ativos: desativar muda atualizado_em
+    total, ultima_modificacao = db.query(func.count(Usuario.id), func.max(Usuario.atualizado_em)).filter(
+        Usuario.tipo == 'ti'
+    ).one()
+    usuarios = db.query(Usuario).filter(Usuario.tipo == 'ti', Usuario.ativo == True).all()
+    return (
+        condicional.etag_conjunto(total, ultima_modificacao=ultima_modificacao),
+        ultima_modificacao,
+        [UsuarioResponse.model_validate(usuario) for usuario in usuarios],
+    )
+
+def _usuarios_por_id(db: Session, ids) -> dict:
+    """Usuários embutidos nas respostas, do cache (os ausentes numa consulta só)"""
+    def carregar(faltando):
+        return _no_primario(db, lambda sessao: {
+            usuario.id: UsuarioResponse.model_validate(usuario)
+            for usuario in sessao.query(Usuario).filter(Usuario.id.in_(faltando))
+        })
+    return cache.USUARIOS.obter_varios(set(ids) - {None}, carregar)
+
 @app.get("/api/usuarios/ti", response_model=List[UsuarioResponse])
 async def listar_usuarios_ti(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    """Listar usuários do TI (para atribuição)"""
-    usuarios = db.query(Usuario).filter(Usuario.tipo == 'ti', Usuario.ativo == True).all()
+    """Listar usuários do TI (para atribuição, em cache); 304 se a lista não mudou"""
+    etag, ultima_modificacao, usuarios = cache.USUARIOS_TI.obter("ativos", lambda: _no_primario(db, _carregar_usuarios_ti))
+    if condicional.nao_modificado(request, etag, ultima_modificacao):
+        return condicional.resposta_304(etag, ultima_modificacao)
+    condicional.aplicar(response, etag, ultima_modificacao)
     return usuarios
 
 @app.put("/api/usuarios/{usuario_id}", response_model=UsuarioResponse)
@@ -259,6 +574,8 @@ async def atualizar_usuario(
     for field, value in update_data.items():
         setattr(db_user, field, value)
 
+    cache.invalidar(db, "usuarios", usuario_id)
+    cache.invalidar(db, "usuarios_ti")
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -267,13 +584,17 @@ async def atualizar_usuario(
 # ENDPOINTS DE CHAMADOS
 # ============================================================================
 
-@app.post("/api/chamados", response_model=ChamadoResponse)
+def _solicitante_visivel(current_user: Usuario):
+    """Restrição de solicitante nas buscas (None = TI, vê todos), como na listagem"""
+    return None if current_user.tipo == 'ti' else current_user.id
+
+@app.post("/api/chamados", response_model=ChamadoCriadoResponse)
 async def criar_chamado(
     chamado: ChamadoCreate,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    """Criar novo chamado"""
+    """Criar novo chamado (a resposta traz os chamados abertos parecidos)"""
     db_chamado = Chamado(
         titulo=chamado.titulo,
         descricao=chamado.descricao,
@@ -283,8 +604,27 @@ async def criar_chamado(
         prioridade='media',
         dados_extras=chamado.dados_extras
     )
+    sla.atualizar_prazo(db_chamado)
     db.add(db_chamado)
+    db.flush()
+    eventos.registrar(db, db_chamado.id, TipoEvento.CRIADO, current_user.id, para=db_chamado.status)
+    estatisticas.registrar(db, depois=estatisticas.capturar(db_chamado))
     db.commit()
+
+    # Atribuição automática numa transação curta própria: o lock global de
+    # atribuição não segura a criação
+    atribuido = None
+    if db_settings.atribuicao_automatica:
+        try:
+            antes = estatisticas.capturar(db_chamado)
+            atribuido = atribuicao.atribuir(db, db_chamado)
+            if atribuido:
+                estatisticas.registrar(db, antes, estatisticas.capturar(db_chamado))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            atribuido = None
+            print(f"AVISO: falha na atribuição automática do chamado {db_chamado.id}: {e}")
     db.refresh(db_chamado)
 
     # Notificar via Telegram
@@ -295,6 +635,13 @@ async def criar_chamado(
         prioridade=db_chamado.prioridade,
         usuario_nome=current_user.nome
     )
+    if atribuido:
+        notificar_chamado_atribuido(
+            chamado_id=db_chamado.id,
+            titulo=db_chamado.titulo,
+            atribuido_para_nome=atribuido.nome,
+            atribuido_por_nome="Atribuição automática"
+        )
 
     # Notificar via WebSocket sobre o novo chamado
     await manager.broadcast({
@@ -302,74 +649,470 @@ async def criar_chamado(
         "ticket_id": db_chamado.id
     })
 
+    try:
+        db_chamado.possiveis_duplicados = await run_in_threadpool(
+            duplicados.buscar_duplicados, db, db_chamado.titulo, db_chamado.descricao, db_chamado.id,
+            usuario_id=_solicitante_visivel(current_user)
+        )
+    except Exception as e:
+        print(f"AVISO: falha na busca de chamados duplicados: {e}")
+        db_chamado.possiveis_duplicados = []
+
     return db_chamado
 
-@app.get("/api/chamados", response_model=List[ChamadoListResponse])
-async def listar_chamados(
-    status: str = None,
-    categoria: str = None,
-    prioridade: str = None,
+@app.post("/api/chamados/duplicados", response_model=List[DuplicadoCandidato])
+async def buscar_chamados_duplicados(
+    dados: DuplicadosRequest,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    """Listar chamados"""
-    query = db.query(Chamado)
+    """Chamados abertos parecidos com o texto, antes de abrir um novo"""
+    return await run_in_threadpool(
+        duplicados.buscar_duplicados, db, dados.titulo, dados.descricao, usuario_id=_solicitante_visivel(current_user)
+    )
+
+def _condicoes_listagem(modelo, current_user: Usuario, status: str = None, categoria: str = None,
+                        prioridade: str = None, desde: datetime = None, ate: datetime = None,
+                        extras: dict = None, data_inicio_desde: date = None, data_inicio_ate: date = None) -> list:
+    """Filtros e permissões da listagem, iguais para a tabela quente, o arquivo e a exportação"""
+    condicoes = []
 
     # Se não for TI, mostrar apenas chamados do próprio usuário
     if current_user.tipo != 'ti':
-        query = query.filter(Chamado.usuario_id == current_user.id)
+        condicoes.append(modelo.usuario_id == current_user.id)
 
     # Filtros
     if status:
-        query = query.filter(Chamado.status == status)
+        condicoes.append(modelo.status == status)
     if categoria:
-        query = query.filter(Chamado.categoria == categoria)
+        condicoes.append(modelo.categoria == categoria)
     if prioridade:
-        query = query.filter(Chamado.prioridade == prioridade)
+        condicoes.append(modelo.prioridade == prioridade)
+    if desde:
+        condicoes.append(modelo.criado_em >= desde)
+    if ate:
+        condicoes.append(modelo.criado_em < ate)
+
+    # dados_extras: contenção (@>, índice GIN) e intervalo da data de início
+    # do novo colaborador (índice de expressão parcial); os valores gravados
+    # já vêm normalizados pelo schema da categoria
+    if extras:
+        condicoes.append(modelo.dados_extras.contains(extras))
+    if data_inicio_desde or data_inicio_ate:
+        data_inicio = modelo.dados_extras["data_inicio"].astext
+        condicoes.append(modelo.categoria == "novo_colaborador")
+        if data_inicio_desde:
+            condicoes.append(data_inicio >= data_inicio_desde.isoformat())
+        if data_inicio_ate:
+            condicoes.append(data_inicio <= data_inicio_ate.isoformat())
+
+    return condicoes
+
+def _filtrar_chamados(db: Session, modelo, current_user: Usuario, **filtros):
+    """Query de listagem com as mesmas regras para a tabela quente e o arquivo"""
+    condicoes = _condicoes_listagem(modelo, current_user, **filtros)
+    return db.query(modelo).filter(*condicoes).order_by(modelo.criado_em.desc())
+
+def _filtro_extras(extras: str):
+    """Parâmetro ?extras= (objeto JSON que dados_extras deve conter)"""
+    if not extras:
+        return None
+    try:
+        valor = json.loads(extras)
+    except ValueError:
+        valor = None
+    if not isinstance(valor, dict):
+        raise HTTPException(status_code=422, detail="extras deve ser um objeto JSON")
+    return valor
+
+# Colunas da listagem (usuario/atribuido/nao_lidos são montados à parte)
+CAMPOS_LISTAGEM = [
+    campo for campo in ChamadoListResponse.model_fields if campo not in ("usuario", "atribuido", "nao_lidos")
+]
+
+def _consultar_arquivo(status: str, incluir_arquivo: bool) -> bool:
+    # O arquivo só tem fechados/cancelados
+    return incluir_arquivo and status not in ('aberto', 'em_andamento', 'aguardando', 'resolvido')
+
+@app.get("/api/chamados", response_model=List[ChamadoListResponse])
+async def listar_chamados(
+    request: Request,
+    response: Response,
+    status: str = None,
+    categoria: str = None,
+    prioridade: str = None,
+    extras: str = Query(None, description='Objeto JSON contido em dados_extras, ex.: {"equipamentos": {"notebook": true}}'),
+    data_inicio_desde: date = None,
+    data_inicio_ate: date = None,
+    incluir_arquivo: bool = False,
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Listar chamados (os arquivados só com incluir_arquivo=true); 304 se a lista
+    não mudou. data_inicio_desde/ate (inclusive) filtram novos colaboradores.
+    """
+    filtros = dict(status=status, categoria=categoria, prioridade=prioridade, extras=_filtro_extras(extras),
+                   data_inicio_desde=data_inicio_desde, data_inicio_ate=data_inicio_ate)
+    # Contagem e soma das versões mudam com qualquer criação, exclusão ou
+    # alteração de chamado da lista; usuários entram pelos nomes embutidos
+    modelos = (Chamado, ChamadoArquivo) if _consultar_arquivo(status, incluir_arquivo) else (Chamado,)
+    agregados = [
+        db.query(
+            func.count(modelo.id), func.coalesce(func.sum(modelo.versao), 0), func.max(modelo.atualizado_em),
+            select(func.max(Usuario.perfil_alterado_em)).scalar_subquery()
+        ).filter(*_condicoes_listagem(modelo, current_user, **filtros)).one()
+        for modelo in modelos
+    ]
+    # Contadores de não lidos do usuário (índice por usuário e atualizado_em)
+    leituras_alteradas_em = db.query(func.max(Leitura.atualizado_em)).filter(
+        Leitura.usuario_id == current_user.id
+    ).scalar()
+    ultima_modificacao = _ultima_modificacao(
+        leituras_alteradas_em, *(instante for linha in agregados for instante in linha[2:])
+    )
+    etag = condicional.etag_conjunto(
+        current_user.id, *(valor for linha in agregados for valor in linha[:2]), ultima_modificacao=ultima_modificacao
+    )
+    if condicional.nao_modificado(request, etag, ultima_modificacao):
+        return condicional.resposta_304(etag, ultima_modificacao)
+
+    linhas = (
+        _filtrar_chamados(db, Chamado, current_user, **filtros)
+        .outerjoin(Leitura, (Leitura.chamado_id == Chamado.id) & (Leitura.usuario_id == current_user.id))
+        .add_columns(func.coalesce(Leitura.nao_lidos, 0))
+        .all()
+    )
+    if ChamadoArquivo in modelos:
+        # Arquivados não têm leituras (saem junto com o chamado)
+        arquivados = [(chamado, 0) for chamado in
+                      _filtrar_chamados(db, ChamadoArquivo, current_user, **filtros).all()]
+        linhas = list(heapq.merge(linhas, arquivados, key=lambda linha: linha[0].criado_em, reverse=True))
+    chamados = [chamado for chamado, _ in linhas]
+
+    # Solicitante e responsável vêm do cache de usuários, não de um SELECT por usuário
+    usuarios = _usuarios_por_id(db, [c.usuario_id for c in chamados] + [c.atribuido_para for c in chamados])
+    condicional.aplicar(response, etag, ultima_modificacao)
+    return [
+        {
+            **{campo: getattr(chamado, campo, None) for campo in CAMPOS_LISTAGEM},
+            "nao_lidos": nao_lidos,
+            "usuario": usuarios[chamado.usuario_id],
+            "atribuido": usuarios.get(chamado.atribuido_para),
+        }
+        for chamado, nao_lidos in linhas
+    ]
+
+# Declarada antes de /api/chamados/{chamado_id} para "export" não casar com o id
+@app.get("/api/chamados/export")
+async def exportar_chamados(
+    request: Request,
+    formato: str = Query("csv", pattern="^(csv|xlsx)$"),
+    status: str = None,
+    categoria: str = None,
+    prioridade: str = None,
+    desde: datetime = None,
+    ate: datetime = None,
+    extras: str = None,
+    data_inicio_desde: date = None,
+    data_inicio_ate: date = None,
+    incluir_arquivo: bool = False,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Exportar chamados em CSV ou XLSX (mesmos filtros e permissões da listagem)"""
+    if formato == "xlsx" and not exportacao.xlsx_disponivel():
+        raise HTTPException(status_code=501, detail="Exportação XLSX requer o pacote openpyxl")
+
+    filtros = dict(status=status, categoria=categoria, prioridade=prioridade, desde=desde, ate=ate,
+                   extras=_filtro_extras(extras), data_inicio_desde=data_inicio_desde, data_inicio_ate=data_inicio_ate)
+    condicoes = _condicoes_listagem(Chamado, current_user, **filtros)
+    condicoes_arquivo = None
+    if _consultar_arquivo(status, incluir_arquivo):
+        condicoes_arquivo = _condicoes_listagem(ChamadoArquivo, current_user, **filtros)
+
+    # Sessão própria, fechada pelo gerador: a do Depends é encerrada antes do
+    # corpo da resposta ser enviado
+    sessao = sessao_leitura(request)
+    nome = f"chamados_{datetime.now():%Y%m%d_%H%M}.{formato}"
+    if formato == "xlsx":
+        conteudo = exportacao.gerar_xlsx(sessao, condicoes, condicoes_arquivo)
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        conteudo = exportacao.gerar_csv(sessao, condicoes, condicoes_arquivo)
+        media_type = "text/csv"
+    return StreamingResponse(
+        conteudo,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nome}"'}
+    )
 
-    chamados = query.order_by(Chamado.criado_em.desc()).all()
-    return chamados
+def _usuarios_alterados_em(db: Session):
+    return db.query(func.max(Usuario.perfil_alterado_em)).scalar()
+
+def _etag(chamado, usuarios_em) -> str:
+    return condicional.etag_chamado(
+        chamado.versao, max((c.id for c in chamado.comentarios), default=0), usuarios_em
+    )
+
+def _ultima_modificacao(*instantes):
+    return max((instante for instante in instantes if instante), default=None)
+
+def _versoes_if_match(valor: str):
+    """
+    Versões aceitas pelo If-Match (None = qualquer uma: cabeçalho ausente ou
+    "*"). Vale o "versao" do corpo ou a ETag do GET (W/"versao-comentario"):
+    só a versão conta, comentários novos não conflitam com a edição.
+    """
+    if not valor or valor.strip() == "*":
+        return None
+    versoes = set()
+    for etag in valor.split(","):
+        etag = etag.strip()
+        versao = (etag[2:] if etag.startswith("W/") else etag).strip('"').split("-")[0]
+        if versao.isdigit():
+            versoes.add(int(versao))
+    return versoes
+
+def _validadores_chamado(db: Session, modelo, modelo_comentario, chamado_id: int):
+    """Dono, versão e instantes que mudam a representação do chamado, numa consulta sem relacionamentos"""
+    return db.query(
+        modelo.usuario_id, modelo.versao, modelo.atualizado_em,
+        select(func.max(modelo_comentario.id)).where(modelo_comentario.chamado_id == modelo.id).scalar_subquery(),
+        select(func.max(modelo_comentario.criado_em)).where(modelo_comentario.chamado_id == modelo.id).scalar_subquery(),
+        # Nomes de solicitante, responsável e autores vêm embutidos na resposta;
+        # perfil_alterado_em ignora senha, habilidades e usuários novos
+        select(func.max(Usuario.perfil_alterado_em)).scalar_subquery(),
+    ).filter(modelo.id == chamado_id).first()
+
+def _pode_ver(current_user: Usuario, chamado) -> bool:
+    return current_user.tipo == 'ti' or chamado.usuario_id == current_user.id
+
+def _conflito(db: Session, chamado, current_user: Usuario) -> HTTPException:
+    """
+    409 com o estado atual, para o cliente refazer a alteração sobre ele; o
+    estado só vai para quem pode ler o chamado (404 se ele sumiu no meio)
+    """
+    if chamado is None:
+        return HTTPException(status_code=404, detail="Chamado não encontrado")
+    mensagem = "O chamado foi alterado por outra pessoa. Confira o estado atual e tente novamente."
+    if not _pode_ver(current_user, chamado):
+        return HTTPException(status_code=409, detail={"mensagem": mensagem})
+    return HTTPException(
+        status_code=409,
+        detail={"mensagem": mensagem, "chamado": jsonable_encoder(ChamadoResponse.model_validate(chamado))},
+        headers={"ETag": _etag(chamado, _usuarios_alterados_em(db))}
+    )
 
 @app.get("/api/chamados/{chamado_id}", response_model=ChamadoResponse)
 async def obter_chamado(
     chamado_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    incluir_arquivo: bool = False,
+    db: Session = Depends(get_read_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    """Obter detalhes de um chamado"""
-    chamado = db.query(Chamado).filter(Chamado.id == chamado_id).first()
+    """
+    Obter detalhes de um chamado (procura no arquivo com incluir_arquivo=true).
+    Responde 304 se o cliente já tem a versão atual (If-None-Match/If-Modified-Since)
+    """
+    modelo = Chamado
+    validadores = _validadores_chamado(db, Chamado, Comentario, chamado_id)
+    if not validadores and incluir_arquivo:
+        modelo = ChamadoArquivo
+        validadores = _validadores_chamado(db, ChamadoArquivo, ComentarioArquivo, chamado_id)
 
-    if not chamado:
+    if not validadores:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
+    usuario_id, versao, atualizado_em, ultimo_comentario, ultimo_comentario_em, usuarios_em = validadores
+
     # Verificar permissão
-    if current_user.tipo != 'ti' and chamado.usuario_id != current_user.id:
+    if current_user.tipo != 'ti' and usuario_id != current_user.id:
         raise HTTPException(status_code=403, detail="Sem permissão para acessar este chamado")
 
+    ultima_modificacao = _ultima_modificacao(atualizado_em, ultimo_comentario_em, usuarios_em)
+    etag = condicional.etag_chamado(versao, ultimo_comentario, usuarios_em)
+    if condicional.nao_modificado(request, etag, ultima_modificacao):
+        return condicional.resposta_304(etag, ultima_modificacao)
+
+    chamado = db.query(modelo).filter(modelo.id == chamado_id).first()
+    # Validadores do que foi carregado (pode ter mudado desde a consulta acima);
+    # a ETag também serve de If-Match no PUT
+    condicional.aplicar(response, _etag(chamado, usuarios_em), ultima_modificacao)
     return chamado
 
+@app.get("/api/chamados/{chamado_id}/eventos", response_model=List[EventoResponse])
+async def listar_eventos_chamado(
+    chamado_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Histórico de alterações do chamado, em ordem cronológica"""
+    chamado = (
+        db.query(Chamado.usuario_id).filter(Chamado.id == chamado_id).first()
+        or db.query(ChamadoArquivo.usuario_id).filter(ChamadoArquivo.id == chamado_id).first()
+    )
+
+    # Chamados excluídos continuam com histórico, visível só para TI
+    if current_user.tipo != 'ti':
+        if not chamado:
+            raise HTTPException(status_code=404, detail="Chamado não encontrado")
+        if chamado.usuario_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Sem permissão para acessar este chamado")
+
+    historico = (
+        db.query(ChamadoEvento)
+        .filter(ChamadoEvento.chamado_id == chamado_id)
+        .order_by(ChamadoEvento.id)
+        .all()
+    )
+    if not historico and not chamado:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    return [eventos.como_dict(evento) for evento in historico]
+
+@app.get("/api/chamados/{chamado_id}/leituras", response_model=List[LeituraResponse])
+async def listar_leituras_chamado(
+    chamado_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Até qual comentário cada usuário já viu o chamado (as atualizações chegam pelo WebSocket)"""
+    chamado = db.query(Chamado.usuario_id).filter(Chamado.id == chamado_id).first()
+    if not chamado:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    if current_user.tipo != 'ti' and chamado.usuario_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Sem permissão para acessar este chamado")
+
+    leituras = (
+        db.query(Leitura.usuario_id, Usuario.nome, Leitura.ultimo_comentario_id, Leitura.lido_em)
+        .join(Usuario, Usuario.id == Leitura.usuario_id)
+        .filter(Leitura.chamado_id == chamado_id, Leitura.lido_em.isnot(None))
+        .order_by(Leitura.lido_em)
+        .all()
+    )
+    return [leitura._asdict() for leitura in leituras]
+
+@app.post("/api/chamados/{chamado_id}/leituras")
+async def registrar_leitura_chamado(
+    chamado_id: int,
+    dados: LeituraCreate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Marca o chamado como lido até o comentário indicado e zera/recalcula os
+    não lidos. Pelo WebSocket (view_ticket) isso já acontece junto com a
+    presença; esta rota serve clientes sem WebSocket.
+    """
+    leitura = presenca.registrar_leitura(
+        db, current_user.id, current_user.tipo == 'ti', chamado_id, dados.ultimo_comentario_id
+    )
+    if leitura is None:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    db.commit()
+    return {"ultimo_comentario_id": leitura}
+
+@app.patch("/api/chamados/bulk", response_model=ChamadosLoteResponse)
+async def atualizar_chamados_em_lote(
+    dados: ChamadosLoteUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Altera status, prioridade e/ou responsável de vários chamados numa
+    transação, com as mesmas permissões do PUT: o TI altera tudo; o
+    funcionário só cancela os próprios chamados
+    """
+    alteracoes = dados.dict(exclude_unset=True, exclude={"ids"})
+    if current_user.tipo != 'ti':
+        alteracoes = {"status": "cancelado"} if alteracoes.get("status") == "cancelado" else {}
+    if not alteracoes:
+        raise HTTPException(status_code=400, detail="Nenhuma alteração permitida informada")
+    if any(campo in alteracoes and alteracoes[campo] is None for campo in ("status", "prioridade")):
+        raise HTTPException(status_code=400, detail="Status e prioridade não podem ser nulos")
+    if alteracoes.get("atribuido_para") is not None:
+        atribuido = db.query(Usuario).filter(Usuario.id == alteracoes["atribuido_para"]).first()
+        if not atribuido:
+            raise HTTPException(status_code=400, detail="Usuário atribuído não encontrado")
+
+    ids = sorted(set(dados.ids))
+    chamados = lote.travar(db, ids)
+    encontrados = {c.id for c in chamados}
+    faltando = [i for i in ids if i not in encontrados]
+    if faltando:
+        raise HTTPException(status_code=404, detail=f"Chamado(s) não encontrado(s): {', '.join(map(str, faltando))}")
+    if current_user.tipo != 'ti':
+        alheios = [c.id for c in chamados if c.usuario_id != current_user.id]
+        if alheios:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Sem permissão para editar o(s) chamado(s): {', '.join(map(str, alheios))}"
+            )
+
+    mudancas = lote.aplicar(db, chamados, alteracoes, current_user.id)
+    db.commit()
+
+    atualizados = [chamado.id for chamado, _ in mudancas]
+    if mudancas and current_user.tipo == 'ti':
+        # Um resumo só, em vez de uma mensagem por chamado
+        resumo = []
+        for chamado, depois in mudancas:
+            partes = []
+            if depois["status"] != chamado.status:
+                partes.append(f"{chamado.status.upper()} ➡️ {depois['status'].upper()}")
+            if depois["prioridade"] != chamado.prioridade:
+                partes.append(f"prioridade {depois['prioridade']}")
+            if depois["atribuido_para"] != chamado.atribuido_para:
+                partes.append(f"atribuído a {atribuido.nome}" if depois["atribuido_para"] else "sem responsável")
+            resumo.append((chamado.id, chamado.titulo, ", ".join(partes)))
+        notificar_alteracoes_em_lote(resumo, current_user.nome)
+
+    if atualizados:
+        await manager.broadcast({
+            "type": "tickets_updated",
+            "ticket_ids": atualizados,
+            **{campo: alteracoes[campo] for campo in ("status", "prioridade") if campo in alteracoes}
+        })
+
+    return {"atualizados": atualizados, "inalterados": sorted(encontrados - set(atualizados))}
+
 @app.put("/api/chamados/{chamado_id}", response_model=ChamadoResponse)
 async def atualizar_chamado(
     chamado_id: int,
     chamado_update: ChamadoUpdate,
+    response: Response,
+    if_match: str = Header(None),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    """Atualizar chamado"""
+    """
+    Atualizar chamado. Com If-Match (ETag do GET), a alteração só é aplicada
+    se o chamado ainda estiver naquela versão; senão, 409 com o estado atual.
+    Sem If-Match, o UPDATE ainda confere a versão lida nesta requisição
+    (version_id_col), sem manter o registro travado.
+    """
     chamado = db.query(Chamado).filter(Chamado.id == chamado_id).first()
 
     if not chamado:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
+    # Permissão antes do If-Match: o 409 traz o chamado inteiro
+    if not _pode_ver(current_user, chamado):
+        raise HTTPException(status_code=403, detail="Sem permissão para editar este chamado")
+
+    versoes = _versoes_if_match(if_match)
+    if versoes is not None and chamado.versao not in versoes:
+        raise _conflito(db, chamado, current_user)
+
+    antes = eventos.capturar(chamado)
+    serie_antes = estatisticas.capturar(chamado)
+
     # Verificar permissões
     if current_user.tipo == 'ti':
         # TI pode atualizar tudo
         update_data = chamado_update.dict(exclude_unset=True)
 
-        # Capturar mudanças de status para notificação
-        status_antigo = chamado.status
-        atribuido_antigo = chamado.atribuido_para
-
         for field, value in update_data.items():
             setattr(chamado, field, value)
 
@@ -378,34 +1121,9 @@ async def atualizar_chamado(
             if update_data['status'] in ['resolvido', 'fechado']:
                 chamado.fechado_em = datetime.utcnow()
 
-            # Notificar mudança de status
-            if status_antigo != update_data['status']:
-                notificar_alteracao_status(
-                    chamado_id=chamado.id,
-                    titulo=chamado.titulo,
-                    status_antigo=status_antigo,
-                    status_novo=update_data['status'],
-                    usuario_nome=current_user.nome
-                )
-
-        # Se foi atribuído, notificar
-        if 'atribuido_para' in update_data and update_data['atribuido_para'] != atribuido_antigo:
-            if update_data['atribuido_para']:
-                atribuido = db.query(Usuario).filter(Usuario.id == update_data['atribuido_para']).first()
-                if atribuido:
-                    notificar_chamado_atribuido(
-                        chamado_id=chamado.id,
-                        titulo=chamado.titulo,
-                        atribuido_para_nome=atribuido.nome,
-                        atribuido_por_nome=current_user.nome
-                    )
-
     else:
         # Funcionário só pode editar título, descrição e categoria do próprio chamado
-        # E também pode cancelar o próprio chamado
-        if chamado.usuario_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Sem permissão para editar este chamado")
-
+        # (permissão conferida acima) e também pode cancelar o próprio chamado
         campos_permitidos = ['titulo', 'descricao', 'categoria']
         update_data_dict = chamado_update.dict(exclude_unset=True)
         update_data = {k: v for k, v in update_data_dict.items() if k in campos_permitidos}
@@ -417,9 +1135,52 @@ async def atualizar_chamado(
         for field, value in update_data.items():
             setattr(chamado, field, value)
 
+    if 'prioridade' in update_data or 'categoria' in update_data:
+        sla.atualizar_prazo(chamado)
+
+    # Sem a categoria no corpo, o schema de dados_extras só é conhecido aqui
+    if 'dados_extras' in update_data or 'categoria' in update_data:
+        try:
+            chamado.dados_extras = validar_dados_extras(chamado.categoria, chamado.dados_extras)
+        except ValidationError as e:
+            db.rollback()
+            raise RequestValidationError(
+                [{**erro, "loc": ("body", "dados_extras", *erro["loc"])} for erro in e.errors(include_url=False)]
+            )
+
+    eventos.registrar_alteracoes(db, chamado, antes, current_user.id)
+    try:
+        # UPDATE ... WHERE id = :id AND versao = :versao_lida
+        db.flush()
+    except StaleDataError:
+        db.rollback()
+        raise _conflito(db, db.query(Chamado).filter(Chamado.id == chamado_id).first(), current_user)
+    estatisticas.registrar(db, serie_antes, estatisticas.capturar(chamado))
+    if chamado.atribuido_para != antes['atribuido_para']:
+        presenca.registrar_responsaveis(db, [(chamado.id, chamado.atribuido_para)])
     db.commit()
     db.refresh(chamado)
 
+    # Notificações só depois do commit: uma alteração rejeitada não notifica
+    if current_user.tipo == 'ti':
+        if 'status' in update_data and antes['status'] != chamado.status:
+            notificar_alteracao_status(
+                chamado_id=chamado.id,
+                titulo=chamado.titulo,
+                status_antigo=antes['status'],
+                status_novo=chamado.status,
+                usuario_nome=current_user.nome
+            )
+
+        # Se foi atribuído, notificar
+        if chamado.atribuido and chamado.atribuido_para != antes['atribuido_para']:
+            notificar_chamado_atribuido(
+                chamado_id=chamado.id,
+                titulo=chamado.titulo,
+                atribuido_para_nome=chamado.atribuido.nome,
+                atribuido_por_nome=current_user.nome
+            )
+
     # Notificar via WebSocket sobre a atualização
     await manager.broadcast({
         "type": "ticket_updated",
@@ -427,8 +1188,58 @@ async def atualizar_chamado(
         "status": chamado.status
     })
 
+    response.headers["ETag"] = _etag(chamado, _usuarios_alterados_em(db))
     return chamado
 
+@app.post("/api/chamados/{chamado_id}/desarquivar", response_model=ChamadoResponse)
+async def desarquivar_chamado(
+    chamado_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_ti_user)
+):
+    """Traz um chamado arquivado de volta para as tabelas ativas (somente TI)"""
+    restaurado = await run_in_threadpool(arquivamento.desarquivar, engine, chamado_id, current_user.id)
+    if not restaurado:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado no arquivo")
+    return db.query(Chamado).filter(Chamado.id == chamado_id).first()
+
+@app.post("/api/chamados/{chamado_id}/mesclar", response_model=ChamadoResponse)
+async def mesclar_chamados(
+    chamado_id: int,
+    dados: MesclarRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_ti_user)
+):
+    """
+    Mescla chamados duplicados neste (somente TI): comentários e descrições
+    dos duplicados vão para o pai e os duplicados são fechados, numa transação
+    """
+    ids = sorted(set(dados.duplicados) - {chamado_id})
+    if not ids:
+        raise HTTPException(status_code=400, detail="Informe ao menos um chamado duplicado diferente do pai")
+
+    # Trava pai e duplicados em ordem de id (mesclagens concorrentes não se travam mutuamente)
+    chamados = {
+        c.id: c for c in db.query(Chamado).filter(Chamado.id.in_(ids + [chamado_id]))
+        .order_by(Chamado.id).with_for_update().all()
+    }
+    faltando = [i for i in ids + [chamado_id] if i not in chamados]
+    if faltando:
+        raise HTTPException(status_code=404, detail=f"Chamado(s) não encontrado(s): {', '.join(map(str, faltando))}")
+
+    pai = chamados[chamado_id]
+    duplicados.mesclar(db, pai, [chamados[i] for i in ids], current_user.id)
+    db.commit()
+    db.refresh(pai)
+
+    await manager.broadcast({
+        "type": "tickets_merged",
+        "ticket_id": pai.id,
+        "duplicates": ids
+    })
+
+    return pai
+
 @app.delete("/api/chamados/{chamado_id}")
 async def deletar_chamado(
     chamado_id: int,
@@ -441,6 +1252,8 @@ async def deletar_chamado(
     if not chamado:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
+    eventos.registrar(db, chamado.id, TipoEvento.EXCLUIDO, current_user.id)
+    estatisticas.registrar(db, antes=estatisticas.capturar(chamado))
     db.delete(chamado)
     db.commit()
     return {"message": "Chamado deletado com sucesso"}
@@ -472,6 +1285,9 @@ async def adicionar_comentario(
         comentario=comentario.comentario
     )
     db.add(db_comentario)
+    db.flush()
+    eventos.registrar(db, chamado_id, TipoEvento.COMENTARIO, current_user.id, para=db_comentario.id)
+    presenca.registrar_comentario(db, chamado, db_comentario)
     db.commit()
     db.refresh(db_comentario)
 
@@ -497,10 +1313,11 @@ async def adicionar_comentario(
 
 @app.get("/api/estatisticas", response_model=EstatisticasResponse)
 async def obter_estatisticas(
-    db: Session = Depends(get_db),
+    incluir_arquivo: bool = False,
+    db: Session = Depends(get_read_db),
     current_user: Usuario = Depends(get_current_ti_user)
 ):
-    """Obter estatísticas dos chamados (somente TI)"""
+    """Obter estatísticas dos chamados (somente TI; arquivados com incluir_arquivo=true)"""
 
     # Contagens por status
     total = db.query(Chamado).count()
@@ -524,6 +1341,19 @@ async def obter_estatisticas(
     ).group_by(Chamado.prioridade).all()
     por_prioridade = {pri: count for pri, count in prioridades}
 
+    # O arquivo só tem fechados/cancelados
+    if incluir_arquivo:
+        arquivados = db.query(
+            ChamadoArquivo.status, ChamadoArquivo.categoria, ChamadoArquivo.prioridade,
+            func.count(ChamadoArquivo.id)
+        ).group_by(ChamadoArquivo.status, ChamadoArquivo.categoria, ChamadoArquivo.prioridade).all()
+        for st, cat, pri, count in arquivados:
+            total += count
+            if st == 'fechado':
+                fechados += count
+            por_categoria[cat] = por_categoria.get(cat, 0) + count
+            por_prioridade[pri] = por_prioridade.get(pri, 0) + count
+
     return {
         "total_chamados": total,
         "abertos": abertos,
@@ -535,6 +1365,52 @@ async def obter_estatisticas(
         "por_prioridade": por_prioridade
     }
 
+@app.get("/api/estatisticas/tempo-em-status", response_model=Dict[str, TempoEmStatus])
+async def obter_tempo_em_status(
+    desde: datetime = None,
+    ate: datetime = None,
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_ti_user)
+):
+    """Tempo total e médio que os chamados passaram em cada status (somente TI)"""
+    return await run_in_threadpool(eventos.tempo_em_status, db, desde, ate)
+
+@app.get("/api/estatisticas/serie", response_model=SerieEstatisticasResponse)
+async def obter_serie_estatisticas(
+    desde: date = None,
+    ate: date = None,
+    granularidade: str = Query("dia", pattern="^(dia|semana|mes)$"),
+    categoria: str = None,
+    atribuido_para: int = None,
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_ti_user)
+):
+    """
+    Série de chamados criados/encerrados, backlog e tempo de resolução por
+    período, lida das estatísticas diárias pré-agregadas (somente TI).
+    Padrão: últimos 30 dias.
+    """
+    ate = ate or estatisticas.hoje()
+    desde = desde or ate - timedelta(days=29)
+    if desde > ate:
+        raise HTTPException(status_code=400, detail="'desde' deve ser anterior a 'ate'")
+    return await run_in_threadpool(estatisticas.serie, db, desde, ate, granularidade, categoria, atribuido_para)
+
+# ============================================================================
+# ENDPOINTS DE SLA
+# ============================================================================
+
+@app.get("/api/sla/chamados", response_model=List[ChamadoListResponse])
+async def listar_chamados_sla(
+    situacao: str = Query("em_risco", pattern="^(em_risco|violado)$"),
+    janela_horas: float = Query(None, gt=0),
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_ti_user)
+):
+    """Chamados abertos com SLA vencido ou vencendo nas próximas horas (somente TI)"""
+    janela = janela_horas or db_settings.sla_janela_risco_horas
+    return sla.filtrar_por_situacao(db.query(Chamado), Chamado, situacao, janela).all()
+
 # ============================================================================
 # ENDPOINT DE HEALTH CHECK
 # ============================================================================
@@ -573,6 +1449,51 @@ async def health_check():
         "version": "1.0.0"
     }
 
+def _metricas_pool():
+    engines = [("primario", engine)]
+    if read_engine is not engine:
+        engines.append(("replica", read_engine))
+    for nome, eng in engines:
+        estatisticas = estatisticas_pool(eng)
+        for chave in ("em_uso", "ociosas", "overflow", "esperas", "timeouts"):
+            yield (nome, chave), estatisticas[chave]
+        yield (nome, "tempo_espera_total_segundos"), estatisticas["tempo_espera_total_ms"] / 1000
+
+metrics.GaugeCallback(
+    "chamados_db_pool", "Estado e esperas do pool de conexões", _metricas_pool, ("pool", "stat")
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas():
+    """Métricas no formato de exposição do Prometheus"""
+    return PlainTextResponse(metrics.REGISTRO.expor(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/profiling", response_model=ProfilingConfig)
+async def obter_profiling(current_user: Usuario = Depends(get_current_ti_user)):
+    """Configuração atual do profiling de SQL deste worker (somente TI)"""
+    return profiling.configuracao.como_dict()
+
+@app.put("/api/admin/profiling", response_model=ProfilingConfig)
+async def atualizar_profiling(
+    config: ProfilingConfigUpdate,
+    current_user: Usuario = Depends(get_current_ti_user)
+):
+    """Liga/desliga o profiling e ajusta amostragem e limite de lentidão em runtime (somente TI)"""
+    return profiling.atualizar_configuracao(**config.dict(exclude_unset=True))
+
+@app.get("/api/admin/agendador", response_model=List[TarefaAgendadaResponse])
+async def listar_tarefas_agendadas(current_user: Usuario = Depends(get_current_ti_user)):
+    """Tarefas agendadas deste worker: agenda, liderança e última execução (somente TI)"""
+    return agendador.AGENDADOR.situacao()
+
+@app.get("/health/pool")
+async def health_pool():
+    """Métricas do pool de conexões (em uso, overflow, tempo de espera)"""
+    return {
+        "primario": estatisticas_pool(engine),
+        "replica": estatisticas_pool(read_engine) if read_engine is not engine else None
+    }
+
 # ============================================================================
 # ENDPOINTS DE ALTERAÇÃO DE SENHA
 # ============================================================================
@@ -582,6 +1503,8 @@ async def send_verification_code(request: SendVerificationCodeRequest, db: Sessi
     """
     Envia código de verificação por email para alteração de senha
     """
+    await rate_limit.verificar_limite_email(request.email, rate_limit.LIMITE_ENVIO_CODIGO_POR_EMAIL)
+
     # Verificar se o usuário existe
     user = db.query(Usuario).filter(Usuario.email == request.email).first()
     if not user:
@@ -610,6 +1533,7 @@ async def verify_verification_code(request: VerifyCodeRequest):
     """
     Verifica se o código de verificação é válido
     """
+    await rate_limit.verificar_limite_email(request.email, rate_limit.LIMITE_CODIGO_POR_EMAIL)
     is_valid = verify_code(request.email, request.code)
 
     if not is_valid:
@@ -628,6 +1552,8 @@ async def change_password(request: ChangePasswordRequest, db: Session = Depends(
     """
     Altera a senha do usuário após validação do código
     """
+    await rate_limit.verificar_limite_email(request.email, rate_limit.LIMITE_CODIGO_POR_EMAIL)
+
     # Verificar código novamente
     is_valid = verify_code(request.email, request.code)
 
@@ -0,0 +1,146 @@
+"""
+Arquivamento de chamados encerrados
+
+Chamados fechados/cancelados há mais de ARQUIVAMENTO_DIAS saem das tabelas
+quentes (chamados, comentarios, anexos) para as tabelas *_arquivo, em lotes
+pequenos: cada lote é um único statement (CTE) numa transação curta, com
+FOR UPDATE SKIP LOCKED, então vários workers podem rodar o arquivador ao
+mesmo tempo sem mover o mesmo chamado duas vezes nem bloquear o uso normal.
+
+As tabelas quentes ficam pequenas e seus índices cabem no cache; os
+endpoints de leitura só consultam o arquivo com incluir_arquivo=true.
+
+Uso manual:
+    python arquivamento.py [--dias 180] [--lote 500]
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from config import get_settings
+from eventos import TipoEvento
+from models import Chamado, Comentario, Anexo
+
+
+def _colunas(modelo) -> str:
+    return ", ".join(coluna.name for coluna in modelo.__table__.columns)
+
+
+COLUNAS_CHAMADO = _colunas(Chamado)
+COLUNAS_COMENTARIO = _colunas(Comentario)
+COLUNAS_ANEXO = _colunas(Anexo)
+
+# Comentários e anexos são copiados e removidos junto com o chamado, tudo no
+# mesmo statement (mesmo snapshot e transação). O DELETE explícito não
+# depende do ON DELETE CASCADE, ausente em bancos criados pelo create_all
+# antigo; os FKs (NO ACTION) só são conferidos no fim do statement.
+SQL_ARQUIVAR_LOTE = text(f"""
+    WITH alvo AS (
+        SELECT id FROM chamados
+        WHERE status IN ('fechado', 'cancelado')
+          AND COALESCE(fechado_em, atualizado_em) < :corte
+        ORDER BY COALESCE(fechado_em, atualizado_em)
+        LIMIT :lote
+        FOR UPDATE SKIP LOCKED
+    ), copia_comentarios AS (
+        INSERT INTO comentarios_arquivo ({COLUNAS_COMENTARIO})
+        SELECT {COLUNAS_COMENTARIO} FROM comentarios WHERE chamado_id IN (SELECT id FROM alvo)
+    ), copia_anexos AS (
+        INSERT INTO anexos_arquivo ({COLUNAS_ANEXO})
+        SELECT {COLUNAS_ANEXO} FROM anexos WHERE chamado_id IN (SELECT id FROM alvo)
+    ), remove_comentarios AS (
+        DELETE FROM comentarios WHERE chamado_id IN (SELECT id FROM alvo)
+    ), remove_anexos AS (
+        DELETE FROM anexos WHERE chamado_id IN (SELECT id FROM alvo)
+    ), movidos AS (
+        DELETE FROM chamados WHERE id IN (SELECT id FROM alvo)
+        RETURNING {COLUNAS_CHAMADO}
+    ), historico AS (
+        INSERT INTO chamado_eventos (chamado_id, tipo, criado_em)
+        SELECT id, {int(TipoEvento.ARQUIVADO)}, :agora FROM movidos
+    )
+    INSERT INTO chamados_arquivo ({COLUNAS_CHAMADO}, arquivado_em)
+    SELECT {COLUNAS_CHAMADO}, :agora FROM movidos
+""")
+
+# Volta para as tabelas quentes (statements separados: o FK de comentarios
+# precisa enxergar o chamado já restaurado)
+SQLS_DESARQUIVAR = (
+    text(f"""
+        INSERT INTO chamados ({COLUNAS_CHAMADO})
+        SELECT {COLUNAS_CHAMADO} FROM chamados_arquivo WHERE id = :id
+    """),
+    text(f"""
+        INSERT INTO comentarios ({COLUNAS_COMENTARIO})
+        SELECT {COLUNAS_COMENTARIO} FROM comentarios_arquivo WHERE chamado_id = :id
+    """),
+    text(f"""
+        INSERT INTO anexos ({COLUNAS_ANEXO})
+        SELECT {COLUNAS_ANEXO} FROM anexos_arquivo WHERE chamado_id = :id
+    """),
+    text("DELETE FROM comentarios_arquivo WHERE chamado_id = :id"),
+    text("DELETE FROM anexos_arquivo WHERE chamado_id = :id"),
+    text("DELETE FROM chamados_arquivo WHERE id = :id"),
+    text(f"INSERT INTO chamado_eventos (chamado_id, usuario_id, tipo, criado_em) "
+         f"VALUES (:id, :usuario_id, {int(TipoEvento.DESARQUIVADO)}, :agora)"),
+)
+
+
+def arquivar_lote(engine, corte: datetime, lote: int) -> int:
+    """Move um lote de chamados encerrados antes de `corte`; retorna quantos moveu"""
+    with engine.begin() as conn:
+        return conn.execute(SQL_ARQUIVAR_LOTE, {"corte": corte, "lote": lote, "agora": datetime.utcnow()}).rowcount
+
+
+def arquivar(engine, dias: int, lote: int = 500, pausa: float = 0.1) -> int:
+    """Arquiva em lotes até não restar candidato; retorna o total movido"""
+    corte = datetime.utcnow() - timedelta(days=dias)
+    total = 0
+    while True:
+        movidos = arquivar_lote(engine, corte, lote)
+        total += movidos
+        if movidos < lote:
+            return total
+        # Pausa entre lotes para não competir com o tráfego normal
+        time.sleep(pausa)
+
+
+def desarquivar(engine, chamado_id: int, usuario_id: int = None) -> bool:
+    """Restaura um chamado arquivado (ex.: para reabrir); False se não estava no arquivo"""
+    with engine.begin() as conn:
+        existe = conn.execute(
+            text("SELECT 1 FROM chamados_arquivo WHERE id = :id FOR UPDATE"), {"id": chamado_id}
+        ).scalar()
+        if not existe:
+            return False
+        params = {"id": chamado_id, "usuario_id": usuario_id, "agora": datetime.utcnow()}
+        for sql in SQLS_DESARQUIVAR:
+            conn.execute(sql, params)
+    return True
+
+
+def executar(engine, dias: int, lote: int) -> int:
+    """Uma passada do arquivador (tarefa agendada)"""
+    movidos = arquivar(engine, dias, lote)
+    if movidos:
+        print(f"Arquivamento: {movidos} chamado(s) movido(s) para o arquivo")
+    return movidos
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+
+    from database import DATABASE_URL
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Arquiva chamados fechados/cancelados antigos")
+    parser.add_argument("--dias", type=int, default=settings.arquivamento_dias)
+    parser.add_argument("--lote", type=int, default=settings.arquivamento_lote)
+    args = parser.parse_args()
+
+    total = arquivar(create_engine(DATABASE_URL, poolclass=NullPool), args.dias, args.lote)
+    print(f"✓ {total} chamado(s) arquivado(s)")
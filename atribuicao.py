@@ -0,0 +1,202 @@
+"""
+Atribuição automática de chamados novos a usuários do TI
+
+Estratégias (ATRIBUICAO_AUTOMATICA):
+    rodizio       próximo usuário ativo do TI depois do último atribuído automaticamente
+    menos_abertos usuário com menos chamados abertos atribuídos
+    habilidades   menos_abertos entre os usuários com a categoria do chamado em
+                  usuarios.habilidades (todos, se ninguém tiver)
+
+A carga de cada usuário fica num índice em memória por processo, atualizado
+de forma incremental a partir de chamado_eventos (CRIADO, STATUS, ATRIBUICAO,
+EXCLUIDO) em vez de contar os chamados a cada criação. Aplicar um evento é
+idempotente (define o estado, não soma), então cada sincronização relê uma
+pequena janela antes do cursor para pegar eventos de ids menores confirmados
+depois. A recarga completa, que corrige o que mudou fora da API, é uma
+tarefa agendada local (cada worker tem o seu índice), fora das requisições.
+
+A escolha roda numa transação curta própria, depois que a criação já foi
+confirmada, sob pg_advisory_xact_lock: entre workers, cada atribuição vê as
+anteriores já confirmadas (o lock só é solto no commit), então atribuições
+simultâneas não escolhem com a carga desatualizada, e o lock segura só a
+escolha e o registro, não a criação. As atribuições automáticas ficam no
+histórico com usuario_id NULL.
+"""
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+import eventos
+import presenca
+from config import get_settings
+from eventos import TipoEvento
+from models import Usuario
+
+ESTRATEGIAS = ("rodizio", "menos_abertos", "habilidades")
+
+if get_settings().atribuicao_automatica not in ("",) + ESTRATEGIAS:
+    raise ValueError(
+        f"ATRIBUICAO_AUTOMATICA inválida: {get_settings().atribuicao_automatica!r} "
+        f"(use {', '.join(ESTRATEGIAS)} ou vazio para desligar)"
+    )
+
+CHAVE_LOCK_ATRIBUICAO = 726_039
+
+# Eventos relidos antes do cursor a cada sincronização (ids menores confirmados depois)
+JANELA_RELEITURA = 100
+
+STATUS_ABERTOS = ("aberto", "em_andamento", "aguardando")
+_CODIGOS_ABERTOS = {eventos.codificar(TipoEvento.STATUS, status) for status in STATUS_ABERTOS}
+
+SQL_REABERTOS = text(
+    "SELECT id, atribuido_para FROM chamados WHERE id IN :ids AND status IN ('aberto', 'em_andamento', 'aguardando')"
+).bindparams(bindparam("ids", expanding=True))
+
+SQL_EVENTOS = text(f"""
+    SELECT id, chamado_id, tipo, para, usuario_id FROM chamado_eventos
+    WHERE id > :cursor AND tipo IN ({int(TipoEvento.CRIADO)}, {int(TipoEvento.STATUS)},
+                                    {int(TipoEvento.ATRIBUICAO)}, {int(TipoEvento.EXCLUIDO)})
+    ORDER BY id
+""")
+
+
+class IndiceCarga:
+    """Chamados abertos por responsável (um por processo)"""
+
+    def __init__(self):
+        self.responsavel = {}       # chamado aberto -> usuário atribuído (None = ninguém)
+        self.abertos = {}           # usuário -> quantidade de chamados abertos
+        self.cursor = 0             # maior id de evento aplicado
+        self.ultimo_automatico = None
+        self.carregado_em = None
+        self._lock = threading.Lock()  # recarga (tarefa agendada) x atribuições no threadpool
+
+    def _definir(self, chamado_id: int, usuario_id):
+        anterior = self.responsavel.get(chamado_id)
+        if anterior is not None:
+            self.abertos[anterior] -= 1
+        self.responsavel[chamado_id] = usuario_id
+        if usuario_id is not None:
+            self.abertos[usuario_id] = self.abertos.get(usuario_id, 0) + 1
+
+    def _remover(self, chamado_id: int):
+        if chamado_id in self.responsavel:
+            anterior = self.responsavel.pop(chamado_id)
+            if anterior is not None:
+                self.abertos[anterior] -= 1
+
+    def recarregar(self, db):
+        """Estado completo a partir dos chamados abertos (lido fora do lock e trocado de uma vez)"""
+        novo = IndiceCarga()
+        cursor = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM chamado_eventos")).scalar()
+        for chamado_id, usuario_id in db.execute(
+            text("SELECT id, atribuido_para FROM chamados WHERE status IN ('aberto', 'em_andamento', 'aguardando')")
+        ):
+            novo._definir(chamado_id, usuario_id)
+        ultimo_automatico = db.execute(text(f"""
+            SELECT para FROM chamado_eventos
+            WHERE tipo = {int(TipoEvento.ATRIBUICAO)} AND usuario_id IS NULL
+            ORDER BY id DESC LIMIT 1
+        """)).scalar()
+        with self._lock:
+            self.responsavel, self.abertos = novo.responsavel, novo.abertos
+            self.ultimo_automatico = ultimo_automatico
+            # Eventos confirmados durante a leitura são reaplicados na próxima sincronização
+            self.cursor = max(cursor - JANELA_RELEITURA, 0)
+            self.carregado_em = time.monotonic()
+
+    def sincronizar(self, db):
+        """Aplica os eventos novos (e os da janela de releitura)"""
+        with self._lock:
+            self._sincronizar(db)
+
+    def _sincronizar(self, db):
+        reabertos = []
+        ultimo = self.cursor
+        for evento_id, chamado_id, tipo, para, usuario_id in db.execute(
+            SQL_EVENTOS, {"cursor": max(self.cursor - JANELA_RELEITURA, 0)}
+        ):
+            ultimo = max(ultimo, evento_id)
+            if tipo == TipoEvento.CRIADO:
+                if chamado_id not in self.responsavel:
+                    self._definir(chamado_id, None)
+            elif tipo == TipoEvento.STATUS:
+                if para not in _CODIGOS_ABERTOS:
+                    self._remover(chamado_id)
+                elif chamado_id not in self.responsavel:
+                    reabertos.append(chamado_id)
+            elif tipo == TipoEvento.ATRIBUICAO:
+                if chamado_id in self.responsavel:
+                    self._definir(chamado_id, para)
+                if usuario_id is None:
+                    self.ultimo_automatico = para
+            else:
+                self._remover(chamado_id)
+        self.cursor = ultimo
+
+        # Reabertura: o responsável atual vem do chamado
+        if reabertos:
+            for chamado_id, usuario_id in db.execute(SQL_REABERTOS, {"ids": reabertos}):
+                self._definir(chamado_id, usuario_id)
+
+    def escolher(self, estrategia: str, candidatos: list, categoria: str):
+        """Id do usuário escolhido entre (id, habilidades) ativos do TI; None se não houver"""
+        with self._lock:
+            return self._escolher(estrategia, candidatos, categoria)
+
+    def _escolher(self, estrategia: str, candidatos: list, categoria: str):
+        if not candidatos:
+            return None
+        if estrategia == "rodizio":
+            ids = sorted(usuario_id for usuario_id, _ in candidatos)
+            seguintes = [usuario_id for usuario_id in ids if usuario_id > (self.ultimo_automatico or 0)]
+            return (seguintes or ids)[0]
+        if estrategia == "habilidades":
+            habilitados = [c for c in candidatos if categoria in (c[1] or ())]
+            candidatos = habilitados or candidatos
+        return min((self.abertos.get(usuario_id, 0), usuario_id) for usuario_id, _ in candidatos)[1]
+
+    def registrar_escolha(self, chamado_id: int, usuario_id: int):
+        """
+        Reflete no índice deste processo a atribuição automática; o evento
+        volta na próxima sincronização sem efeito (aplicação idempotente)
+        """
+        with self._lock:
+            self._definir(chamado_id, usuario_id)
+            self.ultimo_automatico = usuario_id
+
+
+indice = IndiceCarga()
+
+
+def recarregar_indice(engine):
+    """Recarga completa do índice deste processo (tarefa agendada local)"""
+    with engine.connect() as conn:
+        indice.recarregar(conn)
+
+
+def atribuir(db, chamado, estrategia: str = None):
+    """
+    Atribui o chamado recém-criado (criação já confirmada) e registra o
+    evento; retorna o usuário atribuído ou None. Abre a transação curta que
+    segura o lock: o chamador deve fazer o commit logo em seguida.
+    """
+    estrategia = estrategia or get_settings().atribuicao_automatica
+    if indice.carregado_em is None:
+        # Primeira atribuição antes da tarefa agendada carregar o índice
+        indice.recarregar(db)
+    candidatos = db.query(Usuario.id, Usuario.habilidades).filter(Usuario.tipo == 'ti', Usuario.ativo == True).all()
+
+    db.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": CHAVE_LOCK_ATRIBUICAO})
+    indice.sincronizar(db)
+    usuario_id = indice.escolher(estrategia, candidatos, chamado.categoria)
+    if usuario_id is None:
+        return None
+
+    chamado.atribuido_para = usuario_id
+    eventos.registrar(db, chamado.id, TipoEvento.ATRIBUICAO, None, para=usuario_id)
+    db.flush()
+    presenca.registrar_responsaveis(db, [(chamado.id, usuario_id)])
+    indice.registrar_escolha(chamado.id, usuario_id)
+    return db.get(Usuario, usuario_id)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da atribuição automática com vários processos (workers)
+
+Vários processos criam chamados ao mesmo tempo, cada um com seu próprio
+índice em memória, como workers do uvicorn. Falha (exit 1) se:
+  - a carga ficar desbalanceada (diferença > 1 entre usuários do TI, só com
+    criações, nas estratégias menos_abertos e rodizio);
+  - depois de criações e encerramentos misturados, o índice de um processo
+    sincronizado só pelos eventos divergir da contagem real no banco.
+
+Usa o banco de benchmark (BENCH_DB_NAME, padrão chamados_bench): todos os
+dados dele são apagados.
+
+Uso:
+    python benchmarks/atribuicao.py [--processos 8] [--chamados 200] [--estrategia menos_abertos]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["CHAMADOS_ENV_FILE"] = os.devnull
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "chamados_bench")
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+
+def preparar(usuarios_ti: int):
+    from sqlalchemy import create_engine, insert, text
+    from sqlalchemy.pool import NullPool
+
+    from benchmarks import dados
+    from database import DATABASE_URL
+    from migrate import aplicar_migracoes
+    from models import Usuario
+
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    aplicar_migracoes(engine)
+    with engine.begin() as conn:
+        dados.limpar_dados(conn)
+        conn.execute(text("DELETE FROM estatisticas_diarias"))
+        conn.execute(insert(Usuario), [
+            {"nome": f"TI {i}", "email": f"ti{i}@bench.example.com", "senha_hash": "-", "tipo": "ti", "ativo": True}
+            for i in range(usuarios_ti)
+        ] + [{"nome": "Funcionário", "email": "func@bench.example.com", "senha_hash": "-", "tipo": "funcionario", "ativo": True}])
+        solicitante = conn.execute(text("SELECT id FROM usuarios WHERE tipo = 'funcionario'")).scalar()
+    engine.dispose()
+    return solicitante
+
+
+def worker(args):
+    """Cria chamados (e encerra alguns, com taxa_encerramento > 0); retorna as latências da atribuição"""
+    chamados, solicitante, estrategia, taxa_encerramento, semente = args
+    import atribuicao
+    import eventos
+    from database import SessionLocal
+    from eventos import TipoEvento
+    from models import Chamado
+
+    rng = random.Random(semente)
+    latencias = []
+    meus = []
+    db = SessionLocal()
+    try:
+        for i in range(chamados):
+            chamado = Chamado(titulo=f"Carga {semente}-{i}", descricao="-", categoria="hardware",
+                              usuario_id=solicitante, status="aberto", prioridade="media")
+            db.add(chamado)
+            db.flush()
+            eventos.registrar(db, chamado.id, TipoEvento.CRIADO, solicitante, para="aberto")
+            db.commit()  # como na API: a atribuição roda na sua própria transação
+            inicio = time.perf_counter()
+            atribuicao.atribuir(db, chamado, estrategia)
+            db.commit()
+            latencias.append(time.perf_counter() - inicio)
+            meus.append(chamado.id)
+
+            if meus and rng.random() < taxa_encerramento:
+                alvo = db.get(Chamado, meus.pop(rng.randrange(len(meus))))
+                eventos.registrar(db, alvo.id, TipoEvento.STATUS, solicitante, de=alvo.status, para="fechado")
+                alvo.status = "fechado"
+                db.commit()
+    finally:
+        db.close()
+    return latencias
+
+
+def contagens_reais() -> dict:
+    from sqlalchemy import text
+    from database import engine
+
+    with engine.connect() as conn:
+        return dict(conn.execute(text("""
+            SELECT u.id, COUNT(c.id) FROM usuarios u
+            LEFT JOIN chamados c ON c.atribuido_para = u.id AND c.status IN ('aberto', 'em_andamento', 'aguardando')
+            WHERE u.tipo = 'ti' GROUP BY u.id
+        """)).all())
+
+
+def rodada(pool, processos: int, chamados: int, solicitante: int, estrategia: str, taxa: float, semente: int):
+    inicio = time.perf_counter()
+    resultados = pool.map(worker, [(chamados, solicitante, estrategia, taxa, semente + p) for p in range(processos)])
+    duracao = time.perf_counter() - inicio
+    latencias = sorted(l * 1000 for lista in resultados for l in lista)
+    print(f"  {len(latencias)} atribuições em {duracao:.1f} s ({len(latencias) / duracao:.0f}/s)  "
+          f"p50 {statistics.median(latencias):.2f} ms  p95 {latencias[int(len(latencias) * 0.95)]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da atribuição automática")
+    parser.add_argument("--processos", type=int, default=8)
+    parser.add_argument("--chamados", type=int, default=200, help="chamados por processo em cada rodada")
+    parser.add_argument("--usuarios-ti", type=int, default=7)
+    parser.add_argument("--estrategia", default="menos_abertos", choices=("menos_abertos", "rodizio", "habilidades"))
+    parser.add_argument("--forcar", action="store_true", help="permite banco sem 'bench' no nome")
+    args = parser.parse_args()
+
+    if "bench" not in os.environ["DB_NAME"] and not args.forcar:
+        raise SystemExit(f"✗ O banco '{os.environ['DB_NAME']}' não parece ser de benchmark (todos os dados são apagados).")
+
+    solicitante = preparar(args.usuarios_ti)
+
+    # Índice deste processo: carregado vazio e atualizado só pelos eventos
+    import atribuicao
+    from database import SessionLocal
+    observador = atribuicao.IndiceCarga()
+    with SessionLocal() as db:
+        observador.recarregar(db)
+
+    falhas = []
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Pool(args.processos) as pool:
+        print(f"Rodada 1: {args.processos} processos criando chamados ({args.estrategia})")
+        rodada(pool, args.processos, args.chamados, solicitante, args.estrategia, 0.0, 1)
+        cargas = contagens_reais()
+        print(f"  carga por usuário: {sorted(cargas.values())}")
+        if args.estrategia != "habilidades" and max(cargas.values()) - min(cargas.values()) > 1:
+            falhas.append(f"carga desbalanceada: {cargas}")
+
+        print("Rodada 2: criações e encerramentos simultâneos")
+        rodada(pool, args.processos, args.chamados, solicitante, args.estrategia, 0.5, 1000)
+
+    cargas = contagens_reais()
+    with SessionLocal() as db:
+        observador.sincronizar(db)
+    indice = {usuario_id: observador.abertos.get(usuario_id, 0) for usuario_id in cargas}
+    print(f"  carga real:  {dict(sorted(cargas.items()))}")
+    print(f"  índice:      {dict(sorted(indice.items()))}")
+    if indice != cargas:
+        falhas.append("índice incremental divergiu da contagem no banco")
+
+    for falha in falhas:
+        print(f"✗ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✓ atribuição consistente entre processos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Cenários de carga executados contra o app FastAPI (in-process, via TestClient)
+
+Cada cenário devolve a lista de amostras (latência em segundos, queries da
+requisição). O número de queries vem do header Server-Timing emitido pelo
+profiling, que o runner liga com o header e amostragem de 100%.
+"""
+import re
+import time
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+QUERIES_SERVER_TIMING = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+class Amostra:
+    __slots__ = ("latencia", "queries")
+
+    def __init__(self, latencia: float, queries):
+        self.latencia = latencia
+        self.queries = queries
+
+
+def _queries(response):
+    match = QUERIES_SERVER_TIMING.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else None
+
+
+def requisitar(client, metodo: str, url: str, esperado: int = 200, **kwargs) -> Amostra:
+    inicio = time.perf_counter()
+    response = client.request(metodo, url, **kwargs)
+    latencia = time.perf_counter() - inicio
+    if response.status_code != esperado:
+        raise RuntimeError(f"{metodo} {url}: HTTP {response.status_code} {response.text[:200]}")
+    return Amostra(latencia, _queries(response))
+
+
+def login(client, email: str, senha: str) -> dict:
+    response = client.post("/api/auth/login", json={"email": email, "password": senha})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _em_paralelo(funcao, argumentos, concorrencia: int):
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        return list(executor.map(funcao, argumentos))
+
+
+def kanban(client, ctx: dict, repeticoes: int, concorrencia: int = 1):
+    """Carga do quadro Kanban por usuários de TI: lista de chamados + estatísticas"""
+    headers = ctx["headers_ti"]
+
+    def carregar(_):
+        return [
+            requisitar(client, "GET", "/api/chamados", headers=headers),
+            requisitar(client, "GET", "/api/estatisticas", headers=headers),
+        ]
+
+    return [amostra for par in _em_paralelo(carregar, range(repeticoes), concorrencia) for amostra in par]
+
+
+def detalhe_com_polling(client, ctx: dict, repeticoes: int, polls: int = 5):
+    """Abre o detalhe de um chamado e faz o polling de comentários (a cada 5 s no front)"""
+    headers = ctx["headers_ti"]
+    chamados = ctx["chamados_abertos"]
+    amostras = []
+    for i in range(repeticoes):
+        chamado_id = chamados[i % len(chamados)]
+        amostras.append(requisitar(client, "GET", f"/api/chamados/{chamado_id}", headers=headers))
+        amostras.append(requisitar(client, "GET", "/api/usuarios/ti", headers=headers))
+        for _ in range(polls):
+            amostras.append(requisitar(client, "GET", f"/api/chamados/{chamado_id}", headers=headers))
+    return amostras
+
+
+def drag_and_drop(client, ctx: dict, repeticoes: int, clientes_ws: int = 10):
+    """
+    Mudança de status (drag-and-drop no Kanban) com fan-out WebSocket para M
+    clientes. A latência vai do início do PUT até o último cliente receber o evento.
+    """
+    headers = ctx["headers_ti"]
+    chamados = ctx["chamados_abertos"]
+    amostras = []
+    sockets = [client.websocket_connect("/ws") for _ in range(clientes_ws)]
+    conexoes = [socket.__enter__() for socket in sockets]
+    for conexao in conexoes:
+        conexao.send_json({"type": "auth", "token": headers["Authorization"].removeprefix("Bearer ")})
+    try:
+        for i in range(repeticoes):
+            chamado_id = chamados[i % len(chamados)]
+            status = "em_andamento" if (i // len(chamados)) % 2 == 0 else "aguardando"
+            inicio = time.perf_counter()
+            amostra = requisitar(client, "PUT", f"/api/chamados/{chamado_id}", headers=headers, json={"status": status})
+            for conexao in conexoes:
+                while True:
+                    mensagem = conexao.receive_json()
+                    if mensagem.get("ticket_id") == chamado_id:
+                        break
+            amostras.append(Amostra(time.perf_counter() - inicio, amostra.queries))
+    finally:
+        for socket in sockets:
+            socket.__exit__(None, None, None)
+    return amostras
+
+
+def rajada_de_login(client, ctx: dict, repeticoes: int, concorrencia: int = 8):
+    """Rajada de logins simultâneos (custo de bcrypt + lookup do usuário)"""
+    emails = ctx["emails_funcionarios"]
+
+    def logar(i):
+        return requisitar(client, "POST", "/api/auth/login",
+                          json={"email": emails[i % len(emails)], "password": ctx["senha"]})
+
+    return _em_paralelo(logar, range(repeticoes), concorrencia)
+
+
+def serie_12_meses(client, ctx: dict, repeticoes: int):
+    """Gráfico de tendência: série diária de 12 meses lida das estatísticas pré-agregadas"""
+    headers = ctx["headers_ti"]
+    hoje = date.today()
+    url = f"/api/estatisticas/serie?desde={hoje - timedelta(days=364)}&ate={hoje}"
+    return [requisitar(client, "GET", url, headers=headers) for _ in range(repeticoes)]
+
+
+CENARIOS = {
+    "kanban": kanban,
+    "detalhe_polling": detalhe_com_polling,
+    "drag_drop_ws": drag_and_drop,
+    "login_burst": rajada_de_login,
+    "serie_12_meses": serie_12_meses,
+}
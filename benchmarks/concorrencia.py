@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Teste de escritores concorrentes no mesmo chamado (controle otimista)
+
+Sobe a API com vários workers do uvicorn e dispara threads que incrementam
+um contador em dados_extras do mesmo chamado: GET (valor + ETag), PUT com o
+valor + 1 e If-Match, repetindo em caso de 409. Falha (exit 1) se o valor
+final for diferente do número de incrementos confirmados, ou seja, se
+alguma atualização se perdeu.
+
+Com --sem-if-match as threads não mandam If-Match e o teste mostra as
+atualizações perdidas que o controle de versão evita.
+
+Usa o banco de benchmark (BENCH_DB_NAME, padrão chamados_bench): todos os
+dados dele são apagados.
+
+Uso:
+    python benchmarks/concorrencia.py [--workers 4] [--threads 8] [--incrementos 25]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["CHAMADOS_ENV_FILE"] = os.devnull
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "chamados_bench")
+os.environ["RATE_LIMIT_ATIVO"] = "false"
+os.environ["ARQUIVAMENTO_ATIVO"] = "false"
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+EMAIL = "concorrencia@bench.example.com"
+
+
+def preparar() -> int:
+    from sqlalchemy import create_engine, insert, text
+    from sqlalchemy.pool import NullPool
+
+    from auth import get_password_hash
+    from benchmarks import dados
+    from database import DATABASE_URL
+    from migrate import aplicar_migracoes
+    from models import Chamado, Usuario
+
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    aplicar_migracoes(engine)
+    with engine.begin() as conn:
+        dados.limpar_dados(conn)
+        conn.execute(insert(Usuario), [{
+            "nome": "TI Concorrência", "email": EMAIL, "senha_hash": get_password_hash(dados.SENHA_BENCH),
+            "tipo": "ti", "ativo": True,
+        }])
+        usuario_id = conn.execute(text("SELECT id FROM usuarios WHERE email = :email"), {"email": EMAIL}).scalar()
+        chamado_id = conn.execute(insert(Chamado).returning(Chamado.id), [{
+            "titulo": "Contador", "descricao": "-", "categoria": "outro", "prioridade": "media",
+            "status": "aberto", "usuario_id": usuario_id, "dados_extras": {"contador": 0},
+        }]).scalar()
+    engine.dispose()
+    return chamado_id
+
+
+def escritor(url: str, token: str, chamado_id: int, incrementos: int, if_match: bool) -> dict:
+    """Faz `incrementos` incrementos confirmados; retorna tentativas e latências"""
+    import requests
+
+    sessao = requests.Session()
+    sessao.headers["Authorization"] = f"Bearer {token}"
+    conflitos, latencias = 0, []
+    for _ in range(incrementos):
+        while True:
+            inicio = time.perf_counter()
+            atual = sessao.get(f"{url}/api/chamados/{chamado_id}")
+            atual.raise_for_status()
+            cabecalhos = {"If-Match": atual.headers["ETag"]} if if_match else {}
+            extras = atual.json()["dados_extras"]
+            resposta = sessao.put(f"{url}/api/chamados/{chamado_id}", headers=cabecalhos,
+                                  json={"dados_extras": {**extras, "contador": extras["contador"] + 1}})
+            if resposta.status_code == 409:
+                conflitos += 1
+                continue
+            resposta.raise_for_status()
+            latencias.append(time.perf_counter() - inicio)
+            break
+    return {"conflitos": conflitos, "latencias": latencias}
+
+
+def aguardar(url: str, processo, limite: float = 30):
+    import requests
+
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise SystemExit("✗ O servidor terminou durante o startup")
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("✗ O servidor não respondeu a tempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de escritores concorrentes no mesmo chamado")
+    parser.add_argument("--workers", type=int, default=4, help="workers do uvicorn")
+    parser.add_argument("--threads", type=int, default=8, help="escritores simultâneos")
+    parser.add_argument("--incrementos", type=int, default=25, help="incrementos por escritor")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--sem-if-match", action="store_true", help="não manda If-Match (mostra as perdas)")
+    parser.add_argument("--forcar", action="store_true", help="permite banco sem 'bench' no nome")
+    args = parser.parse_args()
+
+    if "bench" not in os.environ["DB_NAME"] and not args.forcar:
+        raise SystemExit(f"✗ O banco '{os.environ['DB_NAME']}' não parece ser de benchmark (todos os dados são apagados).")
+
+    import requests
+    from benchmarks import dados
+
+    chamado_id = preparar()
+    url = f"http://127.0.0.1:{args.porta}"
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(args.porta),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=RAIZ
+    )
+    try:
+        aguardar(url, servidor)
+        token = requests.post(f"{url}/api/auth/login",
+                              json={"email": EMAIL, "password": dados.SENHA_BENCH}).json()["access_token"]
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            resultados = list(executor.map(
+                lambda _: escritor(url, token, chamado_id, args.incrementos, not args.sem_if_match),
+                range(args.threads)
+            ))
+        duracao = time.perf_counter() - inicio
+
+        final = requests.get(f"{url}/api/chamados/{chamado_id}",
+                             headers={"Authorization": f"Bearer {token}"}).json()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    esperado = args.threads * args.incrementos
+    conflitos = sum(r["conflitos"] for r in resultados)
+    latencias = sorted(l * 1000 for r in resultados for l in r["latencias"])
+    print(f"{args.threads} escritores x {args.incrementos} incrementos em {args.workers} workers: {duracao:.1f} s")
+    print(f"  conflitos (409, repetidos): {conflitos}")
+    print(f"  GET+PUT confirmado: p50 {statistics.median(latencias):.1f} ms  "
+          f"p95 {latencias[int(len(latencias) * 0.95)]:.1f} ms")
+    print(f"  contador: {final['dados_extras']['contador']} (esperado {esperado}), versão {final['versao']}")
+
+    if final["dados_extras"]["contador"] != esperado:
+        print(f"✗ {esperado - final['dados_extras']['contador']} atualização(ões) perdida(s)")
+        sys.exit(1)
+    print("✓ nenhuma atualização perdida")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Gerador de dados para os benchmarks
+
+Cria usuários, chamados e comentários em proporções próximas das de
+produção (poucos usuários de TI, maioria dos chamados já fechada, alguns
+comentários por chamado). Usa semente fixa, então a mesma configuração gera
+sempre a mesma massa de dados.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from models import Usuario, Chamado, Comentario
+from sla import calcular_prazo
+
+SENHA_BENCH = "bench123"
+
+PROPORCAO_TI = 0.08
+COMENTARIOS_POR_CHAMADO = 3
+
+PESOS_STATUS = {
+    "aberto": 15, "em_andamento": 10, "aguardando": 5,
+    "resolvido": 20, "fechado": 45, "cancelado": 5
+}
+PESOS_CATEGORIA = {
+    "hardware": 25, "software": 25, "rede": 15, "email": 10,
+    "sistema": 15, "novo_colaborador": 5, "outro": 5
+}
+PESOS_PRIORIDADE = {"baixa": 20, "media": 50, "alta": 22, "urgente": 8}
+
+
+def _escolher(rng: random.Random, pesos: dict) -> str:
+    return rng.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+def limpar_dados(conn):
+    """Remove todos os dados (mantém o schema)"""
+    conn.execute(text("""
+        TRUNCATE usuarios, chamados, comentarios, anexos, chamado_eventos,
+                 chamados_arquivo, comentarios_arquivo, anexos_arquivo
+        RESTART IDENTITY CASCADE
+    """))
+
+
+def gerar_dados(conn, senha_hash: str, usuarios: int = 200, chamados: int = 2000,
+                comentarios_por_chamado: float = COMENTARIOS_POR_CHAMADO, dias: int = 365, semente: int = 42) -> dict:
+    """
+    Popula o banco e retorna um resumo com ids úteis para os cenários.
+    senha_hash é o hash de SENHA_BENCH (calculado uma vez, bcrypt é lento).
+    """
+    rng = random.Random(semente)
+    agora = datetime.utcnow()
+
+    total_ti = max(1, int(usuarios * PROPORCAO_TI))
+    linhas_usuarios = [
+        {
+            "nome": f"{'TI' if i < total_ti else 'Funcionário'} {i:05d}",
+            "email": f"{'ti' if i < total_ti else 'func'}{i:05d}@bench.example.com",
+            "senha_hash": senha_hash,
+            "tipo": "ti" if i < total_ti else "funcionario",
+            "ativo": True,
+            "criado_em": agora - timedelta(days=dias),
+            "atualizado_em": agora - timedelta(days=dias),
+        }
+        for i in range(usuarios)
+    ]
+    ids_usuarios = conn.execute(insert(Usuario).returning(Usuario.id), linhas_usuarios).scalars().all()
+    ids_ti = ids_usuarios[:total_ti]
+    ids_funcionarios = ids_usuarios[total_ti:] or ids_ti
+
+    linhas_chamados = []
+    for i in range(chamados):
+        criado_em = agora - timedelta(seconds=rng.randint(0, dias * 86400))
+        status = _escolher(rng, PESOS_STATUS)
+        categoria = _escolher(rng, PESOS_CATEGORIA)
+        fechado_em = None
+        if status in ("resolvido", "fechado"):
+            fechado_em = min(agora, criado_em + timedelta(hours=rng.expovariate(1 / 30)))
+        dados_extras = None
+        if categoria == "novo_colaborador":
+            dados_extras = {
+                "colaborador_nome": f"Colaborador {i}",
+                "colaborador_data_nascimento": "1990-01-01",
+                "data_inicio": (criado_em + timedelta(days=7)).date().isoformat(),
+                "equipamentos": {"celular": rng.random() < 0.5, "notebook": rng.random() < 0.8,
+                                 "email": True, "debx": rng.random() < 0.3},
+                "aplicativos": {"whatsapp": rng.random() < 0.5, "chrome": True},
+                "sharepoint_pastas": ""
+            }
+        prioridade = _escolher(rng, PESOS_PRIORIDADE)
+        linhas_chamados.append({
+            "titulo": f"Chamado de {categoria} #{i}",
+            "descricao": f"Descrição gerada para benchmark do chamado {i}. " * rng.randint(1, 5),
+            "categoria": categoria,
+            "prioridade": prioridade,
+            "status": status,
+            "usuario_id": rng.choice(ids_funcionarios),
+            "atribuido_para": rng.choice(ids_ti) if status != "aberto" or rng.random() < 0.3 else None,
+            "dados_extras": dados_extras,
+            "criado_em": criado_em,
+            "atualizado_em": fechado_em or criado_em,
+            "fechado_em": fechado_em,
+            "prazo_em": calcular_prazo(prioridade, categoria, criado_em),
+        })
+    ids_chamados = conn.execute(insert(Chamado).returning(Chamado.id), linhas_chamados).scalars().all()
+
+    linhas_comentarios = []
+    for chamado_id, chamado in zip(ids_chamados, linhas_chamados):
+        for _ in range(int(rng.expovariate(1 / comentarios_por_chamado)) if comentarios_por_chamado else 0):
+            autor = chamado["usuario_id"] if rng.random() < 0.5 else (chamado["atribuido_para"] or rng.choice(ids_ti))
+            linhas_comentarios.append({
+                "chamado_id": chamado_id,
+                "usuario_id": autor,
+                "comentario": "Comentário de benchmark " * rng.randint(1, 8),
+                "criado_em": chamado["criado_em"] + timedelta(minutes=rng.randint(1, 600)),
+            })
+    if linhas_comentarios:
+        conn.execute(insert(Comentario), linhas_comentarios)
+
+    abertos = [cid for cid, c in zip(ids_chamados, linhas_chamados)
+               if c["status"] in ("aberto", "em_andamento", "aguardando")]
+    return {
+        "usuarios": len(ids_usuarios),
+        "usuarios_ti": len(ids_ti),
+        "chamados": len(ids_chamados),
+        "comentarios": len(linhas_comentarios),
+        "email_ti": linhas_usuarios[0]["email"],
+        "emails_funcionarios": [u["email"] for u in linhas_usuarios[total_ti:total_ti + 50]],
+        "chamados_abertos": abertos[:500] or list(ids_chamados[:500]),
+    }
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark da detecção de duplicados: custo da busca no índice MinHash/LSH
+
+Monta o índice em memória com N chamados abertos sintéticos (sem banco),
+planta grupos de quase-duplicados (mesma ocorrência descrita com outras
+palavras) e mede o custo de indexar e de buscar. Falha (exit 1) se o p95
+da busca passar do orçamento ou se algum quase-duplicado plantado não for
+encontrado.
+
+Uso:
+    python benchmarks/duplicados.py [--chamados 5000] [--orcamento-ms 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+ORCAMENTO_MS = 5
+
+# Termos frequentes em chamados, misturados a um vocabulário sintético maior
+# (nomes, sistemas, locais), com pesos decrescentes como numa língua real
+TERMOS_COMUNS = (
+    "computador impressora senha acesso sistema erro lento travando tela monitor teclado mouse "
+    "email outlook teams vpn arquivo pasta sharepoint licença instalar atualizar backup cadastro "
+    "usuário relatório planilha excel notebook bateria carregador rede cabo wifi telefone ramal"
+).split()
+SILABAS = "ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo fu la le li lo lu ma me mi mo mu " \
+          "na ne ni no nu pa pe pi po pu ra re ri ro ru sa se si so su ta te ti to tu va ve vi vo vu".split()
+
+# Mesma ocorrência descrita por pessoas diferentes
+GRUPOS = [
+    [("Internet caiu no 3º andar", "Estamos sem internet no terceiro andar desde as 9h"),
+     ("Sem internet no terceiro andar", "A internet caiu aqui no 3 andar desde 9h"),
+     ("Internet fora do ar - 3º andar", "Todo o terceiro andar está sem internet")],
+    [("VPN não conecta", "Desde hoje cedo a VPN não conecta de casa, dá erro de autenticação"),
+     ("Erro ao conectar na VPN", "A VPN não conecta, aparece erro de autenticação desde cedo")],
+    [("Impressora do financeiro parada", "A impressora do financeiro não imprime, fica na fila"),
+     ("Impressora financeiro não imprime", "Os documentos ficam parados na fila da impressora do financeiro")],
+]
+
+
+def vocabulario(rng: random.Random, tamanho: int = 3000) -> tuple:
+    palavras = TERMOS_COMUNS + ["".join(rng.choices(SILABAS, k=rng.randint(2, 4))) for _ in range(tamanho)]
+    return palavras, [1 / (posicao + 1) for posicao in range(len(palavras))]
+
+
+def texto_aleatorio(rng: random.Random, vocab: tuple, palavras: int) -> str:
+    return " ".join(rng.choices(vocab[0], weights=vocab[1], k=palavras))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da detecção de duplicados")
+    parser.add_argument("--chamados", type=int, default=5000, help="chamados abertos no índice")
+    parser.add_argument("--buscas", type=int, default=2000)
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_MS)
+    args = parser.parse_args()
+
+    from duplicados import IndiceDuplicados
+
+    rng = random.Random(42)
+    vocab = vocabulario(rng)
+    indice = IndiceDuplicados()
+    agora = datetime.utcnow()
+
+    inicio = time.perf_counter()
+    for i in range(args.chamados):
+        indice._aplicar((i, texto_aleatorio(rng, vocab, 5), texto_aleatorio(rng, vocab, 25), "software", "aberto", agora, 1))
+    indexacao_ms = (time.perf_counter() - inicio) / args.chamados * 1000
+
+    # O primeiro texto de cada grupo entra no índice; os demais são buscados
+    plantados = {}
+    for g, grupo in enumerate(GRUPOS):
+        chamado_id = args.chamados + g
+        indice._aplicar((chamado_id, grupo[0][0], grupo[0][1], "rede", "aberto", agora, 1))
+        plantados[chamado_id] = grupo[1:]
+
+    falhas = []
+    for chamado_id, variacoes in plantados.items():
+        for titulo, descricao in variacoes:
+            encontrados = [c["id"] for c in indice.buscar(titulo, descricao, minimo=0.5)]
+            if chamado_id not in encontrados:
+                falhas.append(f"duplicado não encontrado: {titulo!r}")
+
+    consultas = [(texto_aleatorio(rng, vocab, 5), texto_aleatorio(rng, vocab, 25)) for _ in range(args.buscas)]
+    latencias = []
+    for titulo, descricao in consultas:
+        inicio = time.perf_counter()
+        indice.buscar(titulo, descricao, minimo=0.5)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    latencias.sort()
+    p95 = latencias[int(len(latencias) * 0.95)]
+
+    print(f"Índice: {len(indice.chamados)} chamados, {len(indice.baldes)} baldes, {indexacao_ms:.2f} ms por chamado")
+    print(f"Busca:  p50 {statistics.median(latencias):.2f} ms  p95 {p95:.2f} ms  (orçamento {args.orcamento_ms} ms)")
+    if p95 > args.orcamento_ms:
+        falhas.append(f"p95 da busca {p95:.2f} ms acima do orçamento")
+
+    for falha in falhas:
+        print(f"✗ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✓ duplicados encontrados dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
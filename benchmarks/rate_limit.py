@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark do rate limit: custo por requisição do limitador
+
+Mede o backend em memória (mesma chave e chaves distintas) e o middleware
+inteiro na frente de um app ASGI vazio, e falha (exit 1) se o custo médio
+por requisição do middleware passar do orçamento em microssegundos.
+Com --postgres mede também o backend compartilhado (uma ida ao banco por
+verificação, então a ordem de grandeza é de milissegundos).
+
+Uso:
+    python benchmarks/rate_limit.py [--orcamento-us 50] [--iteracoes 200000] [--postgres]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+ORCAMENTO_US = 50
+
+
+def medir(funcao, iteracoes: int) -> float:
+    """Custo médio por chamada em microssegundos"""
+    inicio = time.perf_counter()
+    for i in range(iteracoes):
+        funcao(i)
+    return (time.perf_counter() - inicio) / iteracoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do rate limit")
+    parser.add_argument("--orcamento-us", type=float, default=ORCAMENTO_US)
+    parser.add_argument("--iteracoes", type=int, default=200_000)
+    parser.add_argument("--postgres", action="store_true", help="mede também o backend Postgres")
+    args = parser.parse_args()
+
+    from rate_limit import BackendMemoria, BackendPostgres, Limitador, Limite, RateLimitMiddleware
+
+    # Limite alto o bastante para nunca recusar: mede o caminho comum
+    limite = Limite("bench", 10**12, 1)
+    backend = BackendMemoria()
+    mesma_chave = medir(lambda i: backend.consumir("bench:10.0.0.1", limite), args.iteracoes)
+    backend.limpar()
+    chaves_distintas = medir(lambda i: backend.consumir(f"bench:10.0.{i >> 8 & 255}.{i & 255}", limite), args.iteracoes)
+
+    async def app_vazio(scope, receive, send):
+        pass
+
+    async def medir_middleware(com_limite: bool):
+        app = RateLimitMiddleware(
+            app_vazio, Limitador(BackendMemoria(), ativo=com_limite), confiar_proxy=False,
+            limite_geral=limite, limites_por_rota={"/api/auth/login": Limite("bench_rota", 10**12, 1)}
+        )
+        scope = {"type": "http", "method": "POST", "path": "/api/auth/login", "headers": [], "client": ("10.0.0.1", 5000)}
+        inicio = time.perf_counter()
+        for _ in range(args.iteracoes):
+            await app(scope, None, None)
+        return (time.perf_counter() - inicio) / args.iteracoes * 1e6
+
+    sem_limite = asyncio.run(medir_middleware(False))
+    com_limite = asyncio.run(medir_middleware(True))
+    middleware = com_limite - sem_limite
+
+    print(f"memória, mesma chave:       {mesma_chave:7.2f} µs/verificação")
+    print(f"memória, chaves distintas:  {chaves_distintas:7.2f} µs/verificação")
+    print(f"middleware (IP + rota):     {middleware:7.2f} µs/requisição; orçamento {args.orcamento_us:.0f} µs")
+
+    if args.postgres:
+        from database import engine
+        backend_pg = BackendPostgres(engine)
+        iteracoes_pg = min(args.iteracoes, 2000)
+        postgres = medir(lambda i: backend_pg.consumir(f"bench:10.1.{i >> 8 & 255}.{i & 255}", limite), iteracoes_pg)
+        backend_pg.limpar()
+        print(f"postgres:                   {postgres / 1000:7.2f} ms/verificação")
+
+    if middleware > args.orcamento_us:
+        print(f"✗ custo do rate limit acima do orçamento ({middleware:.2f} µs > {args.orcamento_us:.0f} µs)")
+        exit(1)
+    print("✓ Rate limit dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
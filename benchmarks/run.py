@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmark da API de chamados
+
+Recria a massa de dados num banco dedicado, executa os cenários (Kanban,
+detalhe com polling, drag-and-drop com fan-out WebSocket, rajada de login)
+e mede p50/p95/p99, throughput e queries por requisição. Telegram, Graph e
+SMTP são substituídos por stubs locais.
+
+O resultado pode ser salvo como baseline JSON e comparado depois: a
+comparação falha (exit 1) se algum cenário regredir além da tolerância.
+
+O banco vem de BENCH_DB_NAME (padrão chamados_bench) e das variáveis DB_*
+do ambiente; o .env é ignorado. Todos os dados desse banco são apagados.
+
+Uso:
+    python benchmarks/run.py --salvar benchmarks/baseline.json
+    python benchmarks/run.py --comparar benchmarks/baseline.json --tolerancia 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Precisa vir antes de importar qualquer módulo da aplicação
+os.environ["CHAMADOS_ENV_FILE"] = os.devnull
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "chamados_bench")
+os.environ["RATE_LIMIT_ATIVO"] = "false"  # a rajada de login sai do mesmo "IP"
+os.environ["ARQUIVAMENTO_ATIVO"] = "false"  # arquivado uma vez na preparação, não durante a medição
+os.environ["WS_MAX_CONEXOES_POR_USUARIO"] = "1000"  # os clientes do fan-out usam o mesmo usuário
+os.environ["PROFILING_ATIVO"] = "true"
+os.environ["PROFILING_TAXA_AMOSTRAGEM"] = "1.0"
+os.environ["PROFILING_SERVER_TIMING"] = "true"  # queries por requisição saem do header
+os.environ.setdefault("PROFILING_LIMITE_LENTO_MS", "60000")
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+# Métricas comparadas com o baseline: latências com tolerância relativa,
+# queries por requisição sem tolerância (uma query a mais é uma regressão)
+METRICAS_LATENCIA = ("p95_ms", "p99_ms")
+METRICAS_EXATAS = ("queries_por_requisicao",)
+
+
+def resumir(amostras, duracao: float) -> dict:
+    latencias = sorted(amostra.latencia * 1000 for amostra in amostras)
+    queries = [amostra.queries for amostra in amostras if amostra.queries is not None]
+    percentis = statistics.quantiles(latencias, n=100, method="inclusive") if len(latencias) > 1 else latencias * 99
+    return {
+        "requisicoes": len(latencias),
+        "p50_ms": round(percentis[49], 3),
+        "p95_ms": round(percentis[94], 3),
+        "p99_ms": round(percentis[98], 3),
+        "max_ms": round(latencias[-1], 3),
+        "throughput_rps": round(len(latencias) / duracao, 2) if duracao else None,
+        "queries_por_requisicao": round(statistics.mean(queries), 2) if queries else None,
+    }
+
+
+def comparar(resultado: dict, baseline: dict, tolerancia: float) -> list:
+    """Lista as regressões do resultado em relação ao baseline"""
+    regressoes = []
+    for nome, base in baseline["cenarios"].items():
+        atual = resultado["cenarios"].get(nome)
+        if atual is None:
+            continue
+        for metrica in METRICAS_LATENCIA:
+            if base.get(metrica) and atual[metrica] > base[metrica] * (1 + tolerancia):
+                regressoes.append(f"{nome}.{metrica}: {atual[metrica]} > {base[metrica]} (+{tolerancia:.0%})")
+        for metrica in METRICAS_EXATAS:
+            if base.get(metrica) is not None and atual[metrica] is not None and atual[metrica] > base[metrica]:
+                regressoes.append(f"{nome}.{metrica}: {atual[metrica]} > {base[metrica]}")
+    return regressoes
+
+
+def preparar_banco(args) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+
+    from arquivamento import arquivar
+    from auth import get_password_hash
+    from benchmarks import dados
+    from config import get_settings
+    from database import DATABASE_URL
+    from estatisticas import recalcular
+    from migrate import aplicar_migracoes
+
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    aplicar_migracoes(engine)
+    with engine.begin() as conn:
+        dados.limpar_dados(conn)
+        resumo = dados.gerar_dados(
+            conn, get_password_hash(dados.SENHA_BENCH),
+            usuarios=args.usuarios, chamados=args.chamados,
+            comentarios_por_chamado=args.comentarios, semente=args.semente
+        )
+    # Estado de produção: encerrados antigos já no arquivo
+    resumo["arquivados"] = arquivar(engine, get_settings().arquivamento_dias, pausa=0)
+    with engine.begin() as conn:
+        recalcular(conn)
+    engine.dispose()
+    resumo["senha"] = dados.SENHA_BENCH
+    return resumo
+
+
+def executar(args) -> dict:
+    from fastapi.testclient import TestClient
+
+    from benchmarks import cenarios, stubs
+
+    nome_banco = os.environ["DB_NAME"]
+    if "bench" not in nome_banco and not args.forcar:
+        raise SystemExit(f"✗ O banco '{nome_banco}' não parece ser de benchmark (todos os dados são apagados). "
+                         f"Use BENCH_DB_NAME=..._bench ou --forcar.")
+
+    print(f"Preparando banco {nome_banco}...")
+    ctx = preparar_banco(args)
+    print(f"  {ctx['usuarios']} usuários, {ctx['chamados']} chamados ({ctx['arquivados']} arquivados), "
+          f"{ctx['comentarios']} comentários")
+
+    stubs.instalar(latencia_ms=args.latencia_stubs_ms)
+    import api
+
+    resultado = {
+        "meta": {
+            "data": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "maquina": platform.node(),
+            "parametros": {k: v for k, v in vars(args).items() if k not in ("salvar", "comparar")},
+            "massa": {k: ctx[k] for k in ("usuarios", "usuarios_ti", "chamados", "arquivados", "comentarios")},
+        },
+        "cenarios": {},
+    }
+
+    with TestClient(api.app) as client:
+        ctx["headers_ti"] = cenarios.login(client, ctx["email_ti"], ctx["senha"])
+        parametros = {
+            "kanban": {"repeticoes": args.repeticoes, "concorrencia": args.concorrencia},
+            "detalhe_polling": {"repeticoes": args.repeticoes},
+            "drag_drop_ws": {"repeticoes": args.repeticoes, "clientes_ws": args.clientes_ws},
+            "login_burst": {"repeticoes": args.logins, "concorrencia": args.concorrencia},
+            "serie_12_meses": {"repeticoes": args.repeticoes},
+        }
+        for nome, cenario in cenarios.CENARIOS.items():
+            if args.cenarios and nome not in args.cenarios:
+                continue
+            cenario(client, ctx, **{**parametros[nome], "repeticoes": 2})  # aquecimento
+            inicio = time.perf_counter()
+            amostras = cenario(client, ctx, **parametros[nome])
+            resultado["cenarios"][nome] = resumir(amostras, time.perf_counter() - inicio)
+            r = resultado["cenarios"][nome]
+            print(f"  {nome:16s} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+                  f"{r['throughput_rps']:8.1f} req/s  {r['queries_por_requisicao']} queries/req")
+
+    resultado["meta"]["chamadas_stubs"] = dict(stubs.chamadas)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da API de chamados")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--chamados", type=int, default=2000)
+    parser.add_argument("--comentarios", type=float, default=3, help="média de comentários por chamado")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument("--clientes-ws", type=int, default=20)
+    parser.add_argument("--latencia-stubs-ms", type=float, default=0)
+    parser.add_argument("--cenarios", nargs="*", help="executa só os cenários indicados")
+    parser.add_argument("--salvar", help="grava o resultado como baseline JSON")
+    parser.add_argument("--comparar", help="compara com um baseline JSON e falha se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="regressão aceita nas latências (0.25 = 25%%)")
+    parser.add_argument("--forcar", action="store_true", help="permite usar banco sem 'bench' no nome")
+    args = parser.parse_args()
+
+    resultado = executar(args)
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"✓ Baseline salvo em {args.salvar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(resultado, baseline, args.tolerancia)
+        if regressoes:
+            for regressao in regressoes:
+                print(f"✗ {regressao}")
+            exit(1)
+        print(f"✓ Sem regressões em relação a {args.comparar}")
+
+
+if __name__ == "__main__":
+    main()
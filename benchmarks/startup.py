@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark de startup: mede o custo de importar api.py com python -X importtime
+
+Falha (exit 1) se a mediana do tempo de import passar do orçamento ou se
+alguma integração pesada (Graph/MSAL, requests, jose, passlib/bcrypt) for
+importada no startup em vez de no primeiro uso.
+
+Uso:
+    python benchmarks/startup.py [--orcamento-ms 1500] [--repeticoes 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A maior parte é custo fixo do FastAPI/pydantic; o orçamento pega regressões
+# como uma integração pesada voltando a ser importada no topo de um módulo
+ORCAMENTO_MS = 1500
+IMPORTS_PROIBIDOS = ("msal", "requests", "jose", "passlib", "bcrypt")
+
+
+def medir_import(modulo: str = "api"):
+    """Importa o módulo num processo novo e retorna (cumulativo_ms, pacotes importados)"""
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {modulo}:\n{resultado.stderr[-2000:]}")
+
+    cumulativo_us = None
+    pacotes = set()
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        partes = linha[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        nome = partes[2].strip()
+        pacotes.add(nome.split(".")[0])
+        if nome == modulo:
+            cumulativo_us = int(partes[1])
+
+    return cumulativo_us / 1000, pacotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tempo de import da aplicação")
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_MS)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    tempos = []
+    pacotes = set()
+    for _ in range(args.repeticoes):
+        tempo_ms, pacotes = medir_import()
+        tempos.append(tempo_ms)
+
+    mediana = statistics.median(tempos)
+    print(f"import api: mediana {mediana:.1f} ms (min {min(tempos):.1f}, max {max(tempos):.1f}) "
+          f"em {args.repeticoes} execuções; orçamento {args.orcamento_ms:.0f} ms")
+
+    erros = []
+    proibidos = sorted(p for p in IMPORTS_PROIBIDOS if p in pacotes)
+    if proibidos:
+        erros.append(f"integrações importadas no startup: {', '.join(proibidos)}")
+    if mediana > args.orcamento_ms:
+        erros.append(f"tempo de import acima do orçamento ({mediana:.1f} ms > {args.orcamento_ms:.0f} ms)")
+
+    if erros:
+        for erro in erros:
+            print(f"✗ {erro}")
+        exit(1)
+    print("✓ Startup dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
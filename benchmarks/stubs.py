@@ -0,0 +1,70 @@
+"""
+Stubs locais para as integrações externas durante os benchmarks
+
+Telegram, Microsoft Graph e SMTP são substituídos por funções que só
+contam as chamadas (e opcionalmente simulam latência), para que os números
+medidos sejam da aplicação e nenhuma mensagem real seja enviada.
+"""
+import smtplib
+import time
+from collections import Counter
+
+chamadas = Counter()
+
+
+def _latencia(segundos: float):
+    if segundos:
+        time.sleep(segundos)
+
+
+class SMTPStub:
+    """Substituto de smtplib.SMTP que aceita e descarta as mensagens"""
+
+    latencia = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self, *args, **kwargs):
+        pass
+
+    def login(self, *args, **kwargs):
+        pass
+
+    def send_message(self, *args, **kwargs):
+        chamadas["smtp"] += 1
+        _latencia(self.latencia)
+
+    sendmail = send_message
+
+    def quit(self):
+        pass
+
+
+def instalar(latencia_ms: float = 0.0):
+    """Substitui as integrações pelos stubs (chamar antes de iniciar o app)"""
+    import email_graph
+    import telegram_notifier
+
+    latencia = latencia_ms / 1000
+
+    def enviar_mensagem_telegram(mensagem: str, parse_mode: str = "HTML") -> bool:
+        chamadas["telegram"] += 1
+        _latencia(latencia)
+        return True
+
+    def send_email_graph(to_email: str, subject: str, html_body: str):
+        chamadas["graph"] += 1
+        _latencia(latencia)
+        return True
+
+    telegram_notifier.enviar_mensagem_telegram = enviar_mensagem_telegram
+    email_graph.send_email_graph = send_email_graph
+    SMTPStub.latencia = latencia
+    smtplib.SMTP = SMTPStub
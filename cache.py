@@ -0,0 +1,214 @@
+"""
+Cache em memória (por processo) de dados de referência pequenos e quentes
+
+Leitura "read-through" com TTL e limite de itens (o menos usado sai
+primeiro): usuários embutidos na listagem de chamados (por id) e a lista de
+usuários ativos do TI. Uma carga iniciada antes de uma invalidação não é
+guardada (contador de geração), e as faltas são carregadas do primário
+(nunca da réplica, que pode ainda não ter a alteração), então o cache nunca
+volta a um valor antigo.
+
+Invalidação entre workers: quem altera usuários chama invalidar(db, ...) na
+transação da alteração. O item sai do cache local na hora e um pg_notify,
+entregue pelo Postgres só no commit, avisa todos os workers (inclusive este,
+o que cobre uma leitura concorrente que recarregou o valor antigo antes do
+commit). Cada worker escuta o canal numa conexão dedicada. O pg8000 só lê
+notificações ao executar um comando, então a escuta espera o socket ficar
+legível e roda um SELECT 1. Se a conexão de escuta cair, os caches são
+esvaziados ao reconectar (notificações podem ter se perdido); o TTL limita
+o resto.
+
+Acertos, falhas e invalidações vão para /metrics (chamados_cache_*).
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+import metrics
+from config import get_settings
+
+CANAL = "cache_invalidacao"
+
+CACHES = {}
+
+
+class Cache:
+    """Itens com validade (TTL) e limite de tamanho (LRU)"""
+
+    def __init__(self, nome: str, ttl: float, max_itens: int):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()   # chave -> (expira_em, valor)
+        self._geracao = 0             # incrementada a cada invalidação
+        self._lock = threading.Lock()
+        self._acertos = metrics.CACHE_ACERTOS.labels(nome)
+        self._falhas = metrics.CACHE_FALHAS.labels(nome)
+        CACHES[nome] = self
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _buscar(self, chave, agora: float):
+        item = self._itens.get(chave)
+        if item is None or item[0] <= agora:
+            return False, None
+        self._itens.move_to_end(chave)
+        return True, item[1]
+
+    def _guardar(self, itens: dict, geracao: int):
+        with self._lock:
+            if geracao != self._geracao:
+                return
+            expira_em = time.monotonic() + self.ttl
+            for chave, valor in itens.items():
+                self._itens[chave] = (expira_em, valor)
+                self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def obter(self, chave, carregar):
+        """Valor da chave; na falta, carregar() vai ao banco e o resultado é guardado"""
+        with self._lock:
+            achou, valor = self._buscar(chave, time.monotonic())
+            geracao = self._geracao
+        if achou:
+            self._acertos.inc()
+            return valor
+        self._falhas.inc()
+        valor = carregar()
+        self._guardar({chave: valor}, geracao)
+        return valor
+
+    def obter_varios(self, chaves, carregar) -> dict:
+        """Valores das chaves; as ausentes vêm de uma única chamada carregar(faltando) -> dict"""
+        encontrados, faltando = {}, []
+        with self._lock:
+            agora = time.monotonic()
+            for chave in chaves:
+                achou, valor = self._buscar(chave, agora)
+                if achou:
+                    encontrados[chave] = valor
+                else:
+                    faltando.append(chave)
+            geracao = self._geracao
+        if encontrados:
+            self._acertos.inc(len(encontrados))
+        if faltando:
+            self._falhas.inc(len(faltando))
+            carregados = carregar(faltando)
+            self._guardar(carregados, geracao)
+            encontrados.update(carregados)
+        return encontrados
+
+    def invalidar(self, chave=None):
+        """Remove a chave (None = todas) deste processo"""
+        with self._lock:
+            self._geracao += 1
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+
+
+_settings = get_settings()
+USUARIOS = Cache("usuarios", _settings.cache_ttl_segundos, _settings.cache_max_itens)
+USUARIOS_TI = Cache("usuarios_ti", _settings.cache_ttl_segundos, 1)
+
+metrics.GaugeCallback(
+    "chamados_cache_items", "Itens em cada cache em memória",
+    lambda: [((nome,), len(cache)) for nome, cache in CACHES.items()], ("cache",)
+)
+
+
+def invalidar(db, nome: str, chave=None):
+    """
+    Na transação da alteração: tira o item do cache deste processo e publica
+    a invalidação para os demais workers (entregue no commit)
+    """
+    CACHES[nome].invalidar(chave)
+    metrics.CACHE_INVALIDACOES.labels(nome, "local").inc()
+    db.execute(text("SELECT pg_notify(:canal, :payload)"),
+               {"canal": CANAL, "payload": json.dumps({"cache": nome, "chave": chave})})
+
+
+def _aplicar_notificacao(payload: str):
+    try:
+        dados = json.loads(payload)
+        cache = CACHES[dados["cache"]]
+    except (ValueError, KeyError, TypeError):
+        print(f"AVISO: notificação de cache inválida: {payload!r}")
+        return
+    cache.invalidar(dados.get("chave"))
+    metrics.CACHE_INVALIDACOES.labels(cache.nome, "notify").inc()
+
+
+class _Escuta:
+    """Conexão dedicada (fora do pool) com LISTEN no canal de invalidação"""
+
+    def __init__(self, url):
+        self.engine = create_engine(url, poolclass=NullPool)
+        self.bruta = self.engine.raw_connection()  # mantida referenciada: o proxy fecha a conexão ao ser coletado
+        self.conexao = self.bruta.driver_connection
+        self.conexao.autocommit = True
+        self.cursor = self.conexao.cursor()
+        self.cursor.execute(f"LISTEN {CANAL}")
+
+    def socket(self):
+        # Atributo interno do pg8000; sem ele a escuta cai para consulta periódica
+        return getattr(self.conexao, "_usock", None)
+
+    def processar(self):
+        """Lê as notificações pendentes (o pg8000 só as recebe durante um comando)"""
+        self.cursor.execute("SELECT 1")
+        while self.conexao.notifications:
+            _, canal, payload = self.conexao.notifications.popleft()
+            if canal == CANAL:
+                _aplicar_notificacao(payload)
+
+    def fechar(self):
+        try:
+            self.bruta.close()
+        except Exception:
+            pass
+        self.engine.dispose()
+
+
+async def escutar_invalidacoes(engine, intervalo: float):
+    """Task em background (uma por worker) que aplica as invalidações dos outros workers"""
+    loop = asyncio.get_running_loop()
+    while True:
+        escuta = None
+        sock = None
+        try:
+            escuta = await run_in_threadpool(_Escuta, engine.url)
+            # Notificações podem ter se perdido enquanto não havia escuta
+            for cache in CACHES.values():
+                cache.invalidar()
+            legivel = asyncio.Event()
+            sock = escuta.socket()
+            if sock is not None:
+                loop.add_reader(sock.fileno(), legivel.set)
+            while True:
+                try:
+                    await asyncio.wait_for(legivel.wait(), intervalo)
+                except asyncio.TimeoutError:
+                    pass  # SELECT 1 periódico também mantém a conexão viva
+                legivel.clear()
+                await run_in_threadpool(escuta.processar)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"AVISO: falha na escuta de invalidações de cache: {e}")
+            await asyncio.sleep(min(intervalo, 5))
+        finally:
+            if sock is not None:
+                loop.remove_reader(sock.fileno())
+            if escuta is not None:
+                escuta.fechar()
@@ -0,0 +1,84 @@
+"""
+GET condicional (ETag fraca, Last-Modified e 304)
+
+O frontend relê o mesmo chamado e as mesmas listas o tempo todo (badges,
+comentários, usuários do TI a cada modal). As rotas calculam primeiro os
+validadores com uma consulta agregada barata e, se o cliente já tem a
+versão atual (If-None-Match / If-Modified-Since), respondem 304 sem carregar
+relacionamentos nem serializar o corpo. As respostas levam
+"Cache-Control: private, no-cache": o navegador guarda a cópia, mas sempre
+revalida, então o fetch do frontend recebe o corpo do cache de forma
+transparente.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_fraca(*partes) -> str:
+    return 'W/"' + "-".join(str(parte) for parte in partes) + '"'
+
+
+def _instante(valor: datetime) -> int:
+    """Microssegundos desde a época (datas UTC sem tzinfo, como no banco)"""
+    return int(valor.replace(tzinfo=timezone.utc).timestamp() * 1_000_000) if valor else 0
+
+
+def etag_chamado(versao: int, ultimo_comentario: int, usuarios_em: datetime = None) -> str:
+    """
+    Representação do chamado: versão (campos), último comentário e a última
+    alteração dos dados de usuário embutidos (usuarios.perfil_alterado_em)
+    """
+    return etag_fraca(versao, ultimo_comentario or 0, _instante(usuarios_em))
+
+
+def etag_conjunto(*partes, ultima_modificacao: datetime = None) -> str:
+    """Representação de uma lista: agregados (contagem, soma de versões...) e a última modificação"""
+    return etag_fraca(*partes, _instante(ultima_modificacao))
+
+
+def cabecalhos(etag: str, ultima_modificacao: datetime = None) -> dict:
+    resultado = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if ultima_modificacao:
+        resultado["Last-Modified"] = format_datetime(ultima_modificacao.replace(tzinfo=timezone.utc), usegmt=True)
+    return resultado
+
+
+def _sem_fraca(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def nao_modificado(request: Request, etag: str, ultima_modificacao: datetime = None) -> bool:
+    """
+    Se o cliente já tem esta representação. If-None-Match usa comparação
+    fraca e, quando presente, ignora If-Modified-Since (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _sem_fraca(etag) in {_sem_fraca(valor.strip()) for valor in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            return False
+        # Last-Modified tem resolução de segundos
+        return ultima_modificacao.replace(tzinfo=timezone.utc, microsecond=0) <= desde
+    return False
+
+
+def resposta_304(etag: str, ultima_modificacao: datetime = None) -> Response:
+    return Response(status_code=304, headers=cabecalhos(etag, ultima_modificacao))
+
+
+def aplicar(response: Response, etag: str, ultima_modificacao: datetime = None):
+    """Validadores na resposta completa (200)"""
+    response.headers.update(cabecalhos(etag, ultima_modificacao))
@@ -0,0 +1,166 @@
+"""
+Configurações da aplicação
+
+Carregadas uma única vez a partir das variáveis de ambiente e do .env.
+Como no load_dotenv(override=True) usado antes, os valores do .env têm
+prioridade sobre as variáveis do sistema.
+
+O .env padrão é o da raiz do projeto, qualquer que seja o diretório de
+trabalho (o load_dotenv de antes também procurava a partir dos módulos).
+CHAMADOS_ENV_FILE permite apontar outro arquivo (ex.: os benchmarks usam
+/dev/null para nunca herdar o banco configurado no .env de desenvolvimento).
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=os.getenv("CHAMADOS_ENV_FILE", Path(__file__).resolve().parent / ".env"),
+        env_file_encoding="utf-8", extra="ignore"
+    )
+
+    # Banco de dados
+    db_name: str = "chamados_db"
+    db_user: str = "postgres"
+    db_password: str = ""
+    db_host: str = "localhost"
+    db_port: str = "5432"
+
+    # Pool de conexões e timeouts por sessão
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30  # segundos esperando uma conexão livre
+    db_pool_recycle: int = 1800  # segundos até reciclar uma conexão
+    db_statement_timeout_ms: int = 30000
+    db_lock_timeout_ms: int = 5000
+
+    # Réplica de leitura (opcional; usuário/senha/nome iguais aos do primário se omitidos)
+    db_replica_host: Optional[str] = None
+    db_replica_port: Optional[str] = None
+    db_replica_name: Optional[str] = None
+    db_replica_user: Optional[str] = None
+    db_replica_password: Optional[str] = None
+    # Após uma escrita, leituras do mesmo cliente vão ao primário por esse tempo
+    db_replica_stickiness_segundos: int = 5
+
+    # Profiling de SQL por requisição (ajustável em runtime via /api/admin/profiling,
+    # só no worker que atendeu a chamada). O header Server-Timing expõe tempo de
+    # banco e número de queries a qualquer cliente: só sai com server_timing ligado
+    profiling_ativo: bool = True
+    profiling_taxa_amostragem: float = 0.01
+    profiling_limite_lento_ms: float = 500
+    profiling_server_timing: bool = False
+
+    # Rate limiting (token bucket). "postgres" compartilha os limites entre workers
+    rate_limit_ativo: bool = True
+    rate_limit_backend: str = "memoria"
+    # Usa o último endereço de X-Forwarded-For (só atrás de um proxy reverso confiável)
+    rate_limit_confiar_proxy: bool = False
+
+    # SLA: expediente do calendário comercial e feriados (datas ISO separadas por vírgula)
+    sla_fuso: str = "America/Sao_Paulo"
+    sla_expediente_inicio: str = "08:00"
+    sla_expediente_fim: str = "18:00"
+    sla_feriados: str = ""
+    sla_janela_risco_horas: float = 4
+    sla_intervalo_verificacao_segundos: int = 60
+
+    # Arquivamento de chamados fechados/cancelados antigos
+    arquivamento_ativo: bool = True
+    arquivamento_dias: int = 180
+    arquivamento_lote: int = 500
+    arquivamento_intervalo_segundos: int = 3600
+
+    # Atribuição automática de chamados novos ("" = desligada; ver atribuicao.py)
+    atribuicao_automatica: str = ""
+    atribuicao_recarga_segundos: int = 600
+
+    # Detecção de chamados duplicados (similaridade mínima de 0 a 1)
+    duplicados_similaridade_minima: float = 0.5
+    duplicados_recarga_segundos: int = 600
+
+    # Cache em memória de dados de referência (invalidado entre workers por NOTIFY)
+    cache_ttl_segundos: int = 300
+    cache_max_itens: int = 5000
+    cache_escuta_intervalo_segundos: int = 5
+
+    # Tempo real: eventos guardados para retomada (WebSocket/SSE) e keep-alive do SSE
+    eventos_buffer_tamanho: int = 1000
+    sse_keepalive_segundos: int = 15
+
+    # Sessões WebSocket: autenticação, heartbeat, fila de envio e limite por usuário
+    ws_auth_timeout_segundos: int = 5
+    ws_ping_intervalo_segundos: int = 20
+    ws_ping_timeout_segundos: int = 45
+    ws_fila_tamanho: int = 100
+    ws_fila_politica: str = "descartar"  # descartar (vira resync) ou desconectar
+    ws_max_conexoes_por_usuario: int = 5
+
+    # Presença nos chamados ("sendo visto por") e agregação das atualizações
+    presenca_ttl_segundos: int = 75
+    presenca_debounce_ms: int = 500
+
+    # Séries diárias pré-agregadas (recálculo periódico dos últimos dias)
+    estatisticas_intervalo_segundos: int = 900
+    estatisticas_dias_recalculo: int = 3
+
+    # Agendador de tarefas (cron de 5 campos no fuso SLA_FUSO; ver agendador.py)
+    agendador_jitter_segundos: float = 10
+    codigos_verificacao_limpeza_cron: str = "*/10 * * * *"
+    rate_limit_limpeza_cron: str = "*/15 * * * *"
+
+    # Lembrete de chamados parados em "aguardando" (repetido a cada N horas sem movimentação)
+    lembrete_aguardando_cron: str = "0 9 * * 1-5"
+    lembrete_aguardando_horas: int = 48
+
+    # Autenticação JWT
+    secret_key: str = "sua_chave_secreta_aqui_mude_isso"
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 1440
+
+    # Telegram
+    telegram_bot_token: Optional[str] = None
+    telegram_chat_id: Optional[str] = None
+
+    # Microsoft Graph
+    azure_client_id: Optional[str] = None
+    azure_tenant_id: Optional[str] = None
+    azure_client_secret: Optional[str] = None
+
+    # Email (Graph e SMTP)
+    email_from: Optional[str] = None
+    email_from_name: str = "MyCompany - Chamados TI"
+    email_host: str = "smtp.gmail.com"
+    email_port: int = 587
+    email_user: Optional[str] = None
+    email_password: Optional[str] = None
+
+    @property
+    def database_url(self) -> str:
+        return f"postgresql+pg8000://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+
+    @property
+    def replica_database_url(self) -> Optional[str]:
+        if not self.db_replica_host:
+            return None
+        user = self.db_replica_user or self.db_user
+        password = self.db_replica_password if self.db_replica_password is not None else self.db_password
+        port = self.db_replica_port or self.db_port
+        name = self.db_replica_name or self.db_name
+        return f"postgresql+pg8000://{user}:{password}@{self.db_replica_host}:{port}/{name}"
+
+    @classmethod
+    def settings_customise_sources(cls, settings_cls, init_settings, env_settings, dotenv_settings, file_secret_settings):
+        # .env antes das variáveis de ambiente do sistema
+        return init_settings, dotenv_settings, env_settings, file_secret_settings
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Retorna o objeto de configurações (carregado uma vez por processo)"""
+    return Settings()
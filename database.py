@@ -1,29 +1,82 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-import os
-from dotenv import load_dotenv
-
-# Forçar carregamento do .env local, sobrescrevendo variáveis de ambiente do sistema
-load_dotenv(override=True)
-
-# Configuração do banco de dados
-DB_NAME = os.getenv("DB_NAME", "chamados_db")
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "5432")
-
-DATABASE_URL = f"postgresql+pg8000://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+import metrics
+from config import get_settings
+
+settings = get_settings()
+
+DATABASE_URL = settings.database_url
+
+class PoolInstrumentado(QueuePool):
+    """
+    QueuePool que mede quanto tempo as requisições esperam por uma conexão,
+    para separar latência de fila no pool de latência das queries
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.esperas = 0
+        self.tempo_espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            self.esperas += 1
+            self.tempo_espera_total += espera
+            if espera > self.espera_maxima:
+                self.espera_maxima = espera
+
+def criar_engine(url: str):
+    """
+    Engine com pool LIFO (conexões ociosas expiram pelo pool_recycle em vez
+    de um ping a cada checkout) e timeouts aplicados em cada conexão nova
+    """
+    novo_engine = create_engine(
+        url,
+        poolclass=PoolInstrumentado,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_use_lifo=True
+    )
+
+    @event.listens_for(novo_engine, "connect")
+    def configurar_sessao(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(settings.db_statement_timeout_ms)}")
+        cursor.execute(f"SET lock_timeout = {int(settings.db_lock_timeout_ms)}")
+        cursor.close()
+        # Confirma o SET, senão o rollback do reset do pool o desfaz
+        dbapi_connection.commit()
+
+    metrics.instrumentar_engine(novo_engine)
+    return novo_engine
+
+engine = criar_engine(DATABASE_URL)
+
+# Réplica de leitura: sem DB_REPLICA_HOST, as leituras usam o próprio primário
+read_engine = criar_engine(settings.replica_database_url) if settings.replica_database_url else engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Cookie marcado após escritas (read-your-writes): enquanto válido, as
+# leituras desse cliente vão ao primário em vez da réplica
+COOKIE_LEITURA_PRIMARIO = "chamados_primario_ate"
 
 def get_db():
     """Dependency para obter sessão do banco"""
@@ -32,3 +85,43 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def leitura_no_primario(request: Request) -> bool:
+    """Verifica se o cliente escreveu há pouco e precisa ler do primário"""
+    valor = request.cookies.get(COOKIE_LEITURA_PRIMARIO)
+    if not valor:
+        return False
+    try:
+        return float(valor) > time.time()
+    except ValueError:
+        return False
+
+def sessao_leitura(request: Request) -> Session:
+    """Nova sessão para leitura: réplica, se configurada e o cliente não escreveu há pouco"""
+    if read_engine is engine or leitura_no_primario(request):
+        return SessionLocal()
+    return ReadSessionLocal()
+
+def get_read_db(request: Request):
+    """Dependency para endpoints somente leitura (réplica, se configurada)"""
+    db = sessao_leitura(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def estatisticas_pool(engine) -> dict:
+    """Estado atual e tempos de espera do pool de conexões"""
+    pool = engine.pool
+    return {
+        "tamanho": pool.size(),
+        "em_uso": pool.checkedout(),
+        "ociosas": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+        "esperas": pool.esperas,
+        "tempo_espera_total_ms": round(pool.tempo_espera_total * 1000, 2),
+        "tempo_espera_medio_ms": round(pool.tempo_espera_total * 1000 / pool.esperas, 3) if pool.esperas else 0.0,
+        "espera_maxima_ms": round(pool.espera_maxima * 1000, 2),
+        "timeouts": pool.timeouts
+    }
@@ -1,4 +1,5 @@
 -- Database Schema for Chamados TI NAU
+-- Referência do schema original. Para criar/atualizar o banco use: python migrate.py
 
 CREATE TABLE IF NOT EXISTS usuarios (
     id SERIAL PRIMARY KEY,
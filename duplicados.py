@@ -0,0 +1,236 @@
+"""
+Detecção de chamados duplicados (MinHash + LSH sobre título e descrição)
+
+Cada chamado aberto vira o conjunto de trigramas de caracteres do texto
+normalizado (sem acentos, minúsculo, sem pontuação nem palavras vazias como
+"no", "de", "sem", que aproximam textos sem relação), resumido numa
+assinatura MinHash de NUM_PERMUTACOES valores. A assinatura é dividida em
+BANDAS; chamados com alguma banda idêntica caem no mesmo balde e viram
+candidatos, e a similaridade (Jaccard estimado) é a fração de posições
+iguais nas assinaturas. Uma busca custa uma assinatura e algumas consultas a
+dicionários, sem varrer os chamados abertos.
+
+O índice fica em memória em cada processo e é mantido como o de
+atribuicao.py: sincronizado de forma incremental por chamado_eventos (os
+chamados tocados são relidos do banco, então reaplicar é inofensivo), com
+recarga completa periódica. O pg_trgm não é usado por não estar disponível
+em todas as instalações do Postgres.
+"""
+import random
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+from config import get_settings
+from eventos import TipoEvento
+
+NUM_PERMUTACOES = 64
+BANDAS = 16  # 4 valores por banda: candidatos a partir de ~50% de similaridade
+LINHAS_POR_BANDA = NUM_PERMUTACOES // BANDAS
+TAMANHO_SHINGLE = 3
+MAX_CARACTERES = 2000
+
+# Cada "permutação" é um XOR com uma máscara aleatória sobre o hash (já
+# espalhado) do trigrama: ~3x mais barato que (a*h + b) mod p em Python puro,
+# com a mesma precisão na estimativa. Semente fixa: mesma assinatura em todos
+# os processos.
+_rng = random.Random(726_040)
+_MASCARAS = [_rng.getrandbits(32) for _ in range(NUM_PERMUTACOES)]
+_ESPALHAR = 0x9E3779B1
+
+JANELA_RELEITURA = 100
+
+STATUS_ABERTOS = ("aberto", "em_andamento", "aguardando")
+_NAO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+PALAVRAS_VAZIAS = frozenset("""
+    a o as os e ou de da do das dos no na nos nas em um uma uns umas para pra por pelo pela com sem
+    que se ao aos esta estou estamos esse essa isso aqui ali todo toda todos todas desde hoje ja
+    nao mais muito meu minha bom dia tarde noite favor obrigado obrigada
+""".split())
+
+SQL_CHAMADOS = text(
+    "SELECT id, titulo, descricao, categoria, status, criado_em, usuario_id FROM chamados WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+SQL_EVENTOS = text(f"""
+    SELECT id, chamado_id FROM chamado_eventos
+    WHERE id > :cursor AND tipo IN ({int(TipoEvento.CRIADO)}, {int(TipoEvento.STATUS)},
+                                    {int(TipoEvento.CATEGORIA)}, {int(TipoEvento.EDITADO)},
+                                    {int(TipoEvento.EXCLUIDO)})
+    ORDER BY id
+""")
+
+
+def normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto[:MAX_CARACTERES].lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(p for p in _NAO_ALFANUMERICO.sub(" ", texto).split() if p not in PALAVRAS_VAZIAS)
+
+
+def assinatura(titulo: str, descricao: str) -> tuple:
+    texto = normalizar(f"{titulo} {descricao}")
+    hashes = {
+        zlib.crc32(texto[i:i + TAMANHO_SHINGLE].encode()) * _ESPALHAR & 0xFFFFFFFF
+        for i in range(max(len(texto) - TAMANHO_SHINGLE + 1, 1))
+    }
+    return tuple(min(h ^ mascara for h in hashes) for mascara in _MASCARAS)
+
+
+def similaridade(a: tuple, b: tuple) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERMUTACOES
+
+
+def _bandas(sig: tuple):
+    for banda in range(BANDAS):
+        yield banda, sig[banda * LINHAS_POR_BANDA:(banda + 1) * LINHAS_POR_BANDA]
+
+
+class IndiceDuplicados:
+    """Assinaturas dos chamados abertos e baldes LSH (um por processo)"""
+
+    def __init__(self):
+        self.chamados = {}      # id -> (assinatura, titulo, categoria, status, criado_em, usuario_id)
+        self.baldes = {}        # (banda, valores) -> set(ids)
+        self.cursor = 0
+        self.carregado_em = None
+        self.lock = threading.Lock()
+
+    def _remover(self, chamado_id: int):
+        anterior = self.chamados.pop(chamado_id, None)
+        if anterior:
+            for chave in _bandas(anterior[0]):
+                balde = self.baldes.get(chave)
+                if balde:
+                    balde.discard(chamado_id)
+                    if not balde:
+                        del self.baldes[chave]
+
+    def _aplicar(self, linha):
+        """Indexa o chamado (ou o remove, se não está mais aberto)"""
+        chamado_id, titulo, descricao, categoria, status, criado_em, usuario_id = linha
+        self._remover(chamado_id)
+        if status not in STATUS_ABERTOS:
+            return
+        sig = assinatura(titulo, descricao)
+        self.chamados[chamado_id] = (sig, titulo, categoria, status, criado_em, usuario_id)
+        for chave in _bandas(sig):
+            self.baldes.setdefault(chave, set()).add(chamado_id)
+
+    def recarregar(self, db):
+        cursor = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM chamado_eventos")).scalar()
+        self.chamados, self.baldes = {}, {}
+        for linha in db.execute(text(
+            "SELECT id, titulo, descricao, categoria, status, criado_em, usuario_id FROM chamados "
+            "WHERE status IN ('aberto', 'em_andamento', 'aguardando')"
+        )):
+            self._aplicar(linha)
+        self.cursor = max(cursor - JANELA_RELEITURA, 0)
+        self.carregado_em = time.monotonic()
+
+    def sincronizar(self, db):
+        """Relê os chamados com eventos novos desde a última sincronização"""
+        tocados = set()
+        for evento_id, chamado_id in db.execute(SQL_EVENTOS, {"cursor": max(self.cursor - JANELA_RELEITURA, 0)}):
+            self.cursor = max(self.cursor, evento_id)
+            tocados.add(chamado_id)
+        if not tocados:
+            return
+        encontrados = set()
+        for linha in db.execute(SQL_CHAMADOS, {"ids": list(tocados)}):
+            encontrados.add(linha[0])
+            self._aplicar(linha)
+        for chamado_id in tocados - encontrados:
+            self._remover(chamado_id)
+
+    def atualizar(self, db):
+        with self.lock:
+            if self.carregado_em is None or \
+                    time.monotonic() - self.carregado_em > get_settings().duplicados_recarga_segundos:
+                self.recarregar(db)
+            else:
+                self.sincronizar(db)
+
+    def buscar(self, titulo: str, descricao: str, minimo: float, limite: int = 5, ignorar: int = None,
+               usuario_id: int = None) -> list:
+        """
+        Chamados abertos parecidos, do mais para o menos similar; com
+        usuario_id, só os desse solicitante (funcionário não vê os dos outros)
+        """
+        sig = assinatura(titulo, descricao)
+        with self.lock:
+            candidatos = set()
+            for chave in _bandas(sig):
+                candidatos |= self.baldes.get(chave, set())
+            candidatos.discard(ignorar)
+            resultado = []
+            for chamado_id in candidatos:
+                outra, titulo_outro, categoria, status, criado_em, solicitante = self.chamados[chamado_id]
+                if usuario_id is not None and solicitante != usuario_id:
+                    continue
+                valor = similaridade(sig, outra)
+                if valor >= minimo:
+                    resultado.append({
+                        "id": chamado_id, "titulo": titulo_outro, "categoria": categoria,
+                        "status": status, "criado_em": criado_em, "similaridade": round(valor, 2),
+                    })
+        resultado.sort(key=lambda c: (-c["similaridade"], c["id"]))
+        return resultado[:limite]
+
+
+indice = IndiceDuplicados()
+
+
+def buscar_duplicados(db, titulo: str, descricao: str, ignorar: int = None, limite: int = 5,
+                      usuario_id: int = None) -> list:
+    """Sincroniza o índice e busca os chamados abertos parecidos com o texto (só os de usuario_id, se informado)"""
+    indice.atualizar(db)
+    return indice.buscar(titulo, descricao, get_settings().duplicados_similaridade_minima, limite, ignorar, usuario_id)
+
+
+def mesclar(db, pai, duplicados: list, usuario_id: int):
+    """
+    Mescla os chamados duplicados no pai, na transação de `db` (o chamador faz
+    o commit): os comentários dos duplicados e a descrição de cada um viram
+    comentários no pai, e os duplicados são fechados com um comentário
+    apontando para o pai. Os chamados devem estar travados (FOR UPDATE).
+    """
+    import estatisticas
+    import eventos
+    from models import Comentario
+
+    novos = []
+    agora = datetime.utcnow()
+    for duplicado in duplicados:
+        antes = eventos.capturar(duplicado)
+        serie_antes = estatisticas.capturar(duplicado)
+
+        novos.append(Comentario(
+            chamado_id=pai.id, usuario_id=duplicado.usuario_id, criado_em=duplicado.criado_em,
+            comentario=f"[Chamado #{duplicado.id} mesclado] {duplicado.titulo}\n\n{duplicado.descricao}"
+        ))
+        for comentario in sorted(duplicado.comentarios, key=lambda c: c.id):
+            novos.append(Comentario(
+                chamado_id=pai.id, usuario_id=comentario.usuario_id, criado_em=comentario.criado_em,
+                comentario=f"[Do chamado #{duplicado.id}] {comentario.comentario}"
+            ))
+        db.add(Comentario(chamado_id=duplicado.id, usuario_id=usuario_id,
+                          comentario=f"Mesclado no chamado #{pai.id}"))
+
+        if duplicado.status != 'fechado':
+            duplicado.status = 'fechado'
+            duplicado.fechado_em = agora
+        eventos.registrar_alteracoes(db, duplicado, antes, usuario_id)
+        eventos.registrar(db, duplicado.id, TipoEvento.MESCLADO, usuario_id, para=pai.id)
+        db.flush()
+        estatisticas.registrar(db, serie_antes, estatisticas.capturar(duplicado))
+
+    db.add_all(novos)
+    db.flush()
+    for comentario in novos:
+        eventos.registrar(db, pai.id, TipoEvento.COMENTARIO, comentario.usuario_id, para=comentario.id)
+    return novos
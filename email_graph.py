@@ -3,34 +3,41 @@ Microsoft Graph API Email Service
 Envia emails usando Microsoft Graph API com autenticação de aplicativo
 """
 
-import os
-import requests
 import random
 import string
+import time
 from datetime import datetime, timedelta
-from msal import ConfidentialClientApplication
-from dotenv import load_dotenv
+from functools import lru_cache
 
-load_dotenv(override=True)
+import metrics
+from config import get_settings
+
+settings = get_settings()
 
 # Armazenamento temporário de códigos de verificação
 verification_codes = {}
 
-def get_access_token():
-    """Obtém token de acesso usando credenciais do aplicativo"""
-    client_id = os.getenv('AZURE_CLIENT_ID')
-    tenant_id = os.getenv('AZURE_TENANT_ID')
-    client_secret = os.getenv('AZURE_CLIENT_SECRET')
+GRAPH_SCOPE = ["https://graph.microsoft.com/.default"]
 
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
-    scope = ["https://graph.microsoft.com/.default"]
+@lru_cache
+def get_msal_app():
+    """
+    Cliente MSAL criado no primeiro envio e reaproveitado, para que o cache de
+    tokens funcione entre chamadas (msal é pesado e só é importado aqui)
+    """
+    from msal import ConfidentialClientApplication
 
-    app = ConfidentialClientApplication(
-        client_id=client_id,
-        client_credential=client_secret,
-        authority=authority
+    return ConfidentialClientApplication(
+        client_id=settings.azure_client_id,
+        client_credential=settings.azure_client_secret,
+        authority=f"https://login.microsoftonline.com/{settings.azure_tenant_id}"
     )
 
+def get_access_token():
+    """Obtém token de acesso usando credenciais do aplicativo"""
+    app = get_msal_app()
+    scope = GRAPH_SCOPE
+
     result = app.acquire_token_silent(scope, account=None)
     if not result:
         result = app.acquire_token_for_client(scopes=scope)
@@ -42,10 +49,22 @@ def get_access_token():
 
 def send_email_graph(to_email: str, subject: str, html_body: str):
     """Envia email usando Microsoft Graph API"""
+    inicio = time.perf_counter()
+    try:
+        return _send_email_graph(to_email, subject, html_body)
+    except Exception:
+        metrics.NOTIFICACAO_FALHAS.labels("email").inc()
+        raise
+    finally:
+        metrics.NOTIFICACAO_DURACAO.labels("email").observe(time.perf_counter() - inicio)
+
+def _send_email_graph(to_email: str, subject: str, html_body: str):
+    import requests
+
     token = get_access_token()
 
-    from_email = os.getenv('EMAIL_FROM', 'ti@example.com')
-    from_name = os.getenv('EMAIL_FROM_NAME', 'MyCompany - Chamados TI')
+    from_email = settings.email_from or 'ti@example.com'
+    from_name = settings.email_from_name
 
     # Construir mensagem
     message = {
@@ -240,6 +259,14 @@ def clear_verification_code(email: str):
     if email in verification_codes:
         del verification_codes[email]
 
+def limpar_codigos_expirados() -> int:
+    """Remove códigos expirados nunca usados (tarefa agendada); retorna quantos saíram"""
+    agora = datetime.now()
+    expirados = [email for email, stored in list(verification_codes.items()) if agora > stored['expires_at']]
+    for email in expirados:
+        verification_codes.pop(email, None)
+    return len(expirados)
+
 def send_welcome_email(email: str, nome: str, senha_inicial: str):
     """
     Envia email de boas-vindas para novo usuário
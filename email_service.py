@@ -1,13 +1,13 @@
 import smtplib
-import os
 import random
 import string
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+from config import get_settings
+
+settings = get_settings()
 
 # Armazenamento temporário de códigos de verificação (em produção, use Redis ou banco de dados)
 verification_codes = {}
@@ -30,11 +30,11 @@ def send_verification_email(email: str, nome: str) -> str:
     }
 
     # Configurações do email
-    smtp_host = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
-    smtp_port = int(os.getenv('EMAIL_PORT', '587'))
-    smtp_user = os.getenv('EMAIL_USER')
-    smtp_password = os.getenv('EMAIL_PASSWORD')
-    email_from = os.getenv('EMAIL_FROM', 'MyCompany - Chamados TI <noreply@example.com>')
+    smtp_host = settings.email_host
+    smtp_port = settings.email_port
+    smtp_user = settings.email_user
+    smtp_password = settings.email_password
+    email_from = settings.email_from or 'MyCompany - Chamados TI <noreply@example.com>'
 
     # Criar mensagem
     msg = MIMEMultipart('alternative')
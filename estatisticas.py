@@ -0,0 +1,375 @@
+"""
+Séries históricas pré-agregadas (tabela estatisticas_diarias)
+
+Uma linha por (dia, categoria, atribuido_para) com os chamados criados e
+encerrados no dia, a soma dos tempos de resolução e um histograma desses
+tempos (faixas de LIMITES_HORAS), de onde saem média e percentis. Um gráfico
+de 12 meses lê ~365 linhas agregadas no banco em vez de varrer chamados.
+
+Cada chamado contribui com o seu estado atual: criado no dia de criado_em e
+encerrado no dia de COALESCE(fechado_em, atualizado_em), na sua categoria e
+responsável atuais. As escritas da API aplicam a diferença entre as
+contribuições antes e depois da alteração, na mesma transação. O job
+periódico recalcula os últimos dias a partir das tabelas (quentes e arquivo),
+corrigindo alterações feitas fora da API; a reconstrução completa é feita
+pela migração ou manualmente:
+    python estatisticas.py [--dias 3 | --tudo]
+
+Os dias são datas locais no fuso do SLA (SLA_FUSO).
+"""
+from bisect import bisect_right
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+from config import get_settings
+
+STATUS_ENCERRADOS = ("resolvido", "fechado", "cancelado")
+STATUS_RESOLVIDOS = ("resolvido", "fechado")
+
+# Limites (em horas) das faixas do histograma de tempo de resolução; a última
+# faixa é "acima de 720h". Alterar exige reconstruir a tabela.
+LIMITES_HORAS = (1, 2, 4, 8, 16, 24, 48, 72, 120, 168, 336, 720)
+FAIXAS = len(LIMITES_HORAS) + 1
+
+# Escritas pegam o lock compartilhado e o recálculo o exclusivo: o recálculo
+# só lê as tabelas depois que as escritas em andamento confirmaram
+CHAVE_LOCK_ESTATISTICAS = 726_038
+
+FUSO = get_settings().sla_fuso
+_ZONA = ZoneInfo(FUSO)
+
+GRANULARIDADES = {"dia": "day", "semana": "week", "mes": "month"}
+
+
+def _dia_local(instante: datetime) -> date:
+    return instante.replace(tzinfo=timezone.utc).astimezone(_ZONA).date()
+
+
+def _inicio_do_dia_utc(dia: date) -> datetime:
+    return datetime.combine(dia, dtime(0), _ZONA).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def hoje() -> date:
+    return _dia_local(datetime.utcnow())
+
+
+# ============================================================================
+# ATUALIZAÇÃO INCREMENTAL (escritas da API)
+# ============================================================================
+
+def capturar(chamado) -> dict:
+    """Campos que definem a contribuição do chamado nas séries"""
+    return {
+        "criado_em": chamado.criado_em,
+        "atualizado_em": chamado.atualizado_em,
+        "fechado_em": chamado.fechado_em,
+        "status": chamado.status,
+        "categoria": chamado.categoria,
+        "atribuido_para": chamado.atribuido_para or 0,
+    }
+
+
+def _contribuicao(dados: dict) -> dict:
+    """{(dia, categoria, atribuido_para): [criados, encerrados, resolvidos, soma_horas, histograma]}"""
+    linhas = {}
+    if not dados or dados["criado_em"] is None:
+        return linhas
+
+    def linha(instante):
+        chave = (_dia_local(instante), dados["categoria"], dados["atribuido_para"])
+        return linhas.setdefault(chave, [0, 0, 0, 0.0, [0] * FAIXAS])
+
+    linha(dados["criado_em"])[0] += 1
+    encerrado_em = dados["fechado_em"] or dados["atualizado_em"]
+    if dados["status"] in STATUS_ENCERRADOS and encerrado_em is not None:
+        atual = linha(encerrado_em)
+        atual[1] += 1
+        if dados["status"] in STATUS_RESOLVIDOS and dados["fechado_em"] is not None:
+            horas = (dados["fechado_em"] - dados["criado_em"]).total_seconds() / 3600
+            atual[2] += 1
+            atual[3] += horas
+            atual[4][bisect_right(LIMITES_HORAS, horas)] += 1
+    return linhas
+
+
+SQL_SOMAR = text("""
+    INSERT INTO estatisticas_diarias
+        (dia, categoria, atribuido_para, criados, encerrados, resolvidos, soma_horas_resolucao, histograma)
+    VALUES
+        (:dia, :categoria, :atribuido_para, :criados, :encerrados, :resolvidos,
+         CAST(:soma_horas AS DOUBLE PRECISION), CAST(:histograma AS INTEGER[]))
+    ON CONFLICT (dia, categoria, atribuido_para) DO UPDATE SET
+        criados = estatisticas_diarias.criados + EXCLUDED.criados,
+        encerrados = estatisticas_diarias.encerrados + EXCLUDED.encerrados,
+        resolvidos = estatisticas_diarias.resolvidos + EXCLUDED.resolvidos,
+        soma_horas_resolucao = estatisticas_diarias.soma_horas_resolucao + EXCLUDED.soma_horas_resolucao,
+        histograma = ARRAY(
+            SELECT a + b
+            FROM unnest(estatisticas_diarias.histograma, EXCLUDED.histograma) WITH ORDINALITY AS h(a, b, i)
+            ORDER BY i
+        )
+""")
+
+
+def registrar(db, antes: dict = None, depois: dict = None):
+    """
+    Aplica nas séries a diferença entre as contribuições antes e depois da
+    alteração (antes=None na criação, depois=None na exclusão). Deve rodar na
+    transação da alteração, depois do flush.
+    """
+    registrar_lote(db, [(antes, depois)])
+
+
+def registrar_lote(db, alteracoes: list):
+    """Como registrar, para vários pares (antes, depois) num único UPSERT"""
+    delta = {}
+    for antes, depois in alteracoes:
+        for sinal, dados in ((1, depois), (-1, antes)):
+            for chave, valores in _contribuicao(dados).items():
+                atual = delta.setdefault(chave, [0, 0, 0, 0.0, [0] * FAIXAS])
+                for i in range(4):
+                    atual[i] += sinal * valores[i]
+                atual[4] = [a + sinal * b for a, b in zip(atual[4], valores[4])]
+
+    linhas = [
+        {
+            "dia": dia, "categoria": categoria, "atribuido_para": atribuido_para,
+            "criados": v[0], "encerrados": v[1], "resolvidos": v[2], "soma_horas": v[3], "histograma": v[4],
+        }
+        # Ordem fixa das chaves: duas transações nunca travam as mesmas linhas em ordens opostas
+        for (dia, categoria, atribuido_para), v in sorted(delta.items())
+        if v[0] or v[1] or v[2]
+    ]
+    if linhas:
+        db.execute(text("SELECT pg_advisory_xact_lock_shared(:chave)"), {"chave": CHAVE_LOCK_ESTATISTICAS})
+        db.execute(SQL_SOMAR, linhas)
+
+
+# ============================================================================
+# RECÁLCULO A PARTIR DAS TABELAS (job periódico e reconstrução)
+# ============================================================================
+
+def _dia_sql(coluna: str) -> str:
+    return f"CAST(timezone(:fuso, timezone('UTC', {coluna})) AS DATE)"
+
+
+def _sql_criados(tabela: str, periodo: str) -> str:
+    return f"""
+        SELECT {_dia_sql('criado_em')} AS dia, categoria, COALESCE(atribuido_para, 0) AS atribuido_para, COUNT(*) AS n
+        FROM {tabela}
+        WHERE criado_em IS NOT NULL {periodo.format(coluna='criado_em')}
+        GROUP BY 1, 2, 3
+    """
+
+
+def _sql_encerrados(tabela: str, periodo: str) -> str:
+    encerrado_em = "COALESCE(fechado_em, atualizado_em)"
+    horas = "EXTRACT(EPOCH FROM fechado_em - criado_em) / 3600"
+    return f"""
+        SELECT {_dia_sql(encerrado_em)} AS dia, categoria, COALESCE(atribuido_para, 0) AS atribuido_para,
+               (status IN ('resolvido', 'fechado') AND fechado_em IS NOT NULL) AS resolvido,
+               width_bucket({horas}, CAST(:limites AS DOUBLE PRECISION[])) AS faixa,
+               COUNT(*) AS n, COALESCE(SUM({horas}), 0) AS soma_horas
+        FROM {tabela}
+        WHERE status IN ('resolvido', 'fechado', 'cancelado') AND criado_em IS NOT NULL
+          AND {encerrado_em} IS NOT NULL {periodo.format(coluna=encerrado_em)}
+        GROUP BY 1, 2, 3, 4, 5
+    """
+
+
+def recalcular(conn, desde: date = None, ate: date = None) -> int:
+    """
+    Refaz as linhas dos dias [desde, ate] (todas, sem desde) a partir de
+    chamados e chamados_arquivo; retorna quantas linhas gravou. Roda na
+    transação de `conn`, que deve ser curta: bloqueia as escritas de chamados
+    até o commit.
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": CHAVE_LOCK_ESTATISTICAS})
+
+    params = {"fuso": FUSO, "limites": list(LIMITES_HORAS)}
+    if desde is None:
+        periodo = ""
+        conn.execute(text("DELETE FROM estatisticas_diarias"))
+    else:
+        ate = ate or hoje()
+        periodo = "AND {coluna} >= :inicio AND {coluna} < :fim"
+        params.update(inicio=_inicio_do_dia_utc(desde), fim=_inicio_do_dia_utc(ate + timedelta(days=1)))
+        conn.execute(
+            text("DELETE FROM estatisticas_diarias WHERE dia >= :desde AND dia <= :ate"), {"desde": desde, "ate": ate}
+        )
+
+    linhas = {}
+
+    def linha(dia, categoria, atribuido_para):
+        return linhas.setdefault((dia, categoria, atribuido_para), [0, 0, 0, 0.0, [0] * FAIXAS])
+
+    for tabela in ("chamados", "chamados_arquivo"):
+        for dia, categoria, atribuido_para, n in conn.execute(text(_sql_criados(tabela, periodo)), params):
+            linha(dia, categoria, atribuido_para)[0] += n
+        for dia, categoria, atribuido_para, resolvido, faixa, n, soma in conn.execute(
+            text(_sql_encerrados(tabela, periodo)), params
+        ):
+            atual = linha(dia, categoria, atribuido_para)
+            atual[1] += n
+            if resolvido:
+                atual[2] += n
+                atual[3] += float(soma)
+                atual[4][faixa] += n
+
+    if linhas:
+        conn.execute(SQL_SOMAR, [
+            {
+                "dia": dia, "categoria": categoria, "atribuido_para": atribuido_para,
+                "criados": v[0], "encerrados": v[1], "resolvidos": v[2], "soma_horas": v[3], "histograma": v[4],
+            }
+            for (dia, categoria, atribuido_para), v in sorted(linhas.items())
+        ])
+    return len(linhas)
+
+
+def recalcular_recentes(engine, dias: int) -> int:
+    """Recalcula os últimos `dias` dias (incluindo hoje)"""
+    ate = hoje()
+    with engine.begin() as conn:
+        return recalcular(conn, ate - timedelta(days=dias - 1), ate)
+
+
+# ============================================================================
+# CONSULTA DAS SÉRIES
+# ============================================================================
+
+def _percentil(histograma, p: float):
+    """Percentil aproximado pelo histograma (interpolação linear dentro da faixa)"""
+    total = sum(histograma)
+    if not total:
+        return None
+    alvo = p * total
+    acumulado = 0
+    for faixa, n in enumerate(histograma):
+        if n and acumulado + n >= alvo:
+            inicio = LIMITES_HORAS[faixa - 1] if faixa else 0
+            if faixa == len(LIMITES_HORAS):
+                return float(inicio)
+            fim = LIMITES_HORAS[faixa]
+            return round(inicio + (fim - inicio) * (alvo - acumulado) / n, 2)
+        acumulado += n
+    return None
+
+
+def _resumo(resolvidos: int, soma_horas: float, histograma) -> dict:
+    return {
+        "resolvidos": resolvidos,
+        "media_horas": round(soma_horas / resolvidos, 2) if resolvidos else None,
+        "p50_horas": _percentil(histograma, 0.5),
+        "p90_horas": _percentil(histograma, 0.9),
+    }
+
+
+# Uma varredura do intervalo para os três agrupamentos; os histogramas são
+# somados faixa a faixa (SUM por posição, mais barato que unnest)
+_SOMA_HISTOGRAMA = ", ".join(f"SUM(histograma[{i}])" for i in range(1, FAIXAS + 1))
+
+
+def _agregar(db, unidade: str, filtros: str, params: dict) -> list:
+    """(periodo, categoria, atribuido_para, criados, encerrados, resolvidos, soma_horas, histograma) por grupo"""
+    return db.execute(text(f"""
+        SELECT CAST(date_trunc('{unidade}', dia) AS DATE) AS periodo, categoria, atribuido_para,
+               SUM(criados), SUM(encerrados), SUM(resolvidos), SUM(soma_horas_resolucao),
+               ARRAY[{_SOMA_HISTOGRAMA}]
+        FROM estatisticas_diarias
+        WHERE dia >= :desde AND dia <= :ate {filtros}
+        GROUP BY GROUPING SETS ((1), (categoria), (atribuido_para))
+    """), params).all()
+
+
+def _periodos(desde: date, ate: date, granularidade: str) -> list:
+    if granularidade == "semana":
+        atual = desde - timedelta(days=desde.weekday())
+    elif granularidade == "mes":
+        atual = desde.replace(day=1)
+    else:
+        atual = desde
+    periodos = []
+    while atual <= ate:
+        periodos.append(atual)
+        if granularidade == "dia":
+            atual += timedelta(days=1)
+        elif granularidade == "semana":
+            atual += timedelta(days=7)
+        else:
+            atual = (atual.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return periodos
+
+
+def serie(db, desde: date, ate: date, granularidade: str = "dia", categoria: str = None,
+          atribuido_para: int = None) -> dict:
+    """
+    Criados, encerrados, backlog e tempo de resolução por período, mais o
+    resumo de resolução do intervalo por categoria e por responsável
+    (atribuido_para 0 = sem responsável)
+    """
+    filtros = ""
+    params = {"desde": desde, "ate": ate}
+    if categoria:
+        filtros += " AND categoria = :categoria"
+        params["categoria"] = categoria
+    if atribuido_para is not None:
+        filtros += " AND atribuido_para = :atribuido_para"
+        params["atribuido_para"] = atribuido_para
+
+    backlog = db.execute(
+        text(f"SELECT COALESCE(SUM(criados - encerrados), 0) FROM estatisticas_diarias WHERE dia < :desde {filtros}"),
+        params
+    ).scalar()
+
+    por_periodo, por_categoria, por_responsavel = {}, {}, {}
+    for periodo, categoria, responsavel, *valores in _agregar(db, GRANULARIDADES[granularidade], filtros, params):
+        if periodo is not None:
+            por_periodo[periodo] = valores
+        elif categoria is not None:
+            por_categoria[categoria] = _resumo(valores[2], valores[3], valores[4])
+        else:
+            por_responsavel[responsavel] = _resumo(valores[2], valores[3], valores[4])
+
+    pontos = []
+    for periodo in _periodos(desde, ate, granularidade):
+        criados, encerrados, resolvidos, soma, histograma = por_periodo.get(periodo) or (0, 0, 0, 0, [])
+        backlog += criados - encerrados
+        pontos.append({
+            "periodo": periodo,
+            "criados": criados,
+            "encerrados": encerrados,
+            "backlog": backlog,
+            **_resumo(resolvidos, soma, histograma),
+        })
+
+    return {
+        "granularidade": granularidade,
+        "pontos": pontos,
+        "por_categoria": dict(sorted(por_categoria.items())),
+        "por_responsavel": dict(sorted(por_responsavel.items())),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+
+    from database import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Recalcula as estatísticas diárias dos chamados")
+    parser.add_argument("--dias", type=int, default=get_settings().estatisticas_dias_recalculo)
+    parser.add_argument("--tudo", action="store_true", help="reconstrói a tabela inteira")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    if args.tudo:
+        with engine.begin() as conn:
+            linhas = recalcular(conn)
+    else:
+        linhas = recalcular_recentes(engine, args.dias)
+    print(f"✓ {linhas} linha(s) de estatísticas recalculada(s)")
@@ -0,0 +1,170 @@
+"""
+Histórico de alterações dos chamados (tabela chamado_eventos)
+
+Log append-only gravado na mesma transação da alteração. Cada evento é uma
+linha de tamanho fixo: tipo (smallint) e os valores antigo/novo como inteiros
+(códigos de status/prioridade/categoria, id do usuário atribuído ou do
+comentário), sem JSON nem texto repetido.
+
+Os eventos não têm FK para chamados: o histórico continua existindo depois
+que o chamado é excluído (evento EXCLUIDO).
+"""
+from datetime import datetime
+from enum import IntEnum
+
+from models import ChamadoEvento
+
+
+class TipoEvento(IntEnum):
+    CRIADO = 1        # para = status inicial
+    STATUS = 2        # de/para = códigos de status
+    PRIORIDADE = 3    # de/para = códigos de prioridade
+    ATRIBUICAO = 4    # de/para = id do usuário (NULL = ninguém)
+    CATEGORIA = 5     # de/para = códigos de categoria
+    COMENTARIO = 6    # para = id do comentário
+    EDITADO = 7       # título, descrição ou dados extras alterados
+    EXCLUIDO = 8
+    SLA_VIOLADO = 9
+    ARQUIVADO = 10
+    DESARQUIVADO = 11
+    MESCLADO = 12     # para = id do chamado pai (duplicado mesclado nele)
+
+
+# A ordem é o código gravado: só acrescentar valores no final
+STATUS = ("aberto", "em_andamento", "aguardando", "resolvido", "fechado", "cancelado")
+PRIORIDADES = ("baixa", "media", "alta", "urgente")
+CATEGORIAS = ("hardware", "software", "rede", "email", "sistema", "novo_colaborador", "outro")
+
+_CODIFICACAO = {
+    TipoEvento.CRIADO: STATUS,
+    TipoEvento.STATUS: STATUS,
+    TipoEvento.PRIORIDADE: PRIORIDADES,
+    TipoEvento.CATEGORIA: CATEGORIAS,
+}
+
+_CAMPOS_TIPADOS = {
+    "status": TipoEvento.STATUS,
+    "prioridade": TipoEvento.PRIORIDADE,
+    "atribuido_para": TipoEvento.ATRIBUICAO,
+    "categoria": TipoEvento.CATEGORIA,
+}
+_CAMPOS_EDICAO = ("titulo", "descricao", "dados_extras")
+CAMPOS_AUDITADOS = tuple(_CAMPOS_TIPADOS) + _CAMPOS_EDICAO
+
+
+def codificar(tipo: TipoEvento, valor):
+    valores = _CODIFICACAO.get(tipo)
+    if valores is None or valor is None:
+        return valor
+    return valores.index(valor) + 1
+
+
+def decodificar(tipo: int, valor):
+    valores = _CODIFICACAO.get(tipo)
+    if valores is None or valor is None:
+        return valor
+    return valores[valor - 1]
+
+
+def registrar(db, chamado_id: int, tipo: TipoEvento, usuario_id: int = None, de=None, para=None):
+    """Adiciona o evento à sessão (é gravado no commit da alteração)"""
+    evento = ChamadoEvento(
+        chamado_id=chamado_id,
+        usuario_id=usuario_id,
+        tipo=int(tipo),
+        de=codificar(tipo, de),
+        para=codificar(tipo, para),
+        criado_em=datetime.utcnow()
+    )
+    db.add(evento)
+    return evento
+
+
+def capturar(chamado) -> dict:
+    """Valores auditados antes de uma alteração"""
+    return {campo: getattr(chamado, campo) for campo in CAMPOS_AUDITADOS}
+
+
+def registrar_alteracoes(db, chamado, antes: dict, usuario_id: int):
+    """Um evento por campo tipado alterado e um EDITADO para os demais"""
+    for campo, tipo in _CAMPOS_TIPADOS.items():
+        novo = getattr(chamado, campo)
+        if novo != antes[campo]:
+            registrar(db, chamado.id, tipo, usuario_id, de=antes[campo], para=novo)
+    if any(getattr(chamado, campo) != antes[campo] for campo in _CAMPOS_EDICAO):
+        registrar(db, chamado.id, TipoEvento.EDITADO, usuario_id)
+
+
+def linhas_alteracoes(chamado_id: int, antes: dict, depois: dict, usuario_id: int, criado_em: datetime) -> list:
+    """Eventos dos campos tipados alterados, como linhas para um INSERT em lote"""
+    return [
+        {
+            "chamado_id": chamado_id, "usuario_id": usuario_id, "tipo": int(tipo),
+            "de": codificar(tipo, antes[campo]), "para": codificar(tipo, depois[campo]), "criado_em": criado_em,
+        }
+        for campo, tipo in _CAMPOS_TIPADOS.items()
+        if campo in depois and depois[campo] != antes[campo]
+    ]
+
+
+def como_dict(evento) -> dict:
+    return {
+        "id": evento.id,
+        "tipo": TipoEvento(evento.tipo).name.lower(),
+        "usuario_id": evento.usuario_id,
+        "de": decodificar(evento.tipo, evento.de),
+        "para": decodificar(evento.tipo, evento.para),
+        "criado_em": evento.criado_em,
+    }
+
+
+def tempo_em_status(db, desde: datetime = None, ate: datetime = None, lote: int = 2000) -> dict:
+    """
+    Tempo total e médio em cada status, a partir dos eventos CRIADO/STATUS.
+
+    Os eventos são lidos em ordem (chamado_id, id) por um cursor no servidor
+    (yield_per), então a memória usada não depende do tamanho do histórico.
+    O intervalo do status atual de cada chamado vai até `ate` (padrão: agora).
+    """
+    ate = ate or datetime.utcnow()
+    totais = {status: 0.0 for status in STATUS}
+    contagens = {status: 0 for status in STATUS}
+
+    query = (
+        db.query(ChamadoEvento.chamado_id, ChamadoEvento.tipo, ChamadoEvento.para, ChamadoEvento.criado_em)
+        .filter(ChamadoEvento.tipo.in_((TipoEvento.CRIADO, TipoEvento.STATUS, TipoEvento.EXCLUIDO)))
+        .filter(ChamadoEvento.criado_em < ate)
+        .order_by(ChamadoEvento.chamado_id, ChamadoEvento.id)
+        .execution_options(yield_per=lote)
+    )
+    if desde is not None:
+        # Só chamados criados no período
+        criados = db.query(ChamadoEvento.chamado_id).filter(
+            ChamadoEvento.tipo == TipoEvento.CRIADO, ChamadoEvento.criado_em >= desde
+        )
+        query = query.filter(ChamadoEvento.chamado_id.in_(criados))
+
+    def fechar(status, inicio, fim):
+        if status is not None:
+            totais[status] += (fim - inicio).total_seconds()
+            contagens[status] += 1
+
+    atual_id = status_atual = inicio_atual = None
+    for chamado_id, tipo, para, criado_em in query:
+        if chamado_id != atual_id:
+            fechar(status_atual, inicio_atual, ate)
+            atual_id, status_atual = chamado_id, None
+        else:
+            fechar(status_atual, inicio_atual, criado_em)
+        status_atual = decodificar(tipo, para) if tipo != TipoEvento.EXCLUIDO else None
+        inicio_atual = criado_em
+    fechar(status_atual, inicio_atual, ate)
+
+    return {
+        status: {
+            "intervalos": contagens[status],
+            "total_horas": round(totais[status] / 3600, 2),
+            "media_horas": round(totais[status] / 3600 / contagens[status], 2) if contagens[status] else None,
+        }
+        for status in STATUS
+    }
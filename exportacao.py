@@ -0,0 +1,172 @@
+"""
+Exportação de chamados em CSV/XLSX para relatórios
+
+As linhas vêm de um cursor no servidor (yield_per) e são escritas em blocos,
+então a memória usada não cresce com o número de chamados exportados. O CSV
+é gerado enquanto é enviado; o XLSX (formato zip) precisa ser fechado antes
+do envio, então é escrito em modo write_only num arquivo temporário e depois
+transmitido em blocos. Para exportações muito grandes prefira o CSV: o
+openpyxl ainda mantém em memória a tabela de textos da planilha.
+
+Os campos de dados_extras dos chamados de novo colaborador viram colunas
+próprias (equipamentos.celular, aplicativos.chrome, ...).
+
+Textos que o Excel interpretaria como fórmula (começando com =, +, -, @,
+tab ou CR) saem prefixados com ' no CSV; no XLSX ficam intactos, em células
+do tipo texto: título, descrição e dados_extras são digitados por qualquer
+usuário.
+"""
+import csv
+import io
+import tempfile
+from sqlalchemy import func, select, literal
+from sqlalchemy.orm import aliased
+
+from config import get_settings
+from models import Usuario, Chamado, ChamadoArquivo
+
+LOTE = 1000
+TAMANHO_BLOCO = 64 * 1024
+
+FUSO = get_settings().sla_fuso
+
+COLUNAS = [
+    "id", "titulo", "descricao", "categoria", "prioridade", "status",
+    "solicitante", "solicitante_email", "atribuido_para",
+    "criado_em", "atualizado_em", "fechado_em", "prazo_em", "arquivado",
+]
+# Campos de dados_extras (novo_colaborador), achatados em colunas
+CAMPOS_EXTRAS = [
+    ("colaborador_nome",),
+    ("colaborador_data_nascimento",),
+    ("data_inicio",),
+    ("equipamentos", "celular"),
+    ("equipamentos", "notebook"),
+    ("equipamentos", "email"),
+    ("equipamentos", "debx"),
+    ("aplicativos", "whatsapp"),
+    ("aplicativos", "chrome"),
+    ("sharepoint_pastas",),
+]
+CABECALHO = COLUNAS + [".".join(caminho) for caminho in CAMPOS_EXTRAS]
+# Início de texto que a planilha trataria como fórmula (injeção de CSV)
+INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _data_local(coluna):
+    # Formatada pelo banco no fuso local: evita o parse/formatação de datas
+    # linha a linha no Python, que dominava o tempo da exportação
+    return func.to_char(func.timezone(FUSO, func.timezone("UTC", coluna)), "YYYY-MM-DD HH24:MI:SS")
+
+
+def _consulta(modelo, condicoes, arquivado: bool):
+    solicitante = aliased(Usuario)
+    atribuido = aliased(Usuario)
+    return (
+        select(
+            modelo.id, modelo.titulo, modelo.descricao, modelo.categoria, modelo.prioridade, modelo.status,
+            solicitante.nome, solicitante.email, atribuido.nome,
+            _data_local(modelo.criado_em), _data_local(modelo.atualizado_em),
+            _data_local(modelo.fechado_em), _data_local(modelo.prazo_em),
+            literal(arquivado), modelo.dados_extras,
+        )
+        .join(solicitante, solicitante.id == modelo.usuario_id)
+        .outerjoin(atribuido, atribuido.id == modelo.atribuido_para)
+        .where(*condicoes)
+        .order_by(modelo.criado_em.desc())
+        .execution_options(yield_per=LOTE)
+    )
+
+
+def _formatar(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "sim" if valor else "não"
+    return valor
+
+
+def _texto_csv(valor):
+    # No CSV não há tipo de célula: o ' impede que o texto vire fórmula
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _extra(dados_extras, caminho):
+    valor = dados_extras
+    for chave in caminho:
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(chave)
+    return valor
+
+
+def linhas(sessao, condicoes, condicoes_arquivo=None):
+    """Linhas formatadas (listas na ordem de CABECALHO), em blocos de LOTE"""
+    consultas = [_consulta(Chamado, condicoes, False)]
+    if condicoes_arquivo is not None:
+        consultas.append(_consulta(ChamadoArquivo, condicoes_arquivo, True))
+
+    for consulta in consultas:
+        for bloco in sessao.execute(consulta).partitions():
+            yield [
+                [_formatar(valor) for valor in linha[:-1]]
+                + [_formatar(_extra(linha[-1], caminho)) for caminho in CAMPOS_EXTRAS]
+                for linha in bloco
+            ]
+
+
+def gerar_csv(sessao, condicoes, condicoes_arquivo=None):
+    """CSV (separador ';' e BOM, como o Excel em português espera) em blocos de bytes"""
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        buffer.write("\ufeff")
+        writer.writerow(CABECALHO)
+        for bloco in linhas(sessao, condicoes, condicoes_arquivo):
+            writer.writerows([_texto_csv(valor) for valor in linha] for linha in bloco)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    finally:
+        sessao.close()
+
+
+def gerar_xlsx(sessao, condicoes, condicoes_arquivo=None):
+    """XLSX em blocos de bytes (requer openpyxl)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    def _celula(planilha, valor):
+        if not isinstance(valor, str):
+            return valor
+        celula = WriteOnlyCell(planilha, valor)
+        celula.data_type = "s"  # nunca fórmula, mesmo que o texto comece com =
+        return celula
+
+    try:
+        workbook = Workbook(write_only=True)
+        planilha = workbook.create_sheet("Chamados")
+        planilha.append(CABECALHO)
+        for bloco in linhas(sessao, condicoes, condicoes_arquivo):
+            for linha in bloco:
+                planilha.append([_celula(planilha, valor) for valor in linha])
+    finally:
+        sessao.close()
+
+    with tempfile.TemporaryFile() as arquivo:
+        workbook.save(arquivo)
+        arquivo.seek(0)
+        while bloco := arquivo.read(TAMANHO_BLOCO):
+            yield bloco
+
+
+def xlsx_disponivel() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,49 @@
+"""
+Lembrete de chamados parados em "aguardando"
+
+Chamado em "aguardando" sem movimentação (edição ou comentário) há mais de
+LEMBRETE_AGUARDANDO_HORAS entra num resumo enviado ao grupo do TI no
+Telegram. O lembrete se repete a cada LEMBRETE_AGUARDANDO_HORAS enquanto o
+chamado continuar parado: lembrete_aguardando_em conta como a última
+movimentação. Roda como tarefa agendada global (um worker só), e a marcação
+usa SKIP LOCKED para não esperar por chamados sendo editados naquele momento.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+SQL_REIVINDICAR_LEMBRETES = text("""
+    UPDATE chamados c SET lembrete_aguardando_em = :agora
+    FROM (
+        SELECT id FROM chamados ch
+        WHERE status = 'aguardando'
+          AND GREATEST(
+                atualizado_em, lembrete_aguardando_em,
+                (SELECT MAX(criado_em) FROM comentarios WHERE chamado_id = ch.id)
+              ) < :corte
+        ORDER BY atualizado_em
+        LIMIT :lote
+        FOR UPDATE SKIP LOCKED
+    ) parados
+    WHERE c.id = parados.id
+    RETURNING c.id, c.titulo
+""")
+
+
+def reivindicar_lembretes(engine, horas: int, lote: int = 100) -> list:
+    """Marca e retorna os chamados parados; a marcação é confirmada antes do envio"""
+    agora = datetime.utcnow()
+    with engine.begin() as conn:
+        return conn.execute(SQL_REIVINDICAR_LEMBRETES, {
+            "agora": agora, "corte": agora - timedelta(hours=horas), "lote": lote,
+        }).mappings().all()
+
+
+def enviar_lembretes(engine, horas: int) -> int:
+    """Uma passada da tarefa: um único resumo no Telegram; retorna quantos chamados entraram"""
+    from telegram_notifier import notificar_aguardando_parados
+
+    chamados = reivindicar_lembretes(engine, horas)
+    if chamados:
+        notificar_aguardando_parados([(c["id"], c["titulo"]) for c in chamados], horas)
+    return len(chamados)
@@ -0,0 +1,103 @@
+"""
+Alterações em lote de chamados (multisseleção do Kanban)
+
+Status, prioridade e responsável de vários chamados mudam com um número fixo
+de comandos, qualquer que seja a quantidade de chamados: um SELECT ... FOR
+UPDATE (em ordem de id, como na mesclagem) que lê o estado anterior, um único
+UPDATE ... FROM unnest(...) com o prazo de SLA de cada chamado, um INSERT com
+todos os eventos do histórico, um UPSERT com o delta das séries diárias e
+um INSERT com os contadores de não lidos dos novos responsáveis.
+As permissões são verificadas pela API antes de aplicar.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, insert, text
+
+import estatisticas
+import eventos
+import presenca
+import sla
+from models import ChamadoEvento
+
+CAMPOS = ("status", "prioridade", "atribuido_para")
+STATUS_COM_FECHAMENTO = ("resolvido", "fechado")
+
+SQL_TRAVAR = text("""
+    SELECT id, titulo, usuario_id, status, prioridade, categoria, atribuido_para,
+           criado_em, atualizado_em, fechado_em
+    FROM chamados WHERE id IN :ids
+    ORDER BY id
+    FOR UPDATE
+""").bindparams(bindparam("ids", expanding=True))
+
+SQL_ATUALIZAR = text("""
+    UPDATE chamados c SET
+        status = novo.status,
+        prioridade = novo.prioridade,
+        atribuido_para = novo.atribuido_para,
+        fechado_em = novo.fechado_em,
+        prazo_em = COALESCE(novo.prazo_em, c.prazo_em),
+        -- Prazo estendido: uma nova violação deve gerar novo alerta (como em sla.atualizar_prazo)
+        sla_violacao_notificada_em = CASE WHEN novo.prazo_em > :agora THEN NULL
+                                          ELSE c.sla_violacao_notificada_em END,
+        atualizado_em = :agora,
+        versao = c.versao + 1
+    FROM unnest(CAST(:ids AS INTEGER[]), CAST(:status AS VARCHAR[]), CAST(:prioridades AS VARCHAR[]),
+                CAST(:atribuidos AS INTEGER[]), CAST(:fechados AS TIMESTAMP[]), CAST(:prazos AS TIMESTAMP[]))
+         AS novo(id, status, prioridade, atribuido_para, fechado_em, prazo_em)
+    WHERE c.id = novo.id
+""")
+
+
+def travar(db, ids: list) -> list:
+    """Chamados pedidos, travados até o fim da transação (ausentes ficam de fora)"""
+    return db.execute(SQL_TRAVAR, {"ids": ids}).all()
+
+
+def aplicar(db, chamados: list, alteracoes: dict, usuario_id: int) -> list:
+    """
+    Aplica as alterações (subconjunto de CAMPOS) aos chamados travados, na
+    transação de `db` (o chamador faz o commit). Retorna (linha anterior,
+    valores novos) dos chamados que mudaram.
+    """
+    agora = datetime.utcnow()
+    mudancas, linhas_eventos, series = [], [], []
+    for chamado in chamados:
+        antes = {campo: getattr(chamado, campo) for campo in CAMPOS}
+        depois = {**antes, **alteracoes}
+        if depois == antes:
+            continue
+        depois["fechado_em"] = chamado.fechado_em
+        if depois["status"] != antes["status"] and depois["status"] in STATUS_COM_FECHAMENTO:
+            depois["fechado_em"] = agora
+        depois["prazo_em"] = None  # NULL no UPDATE: mantém o prazo atual
+        if depois["prioridade"] != antes["prioridade"]:
+            depois["prazo_em"] = sla.calcular_prazo(depois["prioridade"], chamado.categoria, chamado.criado_em or agora)
+
+        mudancas.append((chamado, depois))
+        linhas_eventos += eventos.linhas_alteracoes(chamado.id, antes, depois, usuario_id, agora)
+        serie_antes = estatisticas.capturar(chamado)
+        series.append((serie_antes, {
+            **serie_antes, "status": depois["status"], "fechado_em": depois["fechado_em"],
+            "atribuido_para": depois["atribuido_para"] or 0, "atualizado_em": agora,
+        }))
+
+    if not mudancas:
+        return []
+
+    db.execute(SQL_ATUALIZAR, {
+        "agora": agora,
+        "ids": [chamado.id for chamado, _ in mudancas],
+        "status": [depois["status"] for _, depois in mudancas],
+        "prioridades": [depois["prioridade"] for _, depois in mudancas],
+        "atribuidos": [depois["atribuido_para"] for _, depois in mudancas],
+        "fechados": [depois["fechado_em"] for _, depois in mudancas],
+        "prazos": [depois["prazo_em"] for _, depois in mudancas],
+    })
+    db.execute(insert(ChamadoEvento), linhas_eventos)
+    estatisticas.registrar_lote(db, series)
+    presenca.registrar_responsaveis(db, [
+        (chamado.id, depois["atribuido_para"]) for chamado, depois in mudancas
+        if depois["atribuido_para"] != chamado.atribuido_para
+    ])
+    return mudancas
@@ -0,0 +1,325 @@
+"""
+Métricas da aplicação no formato de exposição do Prometheus (GET /metrics)
+
+Implementação mínima e sem dependências externas: contadores, gauges e
+histogramas com buckets fixos. Cada série é criada uma vez (na primeira vez
+que uma combinação de labels aparece) e depois só tem seus contadores
+incrementados, então a instrumentação pode ficar ligada em produção.
+Os incrementos não usam lock; sob concorrência entre threads um incremento
+raro pode se perder, o que é aceitável para métricas.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERY = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BUCKETS_CONTAGEM = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+BUCKETS_TAREFA = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(nomes, valores) -> str:
+    if not nomes:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)) + "}"
+
+
+def _formatar_valor(valor) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, labels=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.nomes_labels = tuple(labels)
+        self._series = {}
+        if not self.nomes_labels:
+            self._series[()] = self._nova_serie()
+        REGISTRO.registrar(self)
+
+    def _nova_serie(self):
+        raise NotImplementedError
+
+    def labels(self, *valores):
+        """Série para a combinação de labels (criada na primeira vez)"""
+        serie = self._series.get(valores)
+        if serie is None:
+            serie = self._series.setdefault(valores, self._nova_serie())
+        return serie
+
+    def _linhas(self):
+        raise NotImplementedError
+
+    def expor(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        linhas.extend(self._linhas())
+        return "\n".join(linhas)
+
+
+class _ValorSerie:
+    __slots__ = ("valor",)
+
+    def __init__(self):
+        self.valor = 0.0
+
+    def inc(self, quantidade: float = 1.0):
+        self.valor += quantidade
+
+    def dec(self, quantidade: float = 1.0):
+        self.valor -= quantidade
+
+    def set(self, valor: float):
+        self.valor = valor
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def _nova_serie(self):
+        return _ValorSerie()
+
+    def inc(self, quantidade: float = 1.0):
+        self._series[()].valor += quantidade
+
+    def _linhas(self):
+        for valores, serie in list(self._series.items()):
+            yield f"{self.nome}{_formatar_labels(self.nomes_labels, valores)} {_formatar_valor(serie.valor)}"
+
+
+class Gauge(Contador):
+    tipo = "gauge"
+
+    def dec(self, quantidade: float = 1.0):
+        self._series[()].valor -= quantidade
+
+    def set(self, valor: float):
+        self._series[()].valor = valor
+
+
+class GaugeCallback(_Metrica):
+    """Gauge calculado no momento da coleta (ex.: estado do pool de conexões)"""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, callback, labels=()):
+        self.callback = callback
+        super().__init__(nome, ajuda, labels)
+
+    def _nova_serie(self):
+        return None
+
+    def _linhas(self):
+        for valores, valor in self.callback():
+            yield f"{self.nome}{_formatar_labels(self.nomes_labels, valores)} {_formatar_valor(valor)}"
+
+
+class _SerieHistograma:
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observe(self, valor: float):
+        indice = bisect_left(self.limites, valor)
+        if indice < len(self.contagens):
+            self.contagens[indice] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, labels=(), buckets=BUCKETS_LATENCIA):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(nome, ajuda, labels)
+
+    def _nova_serie(self):
+        return _SerieHistograma(self.buckets)
+
+    def observe(self, valor: float):
+        self._series[()].observe(valor)
+
+    def _linhas(self):
+        nomes_bucket = self.nomes_labels + ("le",)
+        for valores, serie in list(self._series.items()):
+            acumulado = 0
+            for limite, contagem in zip(serie.limites, serie.contagens):
+                acumulado += contagem
+                yield f"{self.nome}_bucket{_formatar_labels(nomes_bucket, valores + (_formatar_valor(float(limite)),))} {acumulado}"
+            yield f"{self.nome}_bucket{_formatar_labels(nomes_bucket, valores + ('+Inf',))} {serie.total}"
+            labels = _formatar_labels(self.nomes_labels, valores)
+            yield f"{self.nome}_sum{labels} {_formatar_valor(serie.soma)}"
+            yield f"{self.nome}_count{labels} {serie.total}"
+
+
+class Registro:
+    def __init__(self):
+        self.metricas = []
+
+    def registrar(self, metrica):
+        self.metricas.append(metrica)
+
+    def expor(self) -> str:
+        return "\n".join(metrica.expor() for metrica in self.metricas) + "\n"
+
+
+REGISTRO = Registro()
+
+# ============================================================================
+# MÉTRICAS DA APLICAÇÃO
+# ============================================================================
+
+HTTP_DURACAO = Histograma(
+    "chamados_http_request_duration_seconds", "Latência das requisições HTTP por rota", ("route", "method")
+)
+HTTP_REQUISICOES = Contador(
+    "chamados_http_requests_total", "Requisições HTTP por rota e status", ("route", "method", "status")
+)
+DB_QUERIES = Contador("chamados_db_queries_total", "Queries executadas no banco")
+DB_DURACAO = Histograma(
+    "chamados_db_query_duration_seconds", "Duração de cada query no banco", buckets=BUCKETS_QUERY
+)
+DB_QUERIES_POR_REQUISICAO = Histograma(
+    "chamados_db_queries_per_request", "Queries por requisição HTTP", ("route",), buckets=BUCKETS_CONTAGEM
+)
+DB_TEMPO_POR_REQUISICAO = Histograma(
+    "chamados_db_time_per_request_seconds", "Tempo total de banco por requisição HTTP", ("route",)
+)
+WS_CONEXOES = Gauge("chamados_websocket_connections", "Conexões WebSocket abertas")
+WS_BROADCAST_DURACAO = Histograma(
+    "chamados_websocket_broadcast_duration_seconds", "Tempo de fan-out de um broadcast WebSocket"
+)
+WS_MENSAGENS = Contador("chamados_websocket_messages_sent_total", "Mensagens WebSocket enviadas")
+WS_DESCARTES = Contador(
+    "chamados_websocket_queue_overflows_total", "Filas de envio WebSocket que encheram (cliente lento)", ("politica",)
+)
+WS_ENCERRAMENTOS = Contador(
+    "chamados_websocket_closed_by_server_total", "Conexões WebSocket encerradas pelo servidor", ("motivo",)
+)
+PRESENCA_MENSAGENS = Contador(
+    "chamados_presence_messages_total", "Mensagens de presença enfileiradas (só para quem vê o chamado)"
+)
+SSE_CONEXOES = Gauge("chamados_sse_connections", "Streams SSE abertos")
+EVENTOS_REENVIADOS = Contador(
+    "chamados_realtime_replayed_events_total", "Eventos reenviados a clientes que reconectaram", ("canal",)
+)
+EVENTOS_RESYNC = Contador(
+    "chamados_realtime_resyncs_total", "Reconexões que não puderam ser retomadas pelo buffer", ("canal",)
+)
+NOTIFICACAO_DURACAO = Histograma(
+    "chamados_notification_duration_seconds", "Latência de envio de notificações", ("channel",)
+)
+NOTIFICACAO_FALHAS = Contador(
+    "chamados_notification_failures_total", "Falhas no envio de notificações", ("channel",)
+)
+BCRYPT_DURACAO = Histograma(
+    "chamados_bcrypt_duration_seconds", "Tempo gasto em hash/verificação bcrypt", ("operation",)
+)
+RATE_LIMIT_REJEICOES = Contador(
+    "chamados_rate_limit_rejections_total", "Requisições recusadas (429) pelo rate limit", ("rule",)
+)
+CACHE_ACERTOS = Contador("chamados_cache_hits_total", "Leituras atendidas pelo cache em memória", ("cache",))
+CACHE_FALHAS = Contador("chamados_cache_misses_total", "Leituras que foram ao banco (ausente ou expirado)", ("cache",))
+CACHE_INVALIDACOES = Contador(
+    "chamados_cache_invalidations_total", "Itens invalidados (origem: local ou notify)", ("cache", "origem")
+)
+JOB_DURACAO = Histograma(
+    "chamados_job_duration_seconds", "Duração das execuções de tarefas agendadas", ("job",), buckets=BUCKETS_TAREFA
+)
+JOB_EXECUCOES = Contador(
+    "chamados_job_runs_total", "Execuções de tarefas agendadas (ok, erro; seguidor = outro worker lidera)", ("job", "resultado")
+)
+
+# ============================================================================
+# CONTEXTO POR REQUISIÇÃO
+# ============================================================================
+
+class ContextoRequisicao:
+    """
+    Contadores de banco da requisição atual. A query mais lenta só é
+    registrada quando a requisição foi amostrada pelo profiling.
+    """
+    __slots__ = ("queries", "tempo_db", "amostrado", "sql_mais_lenta", "tempo_mais_lenta")
+
+    def __init__(self):
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.amostrado = False
+        self.sql_mais_lenta = None
+        self.tempo_mais_lenta = 0.0
+
+
+requisicao_atual: ContextVar = ContextVar("requisicao_atual", default=None)
+
+
+class MetricasMiddleware:
+    """Middleware ASGI que mede latência por template de rota e uso de banco"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        contexto = ContextoRequisicao()
+        token = requisicao_atual.set(contexto)
+        status_code = 500
+
+        async def send_com_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            requisicao_atual.reset(token)
+            rota = scope.get("route")
+            # Template da rota (/api/chamados/{chamado_id}) para não explodir a cardinalidade
+            nome_rota = getattr(rota, "path", None) or "desconhecida"
+            metodo = scope["method"]
+            HTTP_DURACAO.labels(nome_rota, metodo).observe(time.perf_counter() - inicio)
+            HTTP_REQUISICOES.labels(nome_rota, metodo, str(status_code)).inc()
+            DB_QUERIES_POR_REQUISICAO.labels(nome_rota).observe(contexto.queries)
+            DB_TEMPO_POR_REQUISICAO.labels(nome_rota).observe(contexto.tempo_db)
+
+
+def instrumentar_engine(engine):
+    """Registra contagem e duração das queries executadas pelo engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def antes_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info["inicio_query"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def depois_query(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info.pop("inicio_query", time.perf_counter())
+        DB_QUERIES.inc()
+        DB_DURACAO.observe(duracao)
+        contexto = requisicao_atual.get()
+        if contexto is not None:
+            contexto.queries += 1
+            contexto.tempo_db += duracao
+            if contexto.amostrado and duracao > contexto.tempo_mais_lenta:
+                contexto.tempo_mais_lenta = duracao
+                contexto.sql_mais_lenta = statement
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Executor de migrações versionadas do banco de dados
+
+As migrações ficam em migrations/NNNN_descricao.py e cada uma define
+upgrade(conn). A versão aplicada é registrada na tabela schema_migrations
+e a execução é protegida por advisory lock, então vários workers ou deploys
+simultâneos não aplicam a mesma migração duas vezes.
+
+Uso:
+    python migrate.py            # aplica as migrações pendentes
+    python migrate.py --status   # mostra a versão atual e as pendentes
+"""
+import importlib.util
+import os
+import re
+import sys
+import time
+
+from sqlalchemy import text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+ARQUIVO_MIGRACAO = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+# Chave do advisory lock que serializa a execução de migrações
+CHAVE_LOCK_MIGRACOES = 726_026
+
+
+class SchemaDesatualizadoError(RuntimeError):
+    """Banco de dados com versão de schema anterior à esperada pelo código"""
+
+
+def listar_migracoes():
+    """Lista as migrações disponíveis como (versao, nome, caminho), em ordem"""
+    migracoes = []
+    for arquivo in os.listdir(MIGRATIONS_DIR):
+        match = ARQUIVO_MIGRACAO.match(arquivo)
+        if match:
+            migracoes.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, arquivo)))
+    return sorted(migracoes)
+
+
+def versao_mais_recente() -> int:
+    """Versão do schema esperada pelo código (última migração disponível)"""
+    migracoes = listar_migracoes()
+    return migracoes[-1][0] if migracoes else 0
+
+
+def versao_atual(conn) -> int:
+    """Versão aplicada no banco (0 se a tabela de controle ainda não existe)"""
+    existe = conn.execute(text("SELECT to_regclass('schema_migrations')")).scalar()
+    if not existe:
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(versao), 0) FROM schema_migrations")).scalar()
+
+
+def verificar_versao_schema(engine):
+    """
+    Verificação feita no startup da aplicação: uma única consulta à tabela
+    de controle, sem refletir o schema inteiro
+    """
+    esperada = versao_mais_recente()
+    with engine.connect() as conn:
+        atual = versao_atual(conn)
+    if atual < esperada:
+        raise SchemaDesatualizadoError(
+            f"Schema do banco na versão {atual}, código espera {esperada}. "
+            f"Execute 'python migrate.py' antes de iniciar a aplicação."
+        )
+    return atual
+
+
+def _carregar_modulo(versao: int, nome: str, caminho: str):
+    spec = importlib.util.spec_from_file_location(f"migrations.m{versao:04d}_{nome}", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def _criar_tabela_controle(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao INTEGER PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            duracao_ms INTEGER
+        )
+    """))
+
+
+def _registrar_versao(conn, versao: int, nome: str, duracao_ms: int):
+    conn.execute(
+        text("INSERT INTO schema_migrations (versao, nome, duracao_ms) VALUES (:versao, :nome, :duracao_ms)"),
+        {"versao": versao, "nome": nome, "duracao_ms": duracao_ms}
+    )
+
+
+def aplicar_migracoes(engine) -> list:
+    """
+    Aplica as migrações pendentes e retorna as versões aplicadas.
+
+    Migrações transacionais (padrão) rodam numa transação junto com o
+    registro da versão. Migrações com TRANSACIONAL = False (ex.: CREATE INDEX
+    CONCURRENTLY, backfills em lotes) rodam em autocommit e devem ser
+    idempotentes, pois podem ser reexecutadas após uma falha parcial.
+    Use um engine com NullPool (como no __main__), sem conexões reaproveitadas.
+    """
+    aplicadas = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:chave)"), {"chave": CHAVE_LOCK_MIGRACOES})
+        try:
+            _criar_tabela_controle(lock_conn)
+            atual = versao_atual(lock_conn)
+
+            for versao, nome, caminho in listar_migracoes():
+                if versao <= atual:
+                    continue
+
+                modulo = _carregar_modulo(versao, nome, caminho)
+                print(f"→ {versao:04d}_{nome}: {(modulo.__doc__ or '').strip()}")
+                inicio = time.monotonic()
+
+                if getattr(modulo, "TRANSACIONAL", True):
+                    with engine.begin() as conn:
+                        modulo.upgrade(conn)
+                        _registrar_versao(conn, versao, nome, int((time.monotonic() - inicio) * 1000))
+                else:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        modulo.upgrade(conn)
+                        _registrar_versao(conn, versao, nome, int((time.monotonic() - inicio) * 1000))
+
+                aplicadas.append(versao)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": CHAVE_LOCK_MIGRACOES})
+    return aplicadas
+
+
+# ============================================================================
+# OPERAÇÕES ONLINE (para migrações com TRANSACIONAL = False)
+# ============================================================================
+
+def criar_indice_concorrente(conn, nome: str, tabela: str, definicao: str, where: str = None, unico: bool = False):
+    """
+    Cria índice com CREATE INDEX CONCURRENTLY, sem bloquear escritas na tabela.
+
+    Se uma execução anterior falhou no meio, o Postgres deixa o índice
+    marcado como inválido; nesse caso ele é removido e recriado.
+    """
+    invalido = conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :nome AND NOT i.indisvalid
+    """), {"nome": nome}).scalar()
+    if invalido:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+
+    sql = f"CREATE {'UNIQUE ' if unico else ''}INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {tabela} {definicao}"
+    if where:
+        sql += f" WHERE {where}"
+    conn.execute(text(sql))
+
+
+def backfill_em_lotes(conn, sql: str, lote: int = 1000, pausa: float = 0.0, **params) -> int:
+    """
+    Executa um UPDATE/DELETE em lotes até não restar linhas afetadas.
+
+    O SQL deve limitar as linhas com :lote (ex.: WHERE id IN (SELECT id ...
+    LIMIT :lote)). Em autocommit cada lote é uma transação curta, o que evita
+    locks longos e bloat de uma única transação gigante.
+    """
+    total = 0
+    while True:
+        resultado = conn.execute(text(sql), {**params, "lote": lote})
+        if resultado.rowcount <= 0:
+            return total
+        total += resultado.rowcount
+        if pausa:
+            time.sleep(pausa)
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+    from database import DATABASE_URL
+
+    # Conexões novas a cada uso: o autocommit das operações online precisa
+    # valer desde o primeiro comando da conexão
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+
+    try:
+        if "--status" in sys.argv:
+            with engine.connect() as conn:
+                atual = versao_atual(conn)
+            pendentes = [f"{v:04d}_{n}" for v, n, _ in listar_migracoes() if v > atual]
+            print(f"Versão atual: {atual}")
+            print(f"Versão esperada: {versao_mais_recente()}")
+            print(f"Pendentes: {', '.join(pendentes) if pendentes else 'nenhuma'}")
+        else:
+            aplicadas = aplicar_migracoes(engine)
+            if aplicadas:
+                print(f"✓ {len(aplicadas)} migração(ões) aplicada(s). Schema na versão {aplicadas[-1]}")
+            else:
+                print("✓ Schema já está atualizado")
+    except Exception as e:
+        print(f"✗ Erro ao executar migrações: {e}")
+        exit(1)
@@ -0,0 +1,88 @@
+"""Schema inicial: usuários, chamados, comentários e anexos"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id SERIAL PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            senha_hash VARCHAR(255) NOT NULL,
+            tipo VARCHAR(20) NOT NULL CHECK (tipo IN ('ti', 'funcionario')),
+            ativo BOOLEAN DEFAULT TRUE,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS chamados (
+            id SERIAL PRIMARY KEY,
+            titulo VARCHAR(500) NOT NULL,
+            descricao TEXT NOT NULL,
+            categoria VARCHAR(50) NOT NULL CHECK (categoria IN ('hardware', 'software', 'rede', 'email', 'sistema', 'outro')),
+            prioridade VARCHAR(20) NOT NULL DEFAULT 'media' CHECK (prioridade IN ('baixa', 'media', 'alta', 'urgente')),
+            status VARCHAR(20) NOT NULL DEFAULT 'aberto' CHECK (status IN ('aberto', 'em_andamento', 'aguardando', 'resolvido', 'fechado')),
+            usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+            atribuido_para INTEGER REFERENCES usuarios(id),
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fechado_em TIMESTAMP
+        )
+    """))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS comentarios (
+            id SERIAL PRIMARY KEY,
+            chamado_id INTEGER NOT NULL REFERENCES chamados(id) ON DELETE CASCADE,
+            usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+            comentario TEXT NOT NULL,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS anexos (
+            id SERIAL PRIMARY KEY,
+            chamado_id INTEGER NOT NULL REFERENCES chamados(id) ON DELETE CASCADE,
+            nome_arquivo VARCHAR(255) NOT NULL,
+            caminho_arquivo VARCHAR(500) NOT NULL,
+            tamanho_bytes INTEGER,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+    # Índices para performance
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamados_usuario ON chamados(usuario_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamados_status ON chamados(status)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamados_prioridade ON chamados(prioridade)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamados_atribuido ON chamados(atribuido_para)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_comentarios_chamado ON comentarios(chamado_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_anexos_chamado ON anexos(chamado_id)"))
+
+    # Trigger para atualizar atualizado_em automaticamente
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION atualizar_timestamp()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.atualizado_em = CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """))
+    for tabela in ("usuarios", "chamados"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS trigger_{tabela}_atualizado ON {tabela}"))
+        conn.execute(text(f"""
+            CREATE TRIGGER trigger_{tabela}_atualizado
+                BEFORE UPDATE ON {tabela}
+                FOR EACH ROW
+                EXECUTE FUNCTION atualizar_timestamp()
+        """))
+
+    # Usuário admin padrão (senha: admin123 - MUDAR EM PRODUÇÃO!)
+    conn.execute(text("""
+        INSERT INTO usuarios (nome, email, senha_hash, tipo)
+        VALUES ('Admin TI', 'ti@nau.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5GyYqgOqWYpIm', 'ti')
+        ON CONFLICT (email) DO NOTHING
+    """))
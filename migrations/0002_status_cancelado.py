@@ -0,0 +1,10 @@
+"""Adiciona o status 'cancelado' à constraint da tabela chamados"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE chamados DROP CONSTRAINT IF EXISTS chamados_status_check"))
+    conn.execute(text("""
+        ALTER TABLE chamados ADD CONSTRAINT chamados_status_check
+            CHECK (status IN ('aberto', 'em_andamento', 'aguardando', 'resolvido', 'fechado', 'cancelado'))
+    """))
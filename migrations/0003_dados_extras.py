@@ -0,0 +1,12 @@
+"""Adiciona coluna dados_extras (JSONB) e categoria 'novo_colaborador'"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE chamados ADD COLUMN IF NOT EXISTS dados_extras JSONB"))
+
+    conn.execute(text("ALTER TABLE chamados DROP CONSTRAINT IF EXISTS chamados_categoria_check"))
+    conn.execute(text("""
+        ALTER TABLE chamados ADD CONSTRAINT chamados_categoria_check
+            CHECK (categoria IN ('hardware', 'software', 'rede', 'email', 'sistema', 'novo_colaborador', 'outro'))
+    """))
@@ -0,0 +1,14 @@
+"""Tabela de baldes do rate limit compartilhado entre workers (RATE_LIMIT_BACKEND=postgres)"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    # UNLOGGED: sem WAL; os baldes são descartáveis e se perdem num crash do servidor
+    conn.execute(text("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+            chave VARCHAR(320) PRIMARY KEY,
+            fichas DOUBLE PRECISION NOT NULL,
+            atualizado_em DOUBLE PRECISION NOT NULL,
+            permitido BOOLEAN NOT NULL DEFAULT TRUE
+        )
+    """))
@@ -0,0 +1,79 @@
+"""
+Prazo de SLA (prazo_em) nos chamados, com índice parcial para os abertos
+
+As metas e o cálculo do calendário estão congelados aqui como eram nesta
+versão do schema: mudanças futuras em sla.py não alteram o que esta
+migração faz (nem a quebram). Só fuso, expediente e feriados vêm da
+configuração da instalação.
+"""
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+from config import get_settings
+from migrate import criar_indice_concorrente
+
+TRANSACIONAL = False
+
+# (horas, conta só o horário comercial) por prioridade, com as exceções por categoria
+METAS = {"urgente": (4, False), "alta": (8, True), "media": (24, True), "baixa": (40, True)}
+METAS_POR_CATEGORIA = {
+    "rede": {"alta": (8, False)},
+    "novo_colaborador": {"baixa": (80, True), "media": (40, True)},
+}
+
+
+def _prazo(prioridade, categoria, criado_em, fuso, inicio, fim, feriados):
+    horas, comercial = METAS_POR_CATEGORIA.get(categoria, {}).get(prioridade) or METAS[prioridade]
+    if not comercial:
+        return criado_em + timedelta(hours=horas)
+
+    restante = timedelta(hours=horas)
+    cursor = criado_em.replace(tzinfo=timezone.utc).astimezone(fuso)
+    for _ in range(3660):
+        dia = cursor.date()
+        if dia.weekday() < 5 and dia not in feriados:
+            abre = datetime.combine(dia, inicio, fuso)
+            fecha = datetime.combine(dia, fim, fuso)
+            cursor = max(cursor, abre)
+            if cursor < fecha:
+                disponivel = fecha - cursor
+                if restante <= disponivel:
+                    return (cursor + restante).astimezone(timezone.utc).replace(tzinfo=None)
+                restante -= disponivel
+        cursor = datetime.combine(dia + timedelta(days=1), dtime(0), fuso)
+    raise ValueError("Calendário comercial sem dias úteis suficientes")
+
+
+def upgrade(conn):
+    settings = get_settings()
+    calendario = (
+        ZoneInfo(settings.sla_fuso),
+        dtime.fromisoformat(settings.sla_expediente_inicio),
+        dtime.fromisoformat(settings.sla_expediente_fim),
+        {date.fromisoformat(dia.strip()) for dia in settings.sla_feriados.split(",") if dia.strip()},
+    )
+
+    conn.execute(text("ALTER TABLE chamados ADD COLUMN IF NOT EXISTS prazo_em TIMESTAMP"))
+    conn.execute(text("ALTER TABLE chamados ADD COLUMN IF NOT EXISTS sla_violacao_notificada_em TIMESTAMP"))
+
+    # Backfill só dos abertos (o SLA de chamados encerrados não é mais consultado),
+    # em lotes curtos; o prazo depende do calendário, por isso é calculado em Python
+    while True:
+        pendentes = conn.execute(text("""
+            SELECT id, prioridade, categoria, criado_em FROM chamados
+            WHERE prazo_em IS NULL AND status IN ('aberto', 'em_andamento', 'aguardando')
+            ORDER BY id LIMIT 1000
+        """)).all()
+        if not pendentes:
+            break
+        conn.execute(
+            text("UPDATE chamados SET prazo_em = :prazo_em WHERE id = :id"),
+            [{"id": c.id, "prazo_em": _prazo(c.prioridade, c.categoria, c.criado_em, *calendario)} for c in pendentes]
+        )
+
+    criar_indice_concorrente(
+        conn, "idx_chamados_prazo_abertos", "chamados", "(prazo_em)",
+        where="status IN ('aberto', 'em_andamento', 'aguardando')"
+    )
@@ -0,0 +1,37 @@
+"""Histórico de alterações dos chamados (chamado_eventos), com histórico inicial aproximado"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS chamado_eventos (
+            id BIGSERIAL PRIMARY KEY,
+            chamado_id INTEGER NOT NULL,
+            usuario_id INTEGER,
+            tipo SMALLINT NOT NULL,
+            de INTEGER,
+            para INTEGER,
+            criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamado_eventos_chamado ON chamado_eventos (chamado_id, id)"))
+
+    # Chamados existentes: criação como 'aberto' e, se já mudaram, uma transição
+    # direta para o status atual na data do fechamento/última atualização.
+    # Os códigos seguem a ordem de eventos.STATUS (tipos 1 = CRIADO, 2 = STATUS).
+    conn.execute(text("""
+        INSERT INTO chamado_eventos (chamado_id, usuario_id, tipo, de, para, criado_em)
+        SELECT id, usuario_id, 1, NULL, 1, criado_em FROM chamados c
+        WHERE NOT EXISTS (SELECT 1 FROM chamado_eventos e WHERE e.chamado_id = c.id)
+        ORDER BY id
+    """))
+    conn.execute(text("""
+        INSERT INTO chamado_eventos (chamado_id, usuario_id, tipo, de, para, criado_em)
+        SELECT id, NULL, 2, 1,
+               array_position(ARRAY['aberto', 'em_andamento', 'aguardando', 'resolvido', 'fechado', 'cancelado'], status),
+               GREATEST(criado_em, COALESCE(fechado_em, atualizado_em))
+        FROM chamados c
+        WHERE status <> 'aberto'
+          AND NOT EXISTS (SELECT 1 FROM chamado_eventos e WHERE e.chamado_id = c.id AND e.tipo <> 1)
+        ORDER BY id
+    """))
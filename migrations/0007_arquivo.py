@@ -0,0 +1,38 @@
+"""Tabelas de arquivo para chamados fechados/cancelados antigos (e seus comentários e anexos)"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    # Mesmas colunas das tabelas quentes (sem defaults/sequências) + data do arquivamento.
+    # Colunas novas em chamados/comentarios/anexos precisam ser replicadas aqui.
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS chamados_arquivo (
+            LIKE chamados,
+            arquivado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id)
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS comentarios_arquivo (
+            LIKE comentarios,
+            PRIMARY KEY (id)
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS anexos_arquivo (
+            LIKE anexos,
+            PRIMARY KEY (id)
+        )
+    """))
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamados_arquivo_usuario ON chamados_arquivo(usuario_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chamados_arquivo_criado ON chamados_arquivo(criado_em)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_comentarios_arquivo_chamado ON comentarios_arquivo(chamado_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_anexos_arquivo_chamado ON anexos_arquivo(chamado_id)"))
+
+    # Candidatos ao arquivamento: só os encerrados, pela data em que foram encerrados
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_chamados_encerrados
+            ON chamados (COALESCE(fechado_em, atualizado_em))
+            WHERE status IN ('fechado', 'cancelado')
+    """))
@@ -0,0 +1,90 @@
+"""
+Séries diárias pré-agregadas (estatisticas_diarias) e índices das datas de criação/encerramento
+
+A reconstrução inicial está congelada aqui em SQL, com as faixas do
+histograma desta versão do schema: mudanças futuras em estatisticas.py não
+alteram o que esta migração faz. Só o fuso vem da configuração da instalação.
+"""
+from sqlalchemy import text
+
+from config import get_settings
+from migrate import criar_indice_concorrente
+
+TRANSACIONAL = False
+
+# Limites (em horas) das faixas do histograma; a última faixa é "acima de 720h"
+LIMITES_HORAS = [1, 2, 4, 8, 16, 24, 48, 72, 120, 168, 336, 720]
+FAIXAS = len(LIMITES_HORAS) + 1
+
+SQL_RECONSTRUIR = f"""
+    WITH base AS (
+        SELECT criado_em, COALESCE(fechado_em, atualizado_em) AS encerrado_em, status, categoria,
+               COALESCE(atribuido_para, 0) AS atribuido_para,
+               (status IN ('resolvido', 'fechado') AND fechado_em IS NOT NULL) AS resolvido,
+               CAST(EXTRACT(EPOCH FROM fechado_em - criado_em) / 3600 AS DOUBLE PRECISION) AS horas
+        FROM chamados WHERE criado_em IS NOT NULL
+        UNION ALL
+        SELECT criado_em, COALESCE(fechado_em, atualizado_em), status, categoria,
+               COALESCE(atribuido_para, 0),
+               (status IN ('resolvido', 'fechado') AND fechado_em IS NOT NULL),
+               CAST(EXTRACT(EPOCH FROM fechado_em - criado_em) / 3600 AS DOUBLE PRECISION)
+        FROM chamados_arquivo WHERE criado_em IS NOT NULL
+    ), eventos AS (
+        SELECT CAST(timezone(:fuso, timezone('UTC', criado_em)) AS DATE) AS dia, categoria, atribuido_para,
+               1 AS criados, 0 AS encerrados, 0 AS resolvidos, 0.0 AS horas, CAST(NULL AS INTEGER) AS faixa
+        FROM base
+        UNION ALL
+        SELECT CAST(timezone(:fuso, timezone('UTC', encerrado_em)) AS DATE), categoria, atribuido_para,
+               0, 1, CAST(resolvido AS INTEGER),
+               CASE WHEN resolvido THEN horas ELSE 0 END,
+               CASE WHEN resolvido THEN width_bucket(horas, CAST(:limites AS DOUBLE PRECISION[])) END
+        FROM base
+        WHERE status IN ('resolvido', 'fechado', 'cancelado') AND encerrado_em IS NOT NULL
+    ), faixas AS (
+        SELECT dia, categoria, atribuido_para, faixa, COUNT(*) AS n
+        FROM eventos WHERE faixa IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    )
+    INSERT INTO estatisticas_diarias
+        (dia, categoria, atribuido_para, criados, encerrados, resolvidos, soma_horas_resolucao, histograma)
+    SELECT e.dia, e.categoria, e.atribuido_para, SUM(e.criados), SUM(e.encerrados), SUM(e.resolvidos),
+           SUM(e.horas),
+           ARRAY(
+               SELECT COALESCE(f.n, 0) FROM generate_series(0, {FAIXAS - 1}) AS i
+               LEFT JOIN faixas f ON f.dia = e.dia AND f.categoria = e.categoria
+                                 AND f.atribuido_para = e.atribuido_para AND f.faixa = i
+               ORDER BY i
+           )
+    FROM eventos e
+    GROUP BY 1, 2, 3
+"""
+
+
+def upgrade(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS estatisticas_diarias (
+            dia DATE NOT NULL,
+            categoria VARCHAR(50) NOT NULL,
+            atribuido_para INTEGER NOT NULL DEFAULT 0,
+            criados INTEGER NOT NULL DEFAULT 0,
+            encerrados INTEGER NOT NULL DEFAULT 0,
+            resolvidos INTEGER NOT NULL DEFAULT 0,
+            soma_horas_resolucao DOUBLE PRECISION NOT NULL DEFAULT 0,
+            histograma INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[{FAIXAS}]),
+            PRIMARY KEY (dia, categoria, atribuido_para)
+        )
+    """))
+
+    # Recálculo por janela de dias (job periódico)
+    criar_indice_concorrente(conn, "idx_chamados_criado", "chamados", "(criado_em)")
+    criar_indice_concorrente(
+        conn, "idx_chamados_encerramento", "chamados", "(COALESCE(fechado_em, atualizado_em))",
+        where="status IN ('resolvido', 'fechado', 'cancelado')"
+    )
+    criar_indice_concorrente(
+        conn, "idx_chamados_arquivo_encerramento", "chamados_arquivo", "(COALESCE(fechado_em, atualizado_em))"
+    )
+
+    # Reconstrução completa (idempotente: apaga e refaz a tabela)
+    conn.execute(text("DELETE FROM estatisticas_diarias"))
+    conn.execute(text(SQL_RECONSTRUIR), {"fuso": get_settings().sla_fuso, "limites": LIMITES_HORAS})
@@ -0,0 +1,6 @@
+"""Categorias atendidas por cada usuário do TI (atribuição automática por habilidades)"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS habilidades JSON"))
@@ -0,0 +1,14 @@
+"""
+Versão dos chamados (controle de concorrência otimista)
+
+Cada UPDATE pelo ORM confere e incrementa chamados.versao (version_id_col);
+a API expõe a versão como ETag e aceita If-Match no PUT. O arquivo recebe a
+mesma coluna porque arquivar/desarquivar copia todas as colunas. ADD COLUMN
+com DEFAULT constante não reescreve a tabela.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    for tabela in ("chamados", "chamados_arquivo"):
+        conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS versao INTEGER NOT NULL DEFAULT 1"))
@@ -0,0 +1,20 @@
+"""
+Confirmações de leitura por usuário e chamado (leituras)
+
+Cada linha guarda até qual comentário o usuário já viu. Sai junto com o
+chamado (arquivamento ou exclusão): chamados arquivados estão encerrados e
+não têm mais conversa a acompanhar.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS leituras (
+            chamado_id INTEGER NOT NULL REFERENCES chamados(id) ON DELETE CASCADE,
+            usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+            ultimo_comentario_id INTEGER NOT NULL DEFAULT 0,
+            lido_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (chamado_id, usuario_id)
+        )
+    """))
@@ -0,0 +1,29 @@
+"""
+Contador de comentários não lidos por usuário e chamado (leituras.nao_lidos)
+
+Mantido pela API: +1 a cada comentário para o solicitante, o responsável e
+quem já abriu o chamado; recalculado quando a leitura avança. A listagem lê
+o contador com um LEFT JOIN em vez de contar comentários. lido_em passa a
+aceitar NULL (contador de quem ainda não abriu o chamado) e atualizado_em,
+indexado por usuário, entra na ETag da listagem.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        ALTER TABLE leituras
+            ADD COLUMN IF NOT EXISTS nao_lidos INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            ALTER COLUMN lido_em DROP NOT NULL,
+            ALTER COLUMN lido_em DROP DEFAULT
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_leituras_usuario ON leituras (usuario_id, atualizado_em)"))
+
+    # Leituras já gravadas: comentários de outros depois do último visto
+    conn.execute(text("""
+        UPDATE leituras l SET nao_lidos = (
+            SELECT COUNT(*) FROM comentarios c
+            WHERE c.chamado_id = l.chamado_id AND c.id > l.ultimo_comentario_id AND c.usuario_id <> l.usuario_id
+        )
+    """))
@@ -0,0 +1,35 @@
+"""
+Índices para consultas dentro de dados_extras
+
+GIN com jsonb_path_ops atende os filtros de contenção da listagem
+(dados_extras @> '{"equipamentos": {"notebook": true}}'): menor e mais
+rápido que o jsonb_ops padrão, que só faria falta para buscar chaves (?).
+A data de início do novo colaborador, gravada sempre como AAAA-MM-DD,
+ganha um índice de expressão parcial para filtros por intervalo.
+
+Bancos em que a coluna foi criada como json pelo ORM são convertidos para
+jsonb antes (a conversão reescreve a tabela; só acontece nesses bancos).
+"""
+from sqlalchemy import text
+
+from migrate import criar_indice_concorrente
+
+TRANSACIONAL = False
+
+
+def upgrade(conn):
+    for tabela in ("chamados", "chamados_arquivo"):
+        tipo = conn.execute(text("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = :tabela AND column_name = 'dados_extras'
+        """), {"tabela": tabela}).scalar()
+        if tipo != "jsonb":
+            conn.execute(text(f"ALTER TABLE {tabela} ALTER COLUMN dados_extras TYPE JSONB USING dados_extras::jsonb"))
+
+    criar_indice_concorrente(
+        conn, "idx_chamados_dados_extras", "chamados", "USING GIN (dados_extras jsonb_path_ops)"
+    )
+    criar_indice_concorrente(
+        conn, "idx_chamados_data_inicio", "chamados", "((dados_extras ->> 'data_inicio'))",
+        where="categoria = 'novo_colaborador'"
+    )
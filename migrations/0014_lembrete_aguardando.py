@@ -0,0 +1,12 @@
+"""
+Lembrete de chamados parados em "aguardando" (chamados.lembrete_aguardando_em)
+
+Marcado pela tarefa agendada a cada lembrete enviado; o arquivo recebe a
+mesma coluna porque arquivar/desarquivar copia todas as colunas.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    for tabela in ("chamados", "chamados_arquivo"):
+        conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS lembrete_aguardando_em TIMESTAMP"))
@@ -0,0 +1,26 @@
+"""
+Contador de não lidos para quem ainda não abriu o chamado (backfill de leituras)
+
+A 0012 só recalculou as leituras já gravadas: solicitante e responsável que
+nunca abriram um chamado aberto ficavam sem contador até o próximo
+comentário. Cria essas linhas (lido_em NULL, como a API faz) para os
+chamados com comentários de outros e mantém as que já existem.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        INSERT INTO leituras (chamado_id, usuario_id, ultimo_comentario_id, nao_lidos, lido_em)
+        SELECT p.chamado_id, p.usuario_id, 0, COUNT(*), NULL
+        FROM (
+            SELECT id AS chamado_id, usuario_id FROM chamados
+            WHERE status IN ('aberto', 'em_andamento', 'aguardando')
+            UNION
+            SELECT id, atribuido_para FROM chamados
+            WHERE status IN ('aberto', 'em_andamento', 'aguardando') AND atribuido_para IS NOT NULL
+        ) p
+        JOIN comentarios c ON c.chamado_id = p.chamado_id AND c.usuario_id <> p.usuario_id
+        GROUP BY p.chamado_id, p.usuario_id
+        ON CONFLICT (chamado_id, usuario_id) DO NOTHING
+    """))
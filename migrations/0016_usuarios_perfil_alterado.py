@@ -0,0 +1,37 @@
+"""
+Última alteração dos dados de usuário embutidos nos chamados (usuarios.perfil_alterado_em)
+
+As ETags de chamado e de listagem dependem dos usuários embutidos
+(solicitante, responsável, autores). usuarios.atualizado_em muda com
+qualquer alteração, inclusive troca de senha ou de habilidades, e invalidaria
+o cache de todos os clientes. Esta coluna só muda, por trigger, quando nome,
+email, tipo ou ativo mudam. Usuário novo fica com NULL, porque ainda não
+aparece em nenhum chamado. O índice atende o MAX que as rotas consultam.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS perfil_alterado_em TIMESTAMP"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_usuarios_perfil_alterado ON usuarios (perfil_alterado_em)"
+    ))
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION marcar_perfil_alterado()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF (NEW.nome, NEW.email, NEW.tipo, NEW.ativo) IS DISTINCT FROM
+               (OLD.nome, OLD.email, OLD.tipo, OLD.ativo) THEN
+                NEW.perfil_alterado_em = CURRENT_TIMESTAMP;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """))
+    conn.execute(text("DROP TRIGGER IF EXISTS trigger_usuarios_perfil ON usuarios"))
+    conn.execute(text("""
+        CREATE TRIGGER trigger_usuarios_perfil
+            BEFORE UPDATE ON usuarios
+            FOR EACH ROW
+            EXECUTE FUNCTION marcar_perfil_alterado()
+    """))
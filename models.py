@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, CheckConstraint, JSON
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Text, Boolean, DateTime, ForeignKey, CheckConstraint, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -14,8 +15,11 @@ class Usuario(Base):
     senha_hash = Column(String(255), nullable=False)
     tipo = Column(String(20), nullable=False)  # 'ti' ou 'funcionario'
     ativo = Column(Boolean, default=True)
+    habilidades = Column(JSON, nullable=True)  # Categorias atendidas (atribuição automática)
     criado_em = Column(DateTime, default=datetime.utcnow)
     atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Mantido por trigger: só muda com os campos embutidos nos chamados (nome, email, tipo, ativo)
+    perfil_alterado_em = Column(DateTime, nullable=True)
 
     # Relationships
     chamados_criados = relationship("Chamado", back_populates="usuario", foreign_keys="Chamado.usuario_id")
@@ -24,6 +28,7 @@ class Usuario(Base):
 
     __table_args__ = (
         CheckConstraint("tipo IN ('ti', 'funcionario')"),
+        Index("idx_usuarios_perfil_alterado", "perfil_alterado_em"),
     )
 
 class Chamado(Base):
@@ -37,10 +42,14 @@ class Chamado(Base):
     status = Column(String(20), nullable=False, default='aberto', index=True)
     usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
     atribuido_para = Column(Integer, ForeignKey('usuarios.id'), nullable=True)
-    dados_extras = Column(JSON, nullable=True)  # Para dados específicos por categoria
+    dados_extras = Column(JSONB, nullable=True)  # Dados específicos por categoria (validados em schemas.py)
     criado_em = Column(DateTime, default=datetime.utcnow)
     atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     fechado_em = Column(DateTime, nullable=True)
+    prazo_em = Column(DateTime, nullable=True)  # Prazo de resolução (SLA)
+    sla_violacao_notificada_em = Column(DateTime, nullable=True)
+    lembrete_aguardando_em = Column(DateTime, nullable=True)  # Último lembrete de "aguardando" parado
+    versao = Column(Integer, nullable=False, default=1)  # Conferida e incrementada a cada UPDATE (ETag)
 
     # Relationships
     usuario = relationship("Usuario", back_populates="chamados_criados", foreign_keys=[usuario_id])
@@ -52,7 +61,9 @@ class Chamado(Base):
         CheckConstraint("categoria IN ('hardware', 'software', 'rede', 'email', 'sistema', 'novo_colaborador', 'outro')"),
         CheckConstraint("prioridade IN ('baixa', 'media', 'alta', 'urgente')"),
         CheckConstraint("status IN ('aberto', 'em_andamento', 'aguardando', 'resolvido', 'fechado', 'cancelado')"),
+        Index("idx_chamados_dados_extras", dados_extras, postgresql_using="gin", postgresql_ops={"dados_extras": "jsonb_path_ops"}),
     )
+    __mapper_args__ = {"version_id_col": versao}
 
 class Comentario(Base):
     __tablename__ = "comentarios"
@@ -79,3 +90,85 @@ class Anexo(Base):
 
     # Relationships
     chamado = relationship("Chamado", back_populates="anexos")
+
+class ChamadoEvento(Base):
+    """Histórico append-only de alterações (ver eventos.py para os tipos e códigos)"""
+    __tablename__ = "chamado_eventos"
+
+    id = Column(BigInteger, primary_key=True)
+    chamado_id = Column(Integer, nullable=False)  # Sem FK: o histórico sobrevive à exclusão
+    usuario_id = Column(Integer, nullable=True)
+    tipo = Column(SmallInteger, nullable=False)
+    de = Column(Integer, nullable=True)
+    para = Column(Integer, nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_chamado_eventos_chamado", "chamado_id", "id"),
+    )
+
+class Leitura(Base):
+    """Até qual comentário cada usuário já viu o chamado e quantos não leu (ver presenca.py)"""
+    __tablename__ = "leituras"
+
+    chamado_id = Column(Integer, ForeignKey('chamados.id', ondelete="CASCADE"), primary_key=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id', ondelete="CASCADE"), primary_key=True)
+    ultimo_comentario_id = Column(Integer, nullable=False, default=0)
+    nao_lidos = Column(Integer, nullable=False, default=0)
+    lido_em = Column(DateTime, nullable=True)  # NULL: ainda não abriu o chamado
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_leituras_usuario", "usuario_id", "atualizado_em"),
+    )
+
+# ============================================================================
+# ARQUIVO (chamados fechados/cancelados antigos, movidos por arquivamento.py)
+# ============================================================================
+
+class ChamadoArquivo(Base):
+    __tablename__ = "chamados_arquivo"
+
+    id = Column(Integer, primary_key=True)
+    titulo = Column(String(500), nullable=False)
+    descricao = Column(Text, nullable=False)
+    categoria = Column(String(50), nullable=False)
+    prioridade = Column(String(20), nullable=False)
+    status = Column(String(20), nullable=False)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    atribuido_para = Column(Integer, ForeignKey('usuarios.id'), nullable=True)
+    dados_extras = Column(JSONB, nullable=True)
+    criado_em = Column(DateTime)
+    atualizado_em = Column(DateTime)
+    fechado_em = Column(DateTime, nullable=True)
+    prazo_em = Column(DateTime, nullable=True)
+    sla_violacao_notificada_em = Column(DateTime, nullable=True)
+    lembrete_aguardando_em = Column(DateTime, nullable=True)
+    versao = Column(Integer, nullable=False, default=1)
+    arquivado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Relationships (somente leitura)
+    usuario = relationship("Usuario", foreign_keys=[usuario_id], viewonly=True)
+    atribuido = relationship("Usuario", foreign_keys=[atribuido_para], viewonly=True)
+    comentarios = relationship("ComentarioArquivo", viewonly=True)
+
+class ComentarioArquivo(Base):
+    __tablename__ = "comentarios_arquivo"
+
+    id = Column(Integer, primary_key=True)
+    chamado_id = Column(Integer, ForeignKey('chamados_arquivo.id'), nullable=False)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    comentario = Column(Text, nullable=False)
+    criado_em = Column(DateTime)
+
+    usuario = relationship("Usuario", viewonly=True)
+
+class AnexoArquivo(Base):
+    __tablename__ = "anexos_arquivo"
+
+    id = Column(Integer, primary_key=True)
+    chamado_id = Column(Integer, ForeignKey('chamados_arquivo.id'), nullable=False)
+    nome_arquivo = Column(String(255), nullable=False)
+    caminho_arquivo = Column(String(500), nullable=False)
+    tamanho_bytes = Column(Integer)
+    criado_em = Column(DateTime)
@@ -0,0 +1,231 @@
+"""
+Presença nos chamados ("sendo visto por") e confirmações de leitura
+
+Cada conexão WebSocket informa o chamado que está com o detalhe aberto
+(view_ticket, repetido periodicamente pelo frontend) e quando o fecha
+(leave_ticket). A presença expira sem renovação em PRESENCA_TTL_SEGUNDOS e
+some quando a conexão cai. É mantida por worker, como as próprias conexões.
+
+Mudanças não são transmitidas a todos: ficam pendentes por
+PRESENCA_DEBOUNCE_MS e saem numa única mensagem {"type": "presence"} por
+chamado, só para as conexões que estão vendo aquele chamado, com a lista de
+quem está vendo e as confirmações de leitura que avançaram.
+
+A leitura ("visto até o comentário N") é gravada em `leituras` e por isso
+sobrevive a recarregar a página. Só é gravada quando avança.
+
+A mesma linha guarda o contador de não lidos que a listagem devolve: cada
+comentário soma 1 para o solicitante, o responsável e quem já abriu o
+chamado (menos o autor), e a leitura recalcula o contador a partir dos
+comentários depois do último visto. Comentários copiados numa mesclagem não
+somam; entram no recálculo da próxima leitura. Quem passa a ser responsável
+(edição, lote ou atribuição automática) ganha a linha na hora, com os
+comentários de outros já existentes, como no backfill da migração 0015.
+"""
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+import metrics
+from config import get_settings
+
+SQL_REGISTRAR_LEITURA = text("""
+    WITH alvo AS (
+        SELECT c.id, (SELECT COALESCE(MAX(id), 0) FROM comentarios WHERE chamado_id = c.id) AS ultimo
+        FROM chamados c
+        WHERE c.id = :chamado_id AND (:ti OR c.usuario_id = :usuario_id)
+    ),
+    leitura AS (
+        SELECT id, LEAST(COALESCE(CAST(:ate AS INTEGER), ultimo), ultimo) AS ate FROM alvo
+    )
+    INSERT INTO leituras (chamado_id, usuario_id, ultimo_comentario_id, nao_lidos, lido_em, atualizado_em)
+    SELECT l.id, :usuario_id, l.ate,
+           (SELECT COUNT(*) FROM comentarios co
+            WHERE co.chamado_id = l.id AND co.usuario_id <> :usuario_id AND co.id > l.ate),
+           :agora, :agora
+    FROM leitura l
+    ON CONFLICT (chamado_id, usuario_id) DO UPDATE SET
+        ultimo_comentario_id = GREATEST(leituras.ultimo_comentario_id, EXCLUDED.ultimo_comentario_id),
+        nao_lidos = (
+            SELECT COUNT(*) FROM comentarios
+            WHERE chamado_id = EXCLUDED.chamado_id AND usuario_id <> EXCLUDED.usuario_id
+              AND id > GREATEST(leituras.ultimo_comentario_id, EXCLUDED.ultimo_comentario_id)
+        ),
+        lido_em = EXCLUDED.lido_em,
+        atualizado_em = EXCLUDED.atualizado_em
+    RETURNING ultimo_comentario_id
+""")
+
+# Ordenado por usuário: comentários simultâneos travam as linhas na mesma ordem
+SQL_CONTAR_COMENTARIO = text("""
+    WITH destinatarios AS (
+        SELECT usuario_id FROM leituras WHERE chamado_id = :chamado_id
+        UNION
+        SELECT unnest(CAST(:participantes AS INTEGER[]))
+    )
+    INSERT INTO leituras (chamado_id, usuario_id, ultimo_comentario_id, nao_lidos, lido_em, atualizado_em)
+    SELECT :chamado_id, usuario_id, 0, 1, NULL, :agora FROM destinatarios
+    WHERE usuario_id <> :autor_id
+    ORDER BY usuario_id
+    ON CONFLICT (chamado_id, usuario_id) DO UPDATE SET
+        nao_lidos = leituras.nao_lidos + 1,
+        atualizado_em = EXCLUDED.atualizado_em
+""")
+
+SQL_LEITURA_AUTOR = text("""
+    INSERT INTO leituras (chamado_id, usuario_id, ultimo_comentario_id, nao_lidos, lido_em, atualizado_em)
+    VALUES (:chamado_id, :autor_id, :comentario_id, 0, :agora, :agora)
+    ON CONFLICT (chamado_id, usuario_id) DO UPDATE SET
+        ultimo_comentario_id = GREATEST(leituras.ultimo_comentario_id, EXCLUDED.ultimo_comentario_id),
+        nao_lidos = 0,
+        lido_em = EXCLUDED.lido_em,
+        atualizado_em = EXCLUDED.atualizado_em
+""")
+
+# Novo responsável: comentários de outros até agora (mesma regra da 0015);
+# quem já tem a linha já está sendo contado
+SQL_LEITURA_RESPONSAVEL = text("""
+    INSERT INTO leituras (chamado_id, usuario_id, ultimo_comentario_id, nao_lidos, lido_em, atualizado_em)
+    SELECT novo.chamado_id, novo.usuario_id, 0, COUNT(*), NULL, :agora
+    FROM unnest(CAST(:chamados AS INTEGER[]), CAST(:usuarios AS INTEGER[])) AS novo(chamado_id, usuario_id)
+    JOIN comentarios c ON c.chamado_id = novo.chamado_id AND c.usuario_id <> novo.usuario_id
+    GROUP BY novo.chamado_id, novo.usuario_id
+    ORDER BY novo.chamado_id, novo.usuario_id
+    ON CONFLICT (chamado_id, usuario_id) DO NOTHING
+""")
+
+
+def registrar_leitura(db, usuario_id: int, ti: bool, chamado_id: int, ate: int = None):
+    """
+    Marca o chamado como visto até o comentário `ate` (padrão: o último) e
+    retorna até onde a leitura chegou; None se o chamado não existe ou o
+    usuário não pode vê-lo. O chamador faz o commit.
+    """
+    return db.execute(SQL_REGISTRAR_LEITURA, {
+        "chamado_id": chamado_id, "usuario_id": usuario_id, "ti": ti,
+        "ate": ate, "agora": datetime.utcnow(),
+    }).scalar()
+
+
+def registrar_comentario(db, chamado, comentario):
+    """
+    Na transação do comentário: +1 não lido para os demais interessados; o
+    autor, que comentou com o chamado aberto, fica com tudo lido
+    """
+    agora = datetime.utcnow()
+    participantes = [chamado.usuario_id] + ([chamado.atribuido_para] if chamado.atribuido_para else [])
+    db.execute(SQL_CONTAR_COMENTARIO, {
+        "chamado_id": chamado.id, "autor_id": comentario.usuario_id, "participantes": participantes, "agora": agora,
+    })
+    db.execute(SQL_LEITURA_AUTOR, {
+        "chamado_id": chamado.id, "autor_id": comentario.usuario_id, "comentario_id": comentario.id, "agora": agora,
+    })
+
+
+def registrar_responsaveis(db, atribuicoes: list):
+    """
+    Na transação da atribuição: contador de não lidos para cada novo
+    responsável, dado como [(chamado_id, usuario_id)]
+    """
+    atribuicoes = [(chamado_id, usuario_id) for chamado_id, usuario_id in atribuicoes if usuario_id]
+    if atribuicoes:
+        db.execute(SQL_LEITURA_RESPONSAVEL, {
+            "chamados": [chamado_id for chamado_id, _ in atribuicoes],
+            "usuarios": [usuario_id for _, usuario_id in atribuicoes],
+            "agora": datetime.utcnow(),
+        })
+
+
+class Presenca:
+    """Quem está vendo cada chamado neste worker"""
+
+    def __init__(self, ttl: float, debounce: float):
+        self.ttl = ttl
+        self.debounce = debounce
+        self._por_chamado = {}   # chamado_id -> {conexao: expira_em}
+        self._por_conexao = {}   # conexao -> chamado_id
+        self._leituras = {}      # conexao -> último comentário já gravado
+        self._pendentes = {}     # chamado_id -> {usuario_id: ultimo_comentario_id} a publicar
+        self._agendado = None
+
+    def leitura_gravada(self, conexao, chamado_id: int):
+        """Último comentário já confirmado por esta conexão neste chamado (evita regravar)"""
+        return self._leituras.get(conexao) if self._por_conexao.get(conexao) == chamado_id else None
+
+    def entrar(self, conexao, chamado_id: int, leitura: int = None):
+        """Registra/renova a presença; `leitura` é a confirmação que acabou de avançar"""
+        if self._por_conexao.get(conexao) != chamado_id:
+            self.sair(conexao)
+            self._por_conexao[conexao] = chamado_id
+            self._marcar(chamado_id)
+        self._por_chamado.setdefault(chamado_id, {})[conexao] = time.monotonic() + self.ttl
+        if leitura is not None:
+            self._leituras[conexao] = leitura
+            self._marcar(chamado_id)[conexao.usuario_id] = leitura
+
+    def sair(self, conexao):
+        chamado_id = self._por_conexao.pop(conexao, None)
+        self._leituras.pop(conexao, None)
+        if chamado_id is None:
+            return
+        conexoes = self._por_chamado.get(chamado_id, {})
+        conexoes.pop(conexao, None)
+        if not conexoes:
+            self._por_chamado.pop(chamado_id, None)
+        self._marcar(chamado_id)
+
+    def expirar(self):
+        agora = time.monotonic()
+        vencidas = [
+            conexao for conexoes in self._por_chamado.values()
+            for conexao, expira_em in conexoes.items() if expira_em <= agora
+        ]
+        for conexao in vencidas:
+            self.sair(conexao)
+        return len(vencidas)
+
+    def visualizadores(self, chamado_id: int) -> list:
+        """Usuários (sem repetição) com o chamado aberto"""
+        usuarios = {}
+        for conexao in self._por_chamado.get(chamado_id, {}):
+            usuarios.setdefault(conexao.usuario_id, {"id": conexao.usuario_id, "nome": conexao.nome})
+        return list(usuarios.values())
+
+    def _marcar(self, chamado_id: int) -> dict:
+        pendente = self._pendentes.setdefault(chamado_id, {})
+        if self._agendado is None:
+            self._agendado = asyncio.get_running_loop().call_later(self.debounce, self._publicar)
+        return pendente
+
+    def _publicar(self):
+        """Uma mensagem por chamado alterado, só para quem está vendo o chamado"""
+        self._agendado = None
+        pendentes, self._pendentes = self._pendentes, {}
+        for chamado_id, leituras in pendentes.items():
+            conexoes = self._por_chamado.get(chamado_id)
+            if not conexoes:
+                continue
+            mensagem = {
+                "type": "presence",
+                "ticket_id": chamado_id,
+                "viewers": self.visualizadores(chamado_id),
+                "leituras": leituras,  # usuario_id -> último comentário visto (só as que avançaram)
+            }
+            for conexao in conexoes:
+                conexao.enfileirar(mensagem)
+            metrics.PRESENCA_MENSAGENS.inc(len(conexoes))
+
+    async def varrer(self):
+        """Tarefa agendada (local): é uma corrotina para rodar no loop, dono dos timers do debounce"""
+        self.expirar()
+
+
+_settings = get_settings()
+PRESENCA = Presenca(_settings.presenca_ttl_segundos, _settings.presenca_debounce_ms / 1000)
+
+metrics.GaugeCallback(
+    "chamados_presence_viewers", "Conexões com algum chamado aberto (presença)",
+    lambda: [((), len(PRESENCA._por_conexao))]
+)
@@ -0,0 +1,126 @@
+"""
+Profiling de SQL por requisição
+
+Usa os contadores que metrics.py já mantém por requisição (queries e tempo
+de banco) e, nas requisições amostradas, registra também a query mais lenta.
+Quando a requisição passa do limite, o resultado vai num log estruturado de
+requisição lenta. O header Server-Timing (visível no DevTools do navegador)
+mostra tempos internos a qualquer cliente, inclusive sem login, então só é
+enviado com PROFILING_SERVER_TIMING ligado (ambientes de desenvolvimento e
+benchmark).
+
+A configuração pode ser alterada em runtime, sem restart, pelo endpoint
+/api/admin/profiling. Ela vale só para o processo (worker) que recebeu a
+chamada; com vários workers, use as variáveis PROFILING_* do ambiente.
+"""
+import json
+import logging
+import os
+import random
+import time
+
+import metrics
+from config import get_settings
+
+logger = logging.getLogger("chamados.profiling")
+
+TAMANHO_MAXIMO_SQL = 2000
+
+
+class ConfiguracaoProfiling:
+    __slots__ = ("ativo", "taxa_amostragem", "limite_lento_ms")
+
+    def __init__(self, ativo: bool, taxa_amostragem: float, limite_lento_ms: float):
+        self.ativo = ativo
+        self.taxa_amostragem = taxa_amostragem
+        self.limite_lento_ms = limite_lento_ms
+
+    def como_dict(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "taxa_amostragem": self.taxa_amostragem,
+            "limite_lento_ms": self.limite_lento_ms,
+            "alcance": f"somente o worker pid {os.getpid()}; com vários workers use PROFILING_* no ambiente",
+        }
+
+
+_settings = get_settings()
+SERVER_TIMING = _settings.profiling_server_timing
+configuracao = ConfiguracaoProfiling(
+    ativo=_settings.profiling_ativo,
+    taxa_amostragem=_settings.profiling_taxa_amostragem,
+    limite_lento_ms=_settings.profiling_limite_lento_ms
+)
+
+
+def atualizar_configuracao(ativo: bool = None, taxa_amostragem: float = None, limite_lento_ms: float = None) -> dict:
+    """Altera a configuração do profiling deste processo"""
+    if ativo is not None:
+        configuracao.ativo = ativo
+    if taxa_amostragem is not None:
+        configuracao.taxa_amostragem = taxa_amostragem
+    if limite_lento_ms is not None:
+        configuracao.limite_lento_ms = limite_lento_ms
+    return configuracao.como_dict()
+
+
+def _server_timing(contexto, duracao_app: float) -> bytes:
+    valor = f'db;dur={contexto.tempo_db * 1000:.2f};desc="{contexto.queries} queries"'
+    if contexto.sql_mais_lenta is not None:
+        valor += f', db-max;dur={contexto.tempo_mais_lenta * 1000:.2f}'
+    valor += f', app;dur={duracao_app * 1000:.2f}'
+    return valor.encode("latin-1")
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que liga o profiling nas requisições amostradas.
+    Deve ficar dentro do MetricasMiddleware, que cria o contexto da requisição.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        contexto = metrics.requisicao_atual.get()
+        if (
+            scope["type"] != "http"
+            or contexto is None
+            or not configuracao.ativo
+            or random.random() >= configuracao.taxa_amostragem
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        contexto.amostrado = True
+        inicio = time.perf_counter()
+        status_code = 500
+
+        async def send_com_server_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start" and SERVER_TIMING:
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(contexto, time.perf_counter() - inicio)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_server_timing)
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            if duracao_ms >= configuracao.limite_lento_ms:
+                rota = getattr(scope.get("route"), "path", None) or scope["path"]
+                sql = contexto.sql_mais_lenta
+                logger.warning(json.dumps({
+                    "evento": "requisicao_lenta",
+                    "metodo": scope["method"],
+                    "rota": rota,
+                    "caminho": scope["path"],
+                    "status": status_code,
+                    "duracao_ms": round(duracao_ms, 2),
+                    "queries": contexto.queries,
+                    "tempo_db_ms": round(contexto.tempo_db * 1000, 2),
+                    "query_mais_lenta_ms": round(contexto.tempo_mais_lenta * 1000, 2),
+                    "query_mais_lenta": " ".join(sql.split())[:TAMANHO_MAXIMO_SQL] if sql else None
+                }, ensure_ascii=False))
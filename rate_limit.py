@@ -0,0 +1,251 @@
+"""
+Rate limiting por token bucket
+
+Cada chave (IP + rota, email + rota) tem um balde com `capacidade` fichas
+que se reabastece continuamente a `capacidade / periodo` fichas por segundo.
+Cada requisição consome uma ficha; sem ficha disponível a resposta é 429 com
+Retry-After (segundos até a próxima ficha).
+
+Dois backends:
+- memória: um dict por processo (padrão, custo de microssegundos);
+- postgres: tabela UNLOGGED compartilhada entre workers, atualizada com um
+  único UPSERT atômico por verificação (o relógio usado é o do banco).
+
+Limites por IP são aplicados no RateLimitMiddleware; limites por email
+dependem do corpo da requisição e são verificados nos próprios endpoints
+com verificar_limite_email().
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+import metrics
+from config import get_settings
+
+
+class Limite:
+    """`capacidade` requisições por `periodo` segundos (com rajada de até `capacidade`)"""
+    __slots__ = ("nome", "capacidade", "taxa")
+
+    def __init__(self, nome: str, capacidade: int, periodo: float):
+        self.nome = nome
+        self.capacidade = float(capacidade)
+        self.taxa = capacidade / periodo
+
+
+# Limites por IP (middleware). As rotas de senha compartilham o balde, senão o
+# código de 6 dígitos poderia ser testado alternando verify-code e change-password.
+LIMITE_API_POR_IP = Limite("api_ip", 600, 60)
+LIMITE_CODIGO_POR_IP = Limite("codigo_ip", 30, 600)
+LIMITES_POR_ROTA = {
+    "/api/auth/login": Limite("login_ip", 20, 60),
+    "/api/auth/send-verification-code": Limite("codigo_envio_ip", 10, 3600),
+    "/api/auth/verify-code": LIMITE_CODIGO_POR_IP,
+    "/api/auth/change-password": LIMITE_CODIGO_POR_IP,
+}
+
+# Limites por email (endpoints)
+LIMITE_LOGIN_POR_EMAIL = Limite("login_email", 10, 900)
+LIMITE_ENVIO_CODIGO_POR_EMAIL = Limite("codigo_envio_email", 3, 900)
+LIMITE_CODIGO_POR_EMAIL = Limite("codigo_email", 5, 600)
+
+
+class BackendMemoria:
+    """
+    Baldes em memória (valem só para o processo atual), no máximo
+    `maximo_chaves`: os menos usados recentemente saem primeiro
+    """
+    remoto = False
+
+    def __init__(self, maximo_chaves: int = 100_000):
+        self.maximo_chaves = maximo_chaves
+        self._baldes = OrderedDict()   # chave -> [fichas, atualizado_em, limite], do menos ao mais usado
+        self._lock = threading.Lock()
+
+    def consumir(self, chave: str, limite: Limite) -> float:
+        """Consome uma ficha; retorna 0 se permitido ou os segundos até a próxima ficha"""
+        agora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get(chave)
+            if balde is None:
+                if len(self._baldes) >= self.maximo_chaves:
+                    self._descartar(agora)
+                self._baldes[chave] = [limite.capacidade - 1, agora, limite]
+                return 0.0
+            self._baldes.move_to_end(chave)
+            fichas = min(limite.capacidade, balde[0] + (agora - balde[1]) * limite.taxa)
+            balde[1] = agora
+            if fichas >= 1:
+                balde[0] = fichas - 1
+                return 0.0
+            balde[0] = fichas
+        return (1 - fichas) / limite.taxa
+
+    def _descartar(self, agora: float):
+        # Um balde que já teria se reabastecido por completo equivale a não
+        # existir: saem os cheios do início (os parados há mais tempo) e, se
+        # nenhum estiver cheio, o menos usado. O custo não depende do tamanho.
+        while self._baldes:
+            balde = next(iter(self._baldes.values()))
+            if balde[0] + (agora - balde[1]) * balde[2].taxa < balde[2].capacidade:
+                break
+            self._baldes.popitem(last=False)
+        if len(self._baldes) >= self.maximo_chaves:
+            self._baldes.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._baldes.clear()
+
+
+class BackendPostgres:
+    """Baldes na tabela rate_limit_buckets, compartilhados entre workers"""
+    remoto = True
+
+    # EXCLUDED.fichas é a capacidade - 1 (valor de um balde novo)
+    SQL_CONSUMIR = text("""
+        INSERT INTO rate_limit_buckets AS b (chave, fichas, atualizado_em, permitido)
+        VALUES (:chave, CAST(:capacidade AS DOUBLE PRECISION) - 1, extract(epoch FROM clock_timestamp()), true)
+        ON CONFLICT (chave) DO UPDATE SET
+            fichas = CASE
+                WHEN LEAST(EXCLUDED.fichas + 1, b.fichas + (EXCLUDED.atualizado_em - b.atualizado_em) * :taxa) >= 1
+                THEN LEAST(EXCLUDED.fichas + 1, b.fichas + (EXCLUDED.atualizado_em - b.atualizado_em) * :taxa) - 1
+                ELSE LEAST(EXCLUDED.fichas + 1, b.fichas + (EXCLUDED.atualizado_em - b.atualizado_em) * :taxa)
+            END,
+            permitido = LEAST(EXCLUDED.fichas + 1, b.fichas + (EXCLUDED.atualizado_em - b.atualizado_em) * :taxa) >= 1,
+            atualizado_em = EXCLUDED.atualizado_em
+        RETURNING fichas, permitido
+    """)
+    # Baldes parados há mais de um dia já estão cheios em qualquer limite configurado
+    SQL_LIMPAR = text("DELETE FROM rate_limit_buckets WHERE atualizado_em < extract(epoch FROM now()) - 86400")
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def consumir(self, chave: str, limite: Limite) -> float:
+        try:
+            with self.engine.begin() as conn:
+                fichas, permitido = conn.execute(
+                    self.SQL_CONSUMIR,
+                    {"chave": chave, "capacidade": limite.capacidade, "taxa": limite.taxa}
+                ).one()
+        except Exception as e:
+            # Falha aberta: o limitador não pode derrubar o login junto com ele
+            print(f"AVISO: rate limit indisponível: {getattr(e, 'orig', e)}")
+            return 0.0
+        return 0.0 if permitido else (1 - fichas) / limite.taxa
+
+    def limpar(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("TRUNCATE rate_limit_buckets"))
+
+    def limpar_expirados(self) -> int:
+        """Remove os baldes parados (tarefa agendada, fora do caminho das requisições)"""
+        with self.engine.begin() as conn:
+            return conn.execute(self.SQL_LIMPAR).rowcount
+
+
+class Limitador:
+    def __init__(self, backend, ativo: bool = True):
+        self.backend = backend
+        self.ativo = ativo
+
+    async def consumir(self, chave: str, limite: Limite) -> float:
+        if not self.ativo:
+            return 0.0
+        chave = f"{limite.nome}:{chave}"
+        if self.backend.remoto:
+            espera = await run_in_threadpool(self.backend.consumir, chave, limite)
+        else:
+            espera = self.backend.consumir(chave, limite)
+        if espera:
+            metrics.RATE_LIMIT_REJEICOES.labels(limite.nome).inc()
+        return espera
+
+
+def _criar_limitador() -> Limitador:
+    settings = get_settings()
+    if settings.rate_limit_backend == "postgres":
+        from database import engine
+        backend = BackendPostgres(engine)
+    elif settings.rate_limit_backend == "memoria":
+        backend = BackendMemoria()
+    else:
+        raise ValueError(f"RATE_LIMIT_BACKEND inválido: {settings.rate_limit_backend!r} (use memoria ou postgres)")
+    return Limitador(backend, ativo=settings.rate_limit_ativo)
+
+
+limitador = _criar_limitador()
+
+
+def retry_after(espera: float) -> str:
+    return str(max(1, math.ceil(espera)))
+
+
+async def verificar_limite_email(email: str, limite: Limite):
+    """Aplica um limite por email no endpoint; levanta 429 quando estourado"""
+    espera = await limitador.consumir(email.strip().lower(), limite)
+    if espera:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas. Aguarde antes de tentar novamente.",
+            headers={"Retry-After": retry_after(espera)}
+        )
+
+
+def ip_do_cliente(scope, confiar_proxy: bool) -> str:
+    if confiar_proxy:
+        for nome, valor in scope["headers"]:
+            if nome == b"x-forwarded-for":
+                # Último salto: o endereço visto pelo proxy confiável
+                return valor.decode("latin-1").rsplit(",", 1)[-1].strip()
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "desconhecido"
+
+
+RESPOSTA_429 = json.dumps({"detail": "Muitas requisições. Aguarde antes de tentar novamente."}).encode()
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI com os limites por IP (geral da API e por rota)"""
+
+    def __init__(self, app, limitador_: Limitador = None, confiar_proxy: bool = None,
+                 limite_geral: Limite = LIMITE_API_POR_IP, limites_por_rota: dict = LIMITES_POR_ROTA):
+        self.app = app
+        self.limitador = limitador_ or limitador
+        self.limite_geral = limite_geral
+        self.limites_por_rota = limites_por_rota
+        self.confiar_proxy = get_settings().rate_limit_confiar_proxy if confiar_proxy is None else confiar_proxy
+
+    async def __call__(self, scope, receive, send):
+        caminho = scope.get("path", "")
+        if scope["type"] != "http" or not self.limitador.ativo or not caminho.startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        ip = ip_do_cliente(scope, self.confiar_proxy)
+        espera = await self.limitador.consumir(ip, self.limite_geral)
+        limite_rota = self.limites_por_rota.get(caminho)
+        if not espera and limite_rota is not None:
+            espera = await self.limitador.consumir(ip, limite_rota)
+
+        if espera:
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(RESPOSTA_429)).encode()),
+                    (b"retry-after", retry_after(espera).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": RESPOSTA_429})
+            return
+
+        await self.app(scope, receive, send)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, ValidationInfo, field_validator
+from typing import Annotated, Optional, List, Dict, Union
+from datetime import date, datetime
 
 # Schemas de Usuário
 class UsuarioBase(BaseModel):
@@ -15,10 +15,12 @@ class UsuarioUpdate(BaseModel):
     nome: Optional[str] = None
     email: Optional[EmailStr] = None
     ativo: Optional[bool] = None
+    habilidades: Optional[List[Annotated[str, Field(pattern="^(hardware|software|rede|email|sistema|novo_colaborador|outro)$")]]] = None
 
 class UsuarioResponse(UsuarioBase):
     id: int
     ativo: bool
+    habilidades: Optional[List[str]] = None
     criado_em: datetime
 
     class Config:
@@ -47,6 +49,47 @@ class LoginRequest(BaseModel):
     email: EmailStr
     password: str
 
+# dados_extras por categoria: validados e normalizados uma vez, na gravação
+# (datas em AAAA-MM-DD, booleanos de verdade), então os filtros e índices do
+# banco podem confiar no formato. Categorias sem schema aceitam qualquer objeto.
+class EquipamentosColaborador(BaseModel):
+    celular: bool = False
+    notebook: bool = False
+    email: bool = False
+    debx: bool = False
+
+    class Config:
+        extra = "forbid"
+
+class AplicativosColaborador(BaseModel):
+    whatsapp: bool = False
+    chrome: bool = False
+
+    class Config:
+        extra = "forbid"
+
+class DadosNovoColaborador(BaseModel):
+    colaborador_nome: str = Field(..., min_length=1, max_length=255)
+    colaborador_data_nascimento: date
+    data_inicio: date
+    equipamentos: EquipamentosColaborador = EquipamentosColaborador()
+    aplicativos: AplicativosColaborador = AplicativosColaborador()
+    sharepoint_pastas: str = ""
+
+    class Config:
+        extra = "forbid"
+
+DADOS_EXTRAS_POR_CATEGORIA = {
+    "novo_colaborador": DadosNovoColaborador,
+}
+
+def validar_dados_extras(categoria: str, dados_extras: Optional[dict]) -> Optional[dict]:
+    """dados_extras normalizados pelo schema da categoria (ValidationError se inválidos)"""
+    modelo = DADOS_EXTRAS_POR_CATEGORIA.get(categoria)
+    if dados_extras is None or modelo is None:
+        return dados_extras
+    return modelo.model_validate(dados_extras).model_dump(mode="json")
+
 # Schemas de Chamado
 class ChamadoBase(BaseModel):
     titulo: str = Field(..., max_length=500)
@@ -56,6 +99,11 @@ class ChamadoBase(BaseModel):
 class ChamadoCreate(ChamadoBase):
     dados_extras: Optional[dict] = None
 
+    @field_validator("dados_extras")
+    @classmethod
+    def _validar_dados_extras(cls, valor, info: ValidationInfo):
+        return validar_dados_extras(info.data.get("categoria"), valor)
+
 class ChamadoUpdate(BaseModel):
     titulo: Optional[str] = Field(None, max_length=500)
     descricao: Optional[str] = None
@@ -87,6 +135,9 @@ class ChamadoResponse(ChamadoBase):
     criado_em: datetime
     atualizado_em: datetime
     fechado_em: Optional[datetime] = None
+    prazo_em: Optional[datetime] = None
+    arquivado_em: Optional[datetime] = None
+    versao: int
     usuario: UsuarioResponse
     atribuido: Optional[UsuarioResponse] = None
     comentarios: List[ComentarioResponse] = []
@@ -94,6 +145,34 @@ class ChamadoResponse(ChamadoBase):
     class Config:
         from_attributes = True
 
+class DuplicadoCandidato(BaseModel):
+    id: int
+    titulo: str
+    categoria: str
+    status: str
+    criado_em: datetime
+    similaridade: float
+
+class ChamadoCriadoResponse(ChamadoResponse):
+    possiveis_duplicados: List[DuplicadoCandidato] = []
+
+class DuplicadosRequest(BaseModel):
+    titulo: str = Field(..., max_length=500)
+    descricao: str = ""
+
+class MesclarRequest(BaseModel):
+    duplicados: List[int] = Field(..., min_length=1, max_length=200)
+
+class ChamadosLoteUpdate(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+    prioridade: Optional[str] = Field(None, pattern="^(baixa|media|alta|urgente)$")
+    status: Optional[str] = Field(None, pattern="^(aberto|em_andamento|aguardando|resolvido|fechado|cancelado)$")
+    atribuido_para: Optional[int] = None
+
+class ChamadosLoteResponse(BaseModel):
+    atualizados: List[int]
+    inalterados: List[int]
+
 class ChamadoListResponse(BaseModel):
     id: int
     titulo: str
@@ -104,12 +183,40 @@ class ChamadoListResponse(BaseModel):
     atribuido_para: Optional[int] = None
     criado_em: datetime
     atualizado_em: datetime
+    prazo_em: Optional[datetime] = None
+    arquivado_em: Optional[datetime] = None
+    versao: int
+    nao_lidos: int = 0  # comentários de outros ainda não vistos pelo usuário da requisição
     usuario: UsuarioResponse
     atribuido: Optional[UsuarioResponse] = None
 
     class Config:
         from_attributes = True
 
+# Schemas de Histórico
+class EventoResponse(BaseModel):
+    id: int
+    tipo: str
+    usuario_id: Optional[int] = None
+    de: Optional[Union[str, int]] = None
+    para: Optional[Union[str, int]] = None
+    criado_em: datetime
+
+# Confirmações de leitura (até qual comentário cada usuário já viu)
+class LeituraResponse(BaseModel):
+    usuario_id: int
+    nome: str
+    ultimo_comentario_id: int
+    lido_em: datetime
+
+class LeituraCreate(BaseModel):
+    ultimo_comentario_id: Optional[int] = None  # padrão: o último comentário
+
+class TempoEmStatus(BaseModel):
+    intervalos: int
+    total_horas: float
+    media_horas: Optional[float] = None
+
 # Schemas de Estatísticas
 class EstatisticasResponse(BaseModel):
     total_chamados: int
@@ -121,6 +228,46 @@ class EstatisticasResponse(BaseModel):
     por_categoria: dict
     por_prioridade: dict
 
+class ResumoResolucao(BaseModel):
+    resolvidos: int
+    media_horas: Optional[float] = None
+    p50_horas: Optional[float] = None
+    p90_horas: Optional[float] = None
+
+class PontoSerie(ResumoResolucao):
+    periodo: date
+    criados: int
+    encerrados: int
+    backlog: int
+
+class SerieEstatisticasResponse(BaseModel):
+    granularidade: str
+    pontos: List[PontoSerie]
+    por_categoria: Dict[str, ResumoResolucao]
+    por_responsavel: Dict[int, ResumoResolucao]  # 0 = sem responsável
+
+# Schemas de Profiling
+class ProfilingConfig(BaseModel):
+    ativo: bool
+    taxa_amostragem: float
+    limite_lento_ms: float
+    alcance: str  # a configuração alterada vale só para o worker que respondeu
+
+class ProfilingConfigUpdate(BaseModel):
+    ativo: Optional[bool] = None
+    taxa_amostragem: Optional[float] = Field(None, ge=0, le=1)
+    limite_lento_ms: Optional[float] = Field(None, ge=0)
+
+class TarefaAgendadaResponse(BaseModel):
+    nome: str
+    agenda: str
+    local: bool
+    lider: bool
+    proxima_execucao: Optional[datetime] = None
+    ultima_execucao: Optional[datetime] = None
+    ultima_duracao_ms: Optional[float] = None
+    ultimo_resultado: Optional[str] = None
+
 # Schemas de Alteração de Senha
 class SendVerificationCodeRequest(BaseModel):
     email: EmailStr
@@ -74,6 +74,7 @@ let currentUser = null;
 let authToken = null;
 let allTickets = [];
 let currentTicketId = null;
+let currentTicketVersion = null;
 let ticketsRefreshInterval = null;
 let websocket = null;
 
@@ -237,7 +238,11 @@ async function apiRequest(endpoint, options = {}) {
             throw new Error('Sessão expirada. Faça login novamente.');
         }
         const error = await response.json();
-        throw new Error(error.detail || 'Erro na requisição');
+        // 409 (conflito de versão) traz { mensagem, chamado } com o estado atual
+        const message = typeof error.detail === 'object' && error.detail !== null ? error.detail.mensagem : error.detail;
+        const requestError = new Error(message || 'Erro na requisição');
+        requestError.status = response.status;
+        throw requestError;
     }
 
     return response.json();
@@ -293,66 +298,204 @@ async function refreshTickets() {
 // WEBSOCKET REAL-TIME UPDATES
 // ============================================================================
 
-function connectWebSocket() {
-    // Close existing connection if any
-    if (websocket) {
-        websocket.close();
+// Every event carries an id; on reconnect the server replays what was missed
+// (or sends 'resync' when the gap is too old). If the WebSocket keeps failing
+// (e.g. a proxy that blocks upgrades), the same events come over SSE.
+const WS_URL = API_URL.replace(/^http/, 'ws').replace(/\/api$/, '/ws');
+const MAX_WS_FAILURES = 3;
+// Server close codes after which reconnecting would not help
+const WS_CLOSE_UNAUTHENTICATED = 4401;
+const WS_CLOSE_REPLACED = 4429;
+let lastEventId = null;
+let reconnectAttempts = 0;
+let reconnectTimer = null;
+let wsFailures = 0;
+let useEventStream = false;
+let eventStreamController = null;
+
+async function handleRealtimeEvent(data) {
+    if (data.type === 'ping') {
+        // Server heartbeat: any reply keeps the connection alive
+        if (websocket && websocket.readyState === WebSocket.OPEN) {
+            websocket.send(JSON.stringify({ type: 'pong' }));
+        }
+        return;
+    }
+    if (data.id) {
+        lastEventId = data.id;
     }
+    console.log('Realtime event:', data);
+
+    // Handle different message types
+    if (data.type === 'resync') {
+        // Too far behind to replay: reload everything once
+        await refreshTickets();
+        if (currentTicketId) {
+            await refreshTicketBadges();
+            await refreshComments();
+        }
+    } else if (data.type === 'ticket_updated' || data.type === 'ticket_created' || data.type === 'tickets_updated') {
+        // Reload tickets to get latest data
+        await refreshTickets();
+
+        // If viewing the updated ticket, refresh the modal badges
+        const updatedIds = data.type === 'tickets_updated' ? data.ticket_ids : [data.ticket_id];
+        if (data.type !== 'ticket_created' && currentTicketId && updatedIds.includes(currentTicketId)) {
+            await refreshTicketBadges();
+        }
+    } else if (data.type === 'comment_added') {
+        // If viewing the ticket with new comment, refresh comments
+        if (currentTicketId && data.ticket_id === currentTicketId) {
+            await refreshComments();
+        }
+        // Unread badges come with the list (conditional GET, 304 when nothing changed for this user)
+        await refreshTickets();
+    } else if (data.type === 'presence') {
+        // Only sent to clients viewing this ticket: who is here and how far they have read
+        if (data.ticket_id === currentTicketId) {
+            Object.assign(ticketReadReceipts, data.leituras);
+            renderViewers(data.viewers);
+            applyReadReceipts();
+        }
+    }
+}
 
-    // Connect to WebSocket
-    websocket = new WebSocket('ws://localhost:8000/ws');
+function scheduleReconnect() {
+    if (!currentUser || reconnectTimer) return;
+    // Exponential backoff with jitter (1s, 2s, 4s... up to 30s)
+    const delay = Math.min(30000, 1000 * 2 ** reconnectAttempts) * (0.5 + Math.random() / 2);
+    reconnectAttempts++;
+    console.log(`Tempo real desconectado, reconectando em ${Math.round(delay / 1000)}s...`);
+    reconnectTimer = setTimeout(() => {
+        reconnectTimer = null;
+        if (currentUser) {
+            connectWebSocket();
+        }
+    }, delay);
+}
+
+function connectWebSocket() {
+    closeRealtimeConnections();
+    if (useEventStream) {
+        connectEventStream();
+        return;
+    }
 
-    websocket.onopen = () => {
+    const url = lastEventId ? `${WS_URL}?last_event_id=${encodeURIComponent(lastEventId)}` : WS_URL;
+    const socket = new WebSocket(url);
+    let opened = false;
+    websocket = socket;
+
+    socket.onopen = () => {
+        opened = true;
+        reconnectAttempts = 0;
+        wsFailures = 0;
+        // The first message authenticates the connection (no headers on browser WebSockets)
+        socket.send(JSON.stringify({ type: 'auth', token: authToken }));
         console.log('WebSocket conectado');
+        // Restore presence on the open ticket after a reconnect
+        sendViewTicket();
     };
 
-    websocket.onmessage = async (event) => {
-        const data = JSON.parse(event.data);
-        console.log('WebSocket message:', data);
+    socket.onmessage = (event) => handleRealtimeEvent(JSON.parse(event.data));
 
-        // Handle different message types
-        if (data.type === 'ticket_updated' || data.type === 'ticket_created') {
-            // Reload tickets to get latest data
-            await refreshTickets();
+    socket.onerror = (error) => {
+        console.error('WebSocket error:', error);
+    };
 
-            // If viewing the updated ticket, refresh the modal badges
-            if (data.type === 'ticket_updated' && currentTicketId && data.ticket_id === currentTicketId) {
-                await refreshTicketBadges();
-            }
-        } else if (data.type === 'comment_added') {
-            // If viewing the ticket with new comment, refresh comments
-            if (currentTicketId && data.ticket_id === currentTicketId) {
-                await refreshComments();
-            }
-        } else if (data.type === 'ticket_viewed') {
-            // Mark messages as read when OTHER user opens the ticket (not myself)
-            if (data.ticket_id === currentTicketId && data.user_id !== currentUser.id) {
-                ticketWasViewed = true;
-                markMessagesAsRead();
-            }
+    socket.onclose = (event) => {
+        if (websocket !== socket) return;
+        websocket = null;
+        if (event.code === WS_CLOSE_UNAUTHENTICATED) {
+            logout();
+            return;
+        }
+        if (event.code === WS_CLOSE_REPLACED) {
+            // Too many tabs open for this user: this (oldest) one stops live updates
+            console.log('WebSocket encerrado: limite de conexões por usuário');
+            return;
+        }
+        if (!opened && ++wsFailures >= MAX_WS_FAILURES) {
+            console.log('WebSocket indisponível, usando Server-Sent Events');
+            useEventStream = true;
         }
+        scheduleReconnect();
     };
+}
 
-    websocket.onerror = (error) => {
-        console.error('WebSocket error:', error);
-    };
+async function connectEventStream() {
+    // fetch instead of EventSource so the Authorization header can be sent
+    const controller = new AbortController();
+    eventStreamController = controller;
+    const headers = { 'Authorization': `Bearer ${authToken}` };
+    if (lastEventId) {
+        headers['Last-Event-ID'] = lastEventId;
+    }
 
-    websocket.onclose = () => {
-        console.log('WebSocket desconectado, tentando reconectar em 3s...');
-        // Try to reconnect after 3 seconds
-        setTimeout(() => {
-            if (currentUser) {
-                connectWebSocket();
+    try {
+        const response = await fetch(`${API_URL}/eventos/stream`, { headers, signal: controller.signal });
+        if (response.status === 401) {
+            logout();
+            return;
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        reconnectAttempts = 0;
+        console.log('Server-Sent Events conectado');
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            // Events are separated by a blank line; only 'data:' lines matter (the id is also in the JSON)
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const event of events) {
+                const data = event.split('\n')
+                    .filter(line => line.startsWith('data:'))
+                    .map(line => line.slice(5).trim())
+                    .join('\n');
+                if (data) {
+                    await handleRealtimeEvent(JSON.parse(data));
+                }
             }
-        }, 3000);
-    };
+        }
+    } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('SSE error:', error);
+    }
+
+    if (eventStreamController === controller) {
+        eventStreamController = null;
+        scheduleReconnect();
+    }
 }
 
-function disconnectWebSocket() {
+function closeRealtimeConnections() {
     if (websocket) {
-        websocket.close();
+        const socket = websocket;
         websocket = null;
+        socket.close();
+    }
+    if (eventStreamController) {
+        eventStreamController.abort();
+        eventStreamController = null;
+    }
+}
+
+function disconnectWebSocket() {
+    if (reconnectTimer) {
+        clearTimeout(reconnectTimer);
+        reconnectTimer = null;
     }
+    closeRealtimeConnections();
+    lastEventId = null;
+    reconnectAttempts = 0;
+    wsFailures = 0;
+    useEventStream = false;
 }
 
 async function loadStatistics() {
@@ -465,6 +608,7 @@ function createKanbanCard(ticket) {
         </div>
         <div class="card-footer">
             <span class="card-user">${ticket.usuario.nome}</span>
+            ${ticket.nao_lidos ? `<span class="card-unread" title="Comentários não lidos">💬 ${ticket.nao_lidos}</span>` : ''}
         </div>
     `;
 
@@ -477,6 +621,11 @@ function createKanbanCard(ticket) {
 
     // Use click event to avoid interfering with drag
     card.addEventListener('click', (e) => {
+        // Ctrl/Cmd/Shift + click selects several cards to move together (TI only)
+        if (currentUser.tipo === 'ti' && (e.ctrlKey || e.metaKey || e.shiftKey)) {
+            card.classList.toggle('selected');
+            return;
+        }
         // Only open detail if not dragging
         if (!card.classList.contains('dragging')) {
             openTicketDetail(ticket.id);
@@ -606,6 +755,15 @@ async function handleDrop(e) {
     const ticketId = parseInt(draggedCard.dataset.ticketId);
     const oldStatus = draggedCard.dataset.ticketStatus;
 
+    // Dragging one of several selected cards moves all of them in one request
+    const selectedCards = [...document.querySelectorAll('.kanban-card.selected')];
+    if (draggedCard.classList.contains('selected') && selectedCards.length > 1) {
+        dropZone.classList.remove('drag-over');
+        moveSelectedCards(selectedCards, newStatus);
+        draggedCard = null;
+        return;
+    }
+
     // Don't update if dropped in same column
     if (newStatus === oldStatus) {
         dropZone.classList.remove('drag-over');
@@ -627,6 +785,9 @@ async function handleDrop(e) {
     cardToMove.style.opacity = '0';
     cardToMove.style.transform = 'scale(0.8)';
 
+    // Version the board was rendered with: the update is rejected (409) if someone changed the ticket since
+    const ticketVersion = (allTickets.find(t => t.id === ticketId) || {}).versao;
+
     setTimeout(() => {
         // Update ticket status in local data
         const ticket = allTickets.find(t => t.id === ticketId);
@@ -659,7 +820,11 @@ async function handleDrop(e) {
     // Update backend asynchronously
     apiRequest(`/chamados/${ticketId}`, {
         method: 'PUT',
+        headers: ticketVersion ? { 'If-Match': `"${ticketVersion}"` } : {},
         body: JSON.stringify({ status: newStatus })
+    }).then(updated => {
+        const local = allTickets.find(t => t.id === ticketId);
+        if (local) local.versao = updated.versao;
     }).catch(error => {
         // If error, reload to revert
         showToast(error.message, 'error');
@@ -669,6 +834,28 @@ async function handleDrop(e) {
     draggedCard = null;
 }
 
+async function moveSelectedCards(cards, newStatus) {
+    const ids = cards
+        .filter(card => card.dataset.ticketStatus !== newStatus)
+        .map(card => parseInt(card.dataset.ticketId));
+    cards.forEach(card => card.classList.remove('selected'));
+    if (ids.length === 0) {
+        return;
+    }
+
+    try {
+        const result = await apiRequest('/chamados/bulk', {
+            method: 'PATCH',
+            body: JSON.stringify({ ids, status: newStatus })
+        });
+        showToast(`${result.atualizados.length} chamado(s) movido(s)`, 'success');
+    } catch (error) {
+        showToast(error.message, 'error');
+    }
+    // The tickets_updated WebSocket event also refreshes other open boards
+    await loadTickets();
+}
+
 // ============================================================================
 // VIEW TOGGLE
 // ============================================================================
@@ -761,6 +948,18 @@ document.getElementById('newTicketForm').addEventListener('submit', async (e) =>
     }
 
     try {
+        // Avisar se já existe chamado aberto parecido (ex.: várias pessoas reportando a mesma queda)
+        const parecidos = await apiRequest('/chamados/duplicados', {
+            method: 'POST',
+            body: JSON.stringify({ titulo: data.titulo, descricao: data.descricao })
+        });
+        if (parecidos.length > 0) {
+            const lista = parecidos.map(c => `#${c.id} - ${c.titulo}`).join('\n');
+            if (!confirm(`Já existem chamados abertos parecidos:\n\n${lista}\n\nAbrir um novo chamado mesmo assim?`)) {
+                return;
+            }
+        }
+
         await apiRequest('/chamados', {
             method: 'POST',
             body: JSON.stringify(data)
@@ -780,7 +979,40 @@ document.getElementById('newTicketForm').addEventListener('submit', async (e) =>
 
 let commentRefreshInterval = null;
 let timestampRefreshInterval = null;
-let ticketWasViewed = false; // Track if ticket was viewed by other user
+let presenceInterval = null;
+let ticketReadReceipts = {}; // user id -> last comment id that user has seen (current ticket)
+let lastSeenCommentId = 0; // Highest server comment id rendered in the open ticket
+let lastPostedReceiptId = 0; // Receipt already sent over HTTP (no WebSocket)
+const PRESENCE_RENEW_MS = 30000; // Server drops presence not renewed within PRESENCE_TTL
+
+// Tell the server this ticket is open and read up to the last rendered comment.
+// Repeated while the modal is open; the server only writes when the receipt advances.
+function sendViewTicket() {
+    if (!currentTicketId) return;
+    if (!websocket || websocket.readyState !== WebSocket.OPEN) {
+        // Without a WebSocket (e.g. SSE fallback) there is no presence, but the receipt still clears unread counts
+        if (lastSeenCommentId > lastPostedReceiptId) {
+            lastPostedReceiptId = lastSeenCommentId;
+            apiRequest(`/chamados/${currentTicketId}/leituras`, {
+                method: 'POST',
+                body: JSON.stringify({ ultimo_comentario_id: lastSeenCommentId })
+            }).catch(error => console.error('Erro ao registrar leitura:', error));
+        }
+        return;
+    }
+    const message = { type: 'view_ticket', ticket_id: currentTicketId };
+    if (lastSeenCommentId > 0) {
+        message.ultimo_comentario_id = lastSeenCommentId;
+    }
+    websocket.send(JSON.stringify(message));
+}
+
+function renderViewers(viewers) {
+    const others = viewers.filter(viewer => viewer.id !== currentUser.id);
+    document.getElementById('chatViewers').textContent = others.length
+        ? `👁 ${others.map(viewer => viewer.nome).join(', ')}`
+        : '';
+}
 
 async function refreshTicketBadges() {
     if (!currentTicketId) return;
@@ -843,7 +1075,18 @@ async function openTicketDetail(ticketId) {
     try {
         const ticket = await apiRequest(`/chamados/${ticketId}`);
         currentTicketId = ticketId;
-        ticketWasViewed = false; // Reset for new ticket
+        currentTicketVersion = ticket.versao; // Sent as If-Match when saving
+        ticketReadReceipts = {};
+        lastSeenCommentId = 0;
+        lastPostedReceiptId = 0;
+        renderViewers([]);
+
+        // Opening the ticket reads its comments: clear the unread badge right away
+        const listed = allTickets.find(t => t.id === ticketId);
+        if (listed) {
+            listed.nao_lidos = 0;
+        }
+        document.querySelectorAll(`[data-ticket-id="${ticketId}"] .card-unread`).forEach(badge => badge.remove());
 
         // Populate modal
         document.getElementById('detailId').textContent = ticket.id;
@@ -951,14 +1194,23 @@ async function openTicketDetail(ticketId) {
         }
         timestampRefreshInterval = setInterval(updateTimestamps, 30000);
 
-        // Notify via WebSocket that ticket was viewed
-        if (websocket && websocket.readyState === WebSocket.OPEN) {
-            websocket.send(JSON.stringify({
-                type: 'view_ticket',
-                ticket_id: ticketId,
-                user_id: currentUser.id
-            }));
+        // Read receipts survive reloads; live updates arrive as 'presence' events
+        apiRequest(`/chamados/${ticketId}/leituras`).then(leituras => {
+            if (currentTicketId !== ticketId) return;
+            leituras.forEach(leitura => {
+                ticketReadReceipts[leitura.usuario_id] = Math.max(
+                    ticketReadReceipts[leitura.usuario_id] || 0, leitura.ultimo_comentario_id
+                );
+            });
+            applyReadReceipts();
+        }).catch(error => console.error('Erro ao carregar leituras:', error));
+
+        // Presence on this ticket (and read receipt), renewed while the modal is open
+        sendViewTicket();
+        if (presenceInterval) {
+            clearInterval(presenceInterval);
         }
+        presenceInterval = setInterval(sendViewTicket, PRESENCE_RENEW_MS);
 
     } catch (error) {
         showToast('Erro ao carregar detalhes do chamado: ' + error.message, 'error');
@@ -967,8 +1219,17 @@ async function openTicketDetail(ticketId) {
 
 function closeDetailModal() {
     document.getElementById('ticketDetailModal').classList.remove('show');
+    if (websocket && websocket.readyState === WebSocket.OPEN) {
+        websocket.send(JSON.stringify({ type: 'leave_ticket' }));
+    }
     currentTicketId = null;
-    ticketWasViewed = false; // Reset viewed status
+    ticketReadReceipts = {};
+
+    // Stop presence renewal
+    if (presenceInterval) {
+        clearInterval(presenceInterval);
+        presenceInterval = null;
+    }
 
     // Stop auto-refresh
     if (commentRefreshInterval) {
@@ -1062,11 +1323,13 @@ async function updateTicket() {
             }
         }
 
-        // Update ticket
-        await apiRequest(`/chamados/${currentTicketId}`, {
+        // Update ticket (only if nobody changed it since the modal was opened)
+        const updated = await apiRequest(`/chamados/${currentTicketId}`, {
             method: 'PUT',
+            headers: { 'If-Match': `"${currentTicketVersion}"` },
             body: JSON.stringify(newData)
         });
+        currentTicketVersion = updated.versao;
 
         // Update badges in modal
         const statusBadge = document.getElementById('detailStatus');
@@ -1098,6 +1361,10 @@ async function updateTicket() {
         loadTickets();
     } catch (error) {
         showToast('Erro ao atualizar chamado: ' + error.message, 'error');
+        if (error.status === 409) {
+            // Show the current state so the change can be redone on top of it
+            await openTicketDetail(currentTicketId);
+        }
     }
 }
 
@@ -1108,10 +1375,15 @@ async function updateTicket() {
 // Track rendered comments to avoid re-animating
 let renderedCommentIds = new Set();
 
-function markMessagesAsRead() {
-    // Mark all own messages as read (blue double check)
-    const ownMessages = document.querySelectorAll('.chat-message-own .message-status');
-    ownMessages.forEach(statusSpan => {
+function applyReadReceipts() {
+    // Own messages seen by any other user get the blue double check
+    const readUpTo = Math.max(0, ...Object.entries(ticketReadReceipts)
+        .filter(([userId]) => Number(userId) !== currentUser.id)
+        .map(([, commentId]) => commentId));
+    const ownMessages = document.querySelectorAll('.chat-message-own');
+    ownMessages.forEach(message => {
+        const statusSpan = message.querySelector('.message-status');
+        if (!statusSpan || parseInt(message.dataset.commentId) > readUpTo || statusSpan.querySelector('.status-read')) return;
         statusSpan.innerHTML = `
             <svg class="status-icon status-read" width="16" height="16" viewBox="0 0 16 16">
                 <path d="M1 8.5l3.5 3.5 8-8" stroke="currentColor" stroke-width="2" fill="none" stroke-linecap="round" stroke-linejoin="round"/>
@@ -1210,9 +1482,13 @@ function renderComments(comments) {
         }
     });
 
-    // If ticket was already viewed, mark messages as read
-    if (ticketWasViewed) {
-        markMessagesAsRead();
+    applyReadReceipts();
+
+    // New comments on screen advance this user's read receipt
+    const newestId = Math.max(...comments.map(c => c.id));
+    if (newestId > lastSeenCommentId) {
+        lastSeenCommentId = newestId;
+        sendViewTicket();
     }
 }
 
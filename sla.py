@@ -0,0 +1,196 @@
+"""
+SLA de resolução dos chamados
+
+O prazo (chamados.prazo_em, em UTC como as demais datas) é calculado a partir
+de criado_em com a meta da prioridade, opcionalmente sobrescrita por
+categoria, contada num calendário: horário comercial (dias úteis, expediente
+e feriados configuráveis) ou 24x7.
+
+Chamados em risco ou vencidos saem de uma consulta por faixa no índice
+parcial idx_chamados_prazo_abertos. O alerta de violação é enviado uma única
+vez: cada worker reivindica os chamados vencidos com UPDATE ... FOR UPDATE
+SKIP LOCKED marcando sla_violacao_notificada_em, e só quem marcou notifica.
+"""
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from config import get_settings
+
+STATUS_ABERTOS = ("aberto", "em_andamento", "aguardando")
+
+
+class Calendario:
+    """Horas contáveis para o SLA. Sem expediente configurado, conta 24x7."""
+
+    def __init__(self, nome: str, fuso: str = "UTC", inicio: dtime = None, fim: dtime = None,
+                 dias_uteis=(0, 1, 2, 3, 4), feriados=()):
+        self.nome = nome
+        self.fuso = ZoneInfo(fuso)
+        self.inicio = inicio
+        self.fim = fim
+        self.dias_uteis = set(dias_uteis)
+        self.feriados = set(feriados)
+
+    def _dia_util(self, dia: date) -> bool:
+        return dia.weekday() in self.dias_uteis and dia not in self.feriados
+
+    def somar(self, inicio: datetime, horas: float) -> datetime:
+        """Instante (UTC, sem tzinfo) em que `horas` contáveis terão passado desde `inicio`"""
+        if self.inicio is None:
+            return inicio + timedelta(hours=horas)
+
+        restante = timedelta(hours=horas)
+        cursor = inicio.replace(tzinfo=timezone.utc).astimezone(self.fuso)
+        for _ in range(3660):  # ~10 anos de dias; evita laço infinito com calendário sem dias úteis
+            dia = cursor.date()
+            if self._dia_util(dia):
+                abre = datetime.combine(dia, self.inicio, self.fuso)
+                fecha = datetime.combine(dia, self.fim, self.fuso)
+                cursor = max(cursor, abre)
+                if cursor < fecha:
+                    disponivel = fecha - cursor
+                    if restante <= disponivel:
+                        return (cursor + restante).astimezone(timezone.utc).replace(tzinfo=None)
+                    restante -= disponivel
+            cursor = datetime.combine(dia + timedelta(days=1), dtime(0), self.fuso)
+        raise ValueError(f"Calendário '{self.nome}' sem dias úteis suficientes")
+
+
+class Meta:
+    __slots__ = ("horas", "calendario")
+
+    def __init__(self, horas: float, calendario: Calendario):
+        self.horas = horas
+        self.calendario = calendario
+
+
+def _hora(valor: str) -> dtime:
+    return dtime.fromisoformat(valor)
+
+
+def _feriados(valor: str):
+    return [date.fromisoformat(dia.strip()) for dia in valor.split(",") if dia.strip()]
+
+
+_settings = get_settings()
+
+CALENDARIO_24X7 = Calendario("24x7")
+CALENDARIO_COMERCIAL = Calendario(
+    "comercial",
+    fuso=_settings.sla_fuso,
+    inicio=_hora(_settings.sla_expediente_inicio),
+    fim=_hora(_settings.sla_expediente_fim),
+    feriados=_feriados(_settings.sla_feriados)
+)
+
+# Metas de resolução por prioridade
+METAS = {
+    "urgente": Meta(4, CALENDARIO_24X7),
+    "alta": Meta(8, CALENDARIO_COMERCIAL),
+    "media": Meta(24, CALENDARIO_COMERCIAL),
+    "baixa": Meta(40, CALENDARIO_COMERCIAL),
+}
+
+# Exceções por categoria (prioridades omitidas usam METAS)
+METAS_POR_CATEGORIA = {
+    # Rede fora do ar para o setor inteiro: alta também corre fora do expediente
+    "rede": {"alta": Meta(8, CALENDARIO_24X7)},
+    # Onboarding depende de compra/entrega de equipamento
+    "novo_colaborador": {"baixa": Meta(80, CALENDARIO_COMERCIAL), "media": Meta(40, CALENDARIO_COMERCIAL)},
+}
+
+
+def meta_para(prioridade: str, categoria: str) -> Meta:
+    return METAS_POR_CATEGORIA.get(categoria, {}).get(prioridade) or METAS[prioridade]
+
+
+def calcular_prazo(prioridade: str, categoria: str, criado_em: datetime) -> datetime:
+    meta = meta_para(prioridade, categoria)
+    return meta.calendario.somar(criado_em, meta.horas)
+
+
+def atualizar_prazo(chamado):
+    """Recalcula o prazo do chamado (criação ou mudança de prioridade/categoria)"""
+    chamado.prazo_em = calcular_prazo(chamado.prioridade, chamado.categoria, chamado.criado_em or datetime.utcnow())
+    if chamado.prazo_em > datetime.utcnow():
+        # Prazo estendido: uma nova violação deve gerar novo alerta
+        chamado.sla_violacao_notificada_em = None
+
+
+def filtrar_por_situacao(query, modelo, situacao: str, janela_horas: float):
+    """
+    Restringe a query a chamados abertos 'violado' (prazo vencido) ou
+    'em_risco' (vence nas próximas janela_horas). Usa o índice parcial de prazo.
+    """
+    agora = datetime.utcnow()
+    query = query.filter(modelo.status.in_(STATUS_ABERTOS))
+    if situacao == "violado":
+        query = query.filter(modelo.prazo_em < agora)
+    else:
+        query = query.filter(modelo.prazo_em >= agora, modelo.prazo_em < agora + timedelta(hours=janela_horas))
+    return query.order_by(modelo.prazo_em)
+
+
+def formatar_local(instante: datetime) -> str:
+    """Data/hora UTC do banco no fuso do SLA, para mensagens"""
+    return instante.replace(tzinfo=timezone.utc).astimezone(CALENDARIO_COMERCIAL.fuso).strftime("%d/%m/%Y %H:%M")
+
+
+# A violação também entra no histórico (chamado_eventos, tipo 9 = SLA_VIOLADO)
+SQL_REIVINDICAR_VIOLACOES = text("""
+    WITH reivindicados AS (
+        UPDATE chamados c SET sla_violacao_notificada_em = :agora
+        FROM (
+            SELECT id FROM chamados
+            WHERE status IN ('aberto', 'em_andamento', 'aguardando')
+              AND prazo_em < :agora
+              AND sla_violacao_notificada_em IS NULL
+            ORDER BY prazo_em
+            LIMIT :lote
+            FOR UPDATE SKIP LOCKED
+        ) vencidos
+        WHERE c.id = vencidos.id
+        RETURNING c.id, c.titulo, c.prioridade, c.prazo_em, c.atribuido_para
+    ), historico AS (
+        INSERT INTO chamado_eventos (chamado_id, tipo, criado_em)
+        SELECT id, 9, :agora FROM reivindicados
+    )
+    SELECT * FROM reivindicados
+""")
+
+
+def reivindicar_violacoes(engine, lote: int = 100) -> list:
+    """
+    Marca como notificados os chamados que acabaram de vencer e os retorna.
+    Workers concorrentes pulam as linhas já travadas, então cada chamado é
+    devolvido a um único worker. A marcação é confirmada antes do envio: uma
+    queda entre os dois perde o alerta, mas nunca o duplica.
+    """
+    with engine.begin() as conn:
+        return conn.execute(SQL_REIVINDICAR_VIOLACOES, {"agora": datetime.utcnow(), "lote": lote}).mappings().all()
+
+
+def processar_violacoes(engine) -> list:
+    """Notifica as novas violações de SLA via Telegram; retorna os chamados notificados"""
+    from telegram_notifier import notificar_sla_violado
+
+    violacoes = reivindicar_violacoes(engine)
+    for chamado in violacoes:
+        notificar_sla_violado(
+            chamado_id=chamado["id"],
+            titulo=chamado["titulo"],
+            prioridade=chamado["prioridade"],
+            prazo=formatar_local(chamado["prazo_em"])
+        )
+    return violacoes
+
+
+async def verificar_violacoes(engine, ao_violar=None):
+    """Uma verificação das violações (tarefa agendada); ao_violar(chamado) é aguardada para cada uma"""
+    violacoes = await run_in_threadpool(processar_violacoes, engine)
+    if ao_violar:
+        for chamado in violacoes:
+            await ao_violar(chamado)
@@ -49,6 +49,16 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
+echo ""
+echo "🗄️  Aplicando migrações do banco..."
+python migrate.py
+
+if [ $? -ne 0 ]; then
+    echo ""
+    echo "Falha ao aplicar migrações"
+    exit 1
+fi
+
 echo ""
 echo "🚀 Iniciando servidor FastAPI..."
 echo ""
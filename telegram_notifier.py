@@ -1,12 +1,13 @@
-import requests
-import os
-from dotenv import load_dotenv
+import time
 from typing import Optional
 
-load_dotenv()
+import metrics
+from config import get_settings
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+settings = get_settings()
+
+TELEGRAM_BOT_TOKEN = settings.telegram_bot_token
+TELEGRAM_CHAT_ID = settings.telegram_chat_id
 
 def enviar_mensagem_telegram(mensagem: str, parse_mode: str = "HTML") -> bool:
     """
@@ -17,6 +18,8 @@ def enviar_mensagem_telegram(mensagem: str, parse_mode: str = "HTML") -> bool:
         print("AVISO: Credenciais do Telegram não configuradas")
         return False
 
+    import requests
+
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
 
     payload = {
@@ -25,13 +28,17 @@ def enviar_mensagem_telegram(mensagem: str, parse_mode: str = "HTML") -> bool:
         "parse_mode": parse_mode
     }
 
+    inicio = time.perf_counter()
     try:
         response = requests.post(url, json=payload, timeout=10)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
+        metrics.NOTIFICACAO_FALHAS.labels("telegram").inc()
         print(f"Erro ao enviar mensagem para o Telegram: {e}")
         return False
+    finally:
+        metrics.NOTIFICACAO_DURACAO.labels("telegram").observe(time.perf_counter() - inicio)
 
 def notificar_novo_chamado(chamado_id: int, titulo: str, categoria: str, prioridade: str, usuario_nome: str):
     """Notifica sobre novo chamado"""
@@ -107,6 +114,52 @@ def notificar_novo_comentario(chamado_id: int, titulo: str, usuario_nome: str, c
 
     return enviar_mensagem_telegram(mensagem)
 
+def notificar_sla_violado(chamado_id: int, titulo: str, prioridade: str, prazo: str):
+    """Notifica sobre chamado com prazo de SLA vencido"""
+    mensagem = f"""
+🚨 <b>SLA VIOLADO</b>
+
+<b>Chamado #:</b> {chamado_id}
+<b>Título:</b> {titulo}
+<b>Prioridade:</b> {prioridade.upper()}
+
+<b>Prazo:</b> {prazo}
+    """.strip()
+
+    return enviar_mensagem_telegram(mensagem)
+
+def notificar_alteracoes_em_lote(alteracoes: list, usuario_nome: str, limite: int = 20):
+    """Notifica uma alteração em lote numa única mensagem: (id, título, descrição da mudança)"""
+    linhas = [f"<b>#{chamado_id}</b> {titulo}: {mudanca}" for chamado_id, titulo, mudanca in alteracoes[:limite]]
+    if len(alteracoes) > limite:
+        linhas.append(f"<i>... e mais {len(alteracoes) - limite} chamado(s)</i>")
+    linhas_texto = "\n".join(linhas)
+
+    mensagem = f"""
+📦 <b>ATUALIZAÇÃO EM LOTE</b> ({len(alteracoes)} chamados)
+
+{linhas_texto}
+
+<b>Atualizado por:</b> {usuario_nome}
+    """.strip()
+
+    return enviar_mensagem_telegram(mensagem)
+
+def notificar_aguardando_parados(chamados: list, horas: int, limite: int = 20):
+    """Lembrete dos chamados parados em "aguardando" numa única mensagem: (id, título)"""
+    linhas = [f"<b>#{chamado_id}</b> {titulo}" for chamado_id, titulo in chamados[:limite]]
+    if len(chamados) > limite:
+        linhas.append(f"<i>... e mais {len(chamados) - limite} chamado(s)</i>")
+    linhas_texto = "\n".join(linhas)
+
+    mensagem = f"""
+⏰ <b>AGUARDANDO HÁ MAIS DE {horas}H</b> ({len(chamados)} chamados)
+
+{linhas_texto}
+    """.strip()
+
+    return enviar_mensagem_telegram(mensagem)
+
 def notificar_chamado_atribuido(chamado_id: int, titulo: str, atribuido_para_nome: str, atribuido_por_nome: str):
     """Notifica sobre atribuição de chamado"""
     mensagem = f"""
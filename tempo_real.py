@@ -0,0 +1,169 @@
+"""
+Log de eventos em tempo real (WebSocket e SSE)
+
+Todo evento enviado aos clientes (chamado criado/alterado, comentário, SLA
+vencido...) recebe um id "<época>-<sequência>" e fica num buffer circular
+em memória com os últimos N eventos. A sequência cresce a cada evento; a
+época identifica o processo (instante do startup em ms), então ids de outro
+worker ou de antes de um restart nunca são confundidos com os deste.
+
+Um cliente que reconecta informa o último id recebido (?last_event_id= no
+WebSocket, cabeçalho Last-Event-ID no SSE) e recebe só os eventos que
+perdeu. Se ele estiver atrás do início do buffer, ou o id for de outra
+época, recebe {"type": "resync"} e recarrega tudo de uma vez.
+
+Sessões WebSocket: o cliente se autentica na primeira mensagem
+({"type": "auth", "token": ...}). Cada conexão tem uma fila de envio
+limitada consumida por uma task própria, então um cliente lento nunca atrasa
+o broadcast dos outros. Fila cheia: "descartar" troca o que estava na fila
+por um resync; "desconectar" fecha a conexão e o cliente retoma pelo buffer.
+O servidor manda {"type": "ping"} periodicamente e fecha conexões que não
+mandam nada (nem o pong) dentro do timeout.
+"""
+import asyncio
+import time
+from collections import deque
+
+import metrics
+from config import get_settings
+
+
+class RegistroEventos:
+    """Buffer circular dos últimos eventos publicados neste processo"""
+
+    def __init__(self, capacidade: int):
+        self.epoca = int(time.time() * 1000)
+        self._sequencia = 0
+        self._eventos = deque(maxlen=capacidade)  # (sequência, mensagem)
+        self._novo = asyncio.Event()              # trocado a cada publicação
+
+    def _id(self, sequencia: int) -> str:
+        return f"{self.epoca}-{sequencia}"
+
+    @property
+    def ultimo_id(self) -> str:
+        return self._id(self._sequencia)
+
+    def publicar(self, mensagem: dict) -> dict:
+        """Numera a mensagem, guarda no buffer e acorda quem espera por eventos"""
+        self._sequencia += 1
+        mensagem = {**mensagem, "id": self._id(self._sequencia)}
+        self._eventos.append((self._sequencia, mensagem))
+        novo, self._novo = self._novo, asyncio.Event()
+        novo.set()
+        return mensagem
+
+    def desde(self, ultimo_id: str):
+        """
+        Eventos posteriores a `ultimo_id`, ou None quando não dá para
+        retomar (id inválido, de outra época ou já fora do buffer)
+        """
+        try:
+            epoca, sequencia = (int(parte) for parte in ultimo_id.split("-"))
+        except (AttributeError, ValueError):
+            return None
+        if epoca != self.epoca or sequencia > self._sequencia:
+            return None
+        if sequencia == self._sequencia:
+            return []
+        primeira = self._eventos[0][0] if self._eventos else self._sequencia + 1
+        if sequencia < primeira - 1:
+            return None
+        return [mensagem for numero, mensagem in self._eventos if numero > sequencia]
+
+    def resync(self) -> dict:
+        """Aviso ao cliente que ficou para trás: recarregar tudo a partir do último id"""
+        return {"type": "resync", "id": self.ultimo_id}
+
+    async def aguardar(self, timeout: float) -> bool:
+        """Espera a próxima publicação; False se o tempo acabar antes"""
+        try:
+            await asyncio.wait_for(self._novo.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+POLITICAS_FILA = ("descartar", "desconectar")
+
+# Códigos de fechamento (4000-4999 são da aplicação)
+FECHAMENTO_NAO_AUTENTICADO = 4401  # o cliente não reconecta
+FECHAMENTO_SEM_HEARTBEAT = 4408
+FECHAMENTO_LIMITE_USUARIO = 4429   # substituída por uma conexão mais nova; o cliente não reconecta
+FECHAMENTO_FILA_CHEIA = 1013       # "try again later": o cliente reconecta e retoma pelo buffer
+
+_settings = get_settings()
+if _settings.ws_fila_politica not in POLITICAS_FILA:
+    raise ValueError(
+        f"WS_FILA_POLITICA inválida: {_settings.ws_fila_politica!r} (use {' ou '.join(POLITICAS_FILA)})"
+    )
+
+REGISTRO = RegistroEventos(_settings.eventos_buffer_tamanho)
+
+metrics.GaugeCallback(
+    "chamados_realtime_buffer_events", "Eventos guardados no buffer de retomada",
+    lambda: [((), len(REGISTRO._eventos))]
+)
+
+
+class ConexaoWS:
+    """WebSocket autenticado com fila de envio própria"""
+
+    def __init__(self, websocket, usuario, tamanho_fila: int, politica: str):
+        self.websocket = websocket
+        self.usuario_id = usuario.id
+        self.nome = usuario.nome
+        self.ti = usuario.tipo == "ti"
+        self.politica = politica
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self.ultima_mensagem = time.monotonic()
+        self.encerrada = asyncio.Event()
+        self.codigo_fechamento = None
+
+    def encerrar(self, codigo: int, motivo: str):
+        """Pede o fechamento (feito pela rota, que é dona do socket)"""
+        if self.codigo_fechamento is None:
+            self.codigo_fechamento = codigo
+            metrics.WS_ENCERRAMENTOS.labels(motivo).inc()
+        self.encerrada.set()
+
+    def enfileirar(self, mensagem: dict):
+        """Nunca bloqueia: com a fila cheia aplica a política configurada"""
+        try:
+            self.fila.put_nowait(mensagem)
+            return
+        except asyncio.QueueFull:
+            metrics.WS_DESCARTES.labels(self.politica).inc()
+        if self.politica == "desconectar":
+            self.encerrar(FECHAMENTO_FILA_CHEIA, "fila_cheia")
+            return
+        # O resync (com o id mais recente) cobre tudo o que estava na fila
+        while not self.fila.empty():
+            self.fila.get_nowait()
+        self.fila.put_nowait(REGISTRO.resync())
+
+    async def enviar(self):
+        """Task que esvazia a fila no socket"""
+        while True:
+            mensagem = await self.fila.get()
+            await self.websocket.send_json(mensagem)
+            metrics.WS_MENSAGENS.inc()
+
+    async def heartbeat(self, intervalo: float, timeout: float):
+        """Task que manda ping e encerra a conexão se o cliente ficar mudo"""
+        while True:
+            await asyncio.sleep(intervalo)
+            if time.monotonic() - self.ultima_mensagem > timeout:
+                self.encerrar(FECHAMENTO_SEM_HEARTBEAT, "heartbeat")
+                return
+            self.enfileirar({"type": "ping"})
+
+
+def pendentes(ultimo_id: str, canal: str) -> list:
+    """Eventos a reenviar a um cliente que reconectou (resync se não der para retomar)"""
+    eventos = REGISTRO.desde(ultimo_id)
+    if eventos is None:
+        metrics.EVENTOS_RESYNC.labels(canal).inc()
+        return [REGISTRO.resync()]
+    metrics.EVENTOS_REENVIADOS.labels(canal).inc(len(eventos))
+    return eventos